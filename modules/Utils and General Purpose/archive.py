@@ -0,0 +1,186 @@
+import io
+import os
+import sys
+import time
+import uuid
+import hashlib
+import tarfile
+import zipfile
+
+ARCHIVE_FORMATS = ('tar', 'tar.gz', 'tar.bz2', 'tar.xz', 'zip')
+
+# Archive name suffixes and the format they imply
+FORMAT_SUFFIXES = (
+    ('.tar.gz', 'tar.gz'), ('.tgz', 'tar.gz'),
+    ('.tar.bz2', 'tar.bz2'), ('.tbz2', 'tar.bz2'),
+    ('.tar.xz', 'tar.xz'), ('.txz', 'tar.xz'),
+    ('.tar', 'tar'), ('.zip', 'zip'),
+)
+
+def guess_format(target):
+    """
+    Returns the archive format implied by the target's name, or 'tar' if there
+    is none (as for '-', standard output).
+    """
+    name = os.fspath(target).lower()
+    for suffix, archive_format in FORMAT_SUFFIXES:
+        if name.endswith(suffix):
+            return archive_format
+    return 'tar'
+
+class ArchiveSink:
+    """
+    Writes directories and files into a tar or zip archive instead of the
+    filesystem. The archive is produced as a stream, so target may be a file
+    path or '-' for standard output.
+
+    Paths are stored relative to base_path, or as given if base_path is None.
+    In tar archives, a payload identical to one already stored is added as a
+    hardlink to its first copy, so each distinct payload is stored once. Zip
+    has no link entries, so there every copy is stored (compressed).
+
+    A file target is written under a temporary name and only renamed into place
+    by close(); abort() discards it. Used as a context manager, the archive is
+    closed on success and aborted on error.
+    """
+
+    def __init__(self, target, archive_format=None, base_path=None):
+        self.archive_format = archive_format or guess_format(target)
+        if self.archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format: {self.archive_format}")
+        self.base_path = os.fspath(base_path) if base_path is not None else None
+        self.mtime = int(time.time())
+        self.names = set()
+        self.payloads = {}
+        if target == '-':
+            self.target = self.temp_path = None
+            self.file = sys.stdout.buffer
+        else:
+            self.target = os.fspath(target)
+            directory, name = os.path.split(os.path.abspath(self.target))
+            self.temp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+            self.file = open(self.temp_path, 'wb')
+        if self.archive_format == 'zip':
+            self.archive = zipfile.ZipFile(self.file, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            compression = self.archive_format.partition('.')[2]
+            self.archive = tarfile.open(fileobj=self.file, mode=f"w|{compression}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def arcname(self, path):
+        """
+        Returns the name path is stored under in the archive.
+        """
+        path = os.fspath(path)
+        if self.base_path is not None:
+            path = os.path.relpath(path, self.base_path)
+        name = os.path.normpath(path).replace(os.sep, '/').lstrip('/')
+        if name == '..' or name.startswith('../'):
+            raise ValueError(f"{path} lies outside the archive root")
+        return name
+
+    def add_directory(self, path):
+        """
+        Adds an empty directory entry; directories already added are ignored.
+        """
+        name = self.arcname(path)
+        if name in ('', '.') or name in self.names:
+            return
+        self.names.add(name)
+        if self.archive_format == 'zip':
+            info = zipfile.ZipInfo(f"{name}/", time.localtime(self.mtime)[:6])
+            info.external_attr = (0o40755 << 16) | 0x10
+            self.archive.writestr(info, b'')
+        else:
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            info.mtime = self.mtime
+            self.archive.addfile(info)
+
+    def add_file(self, path, data):
+        """
+        Adds a file holding data (str or bytes). Returns 'stored' if the payload
+        was written, 'linked' if it was added as a link to an identical payload,
+        or None if path was already in the archive (the first copy is kept).
+        """
+        name = self.arcname(path)
+        if name in self.names:
+            return None
+        self.names.add(name)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if self.archive_format == 'zip':
+            info = zipfile.ZipInfo(name, time.localtime(self.mtime)[:6])
+            info.external_attr = 0o644 << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            self.archive.writestr(info, data)
+            return 'stored'
+        info = tarfile.TarInfo(name)
+        info.mode = 0o644
+        info.mtime = self.mtime
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        first = self.payloads.get(digest)
+        if first is not None:
+            info.type = tarfile.LNKTYPE
+            info.linkname = first
+            self.archive.addfile(info)
+            return 'linked'
+        self.payloads[digest] = name
+        info.size = len(data)
+        self.archive.addfile(info, io.BytesIO(data))
+        return 'stored'
+
+    def close(self):
+        """
+        Finishes the archive and moves a file target into place.
+        """
+        self.archive.close()
+        if self.temp_path is None:
+            self.file.flush()
+            return
+        self.file.close()
+        os.replace(self.temp_path, self.target)
+
+    def abort(self):
+        """
+        Stops writing and removes the partial archive of a file target.
+        """
+        try:
+            self.archive.close()
+        except Exception:
+            pass
+        if self.temp_path is None:
+            return
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+def add_archive_arguments(parser):
+    """
+    Adds the shared --archive and --archive-format options to an argparse parser.
+    """
+    parser.add_argument(
+        "--archive",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Write the generated files into a tar or zip archive (or '-' for standard output) "
+             "instead of the filesystem."
+    )
+    parser.add_argument(
+        "--archive-format",
+        choices=ARCHIVE_FORMATS,
+        default=None,
+        help="Archive format; by default it follows the --archive file name, and tar for standard output."
+    )
@@ -0,0 +1,158 @@
+import json
+import struct
+from collections import namedtuple
+
+# Fields that a format does not carry are None; tracks is only set for MIDI
+AudioInfo = namedtuple("AudioInfo", ["duration", "sample_rate", "bit_depth", "channels", "tracks"])
+
+# Chunk headers examined before giving up on finding the format and data chunks
+MAX_CHUNKS = 64
+
+def extended_to_float(data):
+    """
+    Converts an 80-bit IEEE 754 extended precision value, as used for the AIFF
+    sample rate, to a float.
+    """
+    exponent, mantissa = struct.unpack('>HQ', data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+def _chunks(f, start, byte_order):
+    # Yields (chunk id, data offset, size) by seeking from header to header
+    offset = start
+    for _ in range(MAX_CHUNKS):
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size = struct.unpack(f'{byte_order}I', header[4:])[0]
+        yield header[:4], offset + 8, size
+        offset += 8 + size + (size & 1)
+
+def _riff_info(f, header):
+    if header[8:12] != b'WAVE':
+        return None
+    fmt = None
+    data_size = None
+    long_data_size = None
+    for chunk_id, offset, size in _chunks(f, 12, '<'):
+        if chunk_id == b'fmt ':
+            f.seek(offset)
+            fmt = f.read(min(size, 40))
+        elif chunk_id == b'ds64':
+            # RF64 keeps 64-bit sizes here and 0xFFFFFFFF in the data chunk
+            f.seek(offset)
+            long_data_size = struct.unpack('<QQ', f.read(16))[1]
+        elif chunk_id == b'data':
+            data_size = long_data_size if size == 0xFFFFFFFF and long_data_size else size
+            break
+    if fmt is None or len(fmt) < 16:
+        return None
+    tag, channels, rate, byte_rate, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if tag == 0xFFFE and len(fmt) >= 20:
+        # WAVE_FORMAT_EXTENSIBLE stores the valid bits per sample separately
+        bits = struct.unpack('<H', fmt[18:20])[0] or bits
+    duration = data_size / byte_rate if data_size is not None and byte_rate else None
+    return AudioInfo(duration, rate, bits or None, channels, None)
+
+def _aiff_info(f, header):
+    if header[8:12] not in (b'AIFF', b'AIFC'):
+        return None
+    for chunk_id, offset, size in _chunks(f, 12, '>'):
+        if chunk_id == b'COMM' and size >= 18:
+            f.seek(offset)
+            comm = f.read(18)
+            channels, frames, bits = struct.unpack('>hIh', comm[:8])
+            rate = extended_to_float(comm[8:18])
+            return AudioInfo(frames / rate if rate else None, int(rate) or None, bits, channels, None)
+    return None
+
+def _flac_info(f, header):
+    start = 0
+    if header[:3] == b'ID3':
+        # Skip an ID3v2 tag; its size is a 28-bit syncsafe integer
+        f.seek(6)
+        size_bytes = f.read(4)
+        start = 10 + sum(byte << (7 * (3 - i)) for i, byte in enumerate(size_bytes))
+        if header[5] & 0x10:
+            start += 10
+        f.seek(start)
+        if f.read(4) != b'fLaC':
+            return None
+    # The first metadata block is always STREAMINFO
+    f.seek(start + 4)
+    block = f.read(4 + 34)
+    if len(block) < 38 or block[0] & 0x7F != 0:
+        return None
+    packed = int.from_bytes(block[4 + 10:4 + 18], 'big')
+    rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    bits = ((packed >> 36) & 0x1F) + 1
+    total_samples = packed & ((1 << 36) - 1)
+    duration = total_samples / rate if rate and total_samples else None
+    return AudioInfo(duration, rate or None, bits, channels, None)
+
+def _midi_info(f, header):
+    _, tracks, _ = struct.unpack('>HHH', header[8:14])
+    return AudioInfo(None, None, None, None, tracks)
+
+def read_audio_info(path):
+    """
+    Reads the duration, sample rate, bit depth and channel count of a WAV, AIFF
+    or FLAC file, or the track count of a MIDI file, from its headers alone.
+    Only the header chunks are read; audio data is never decoded. Returns None
+    for other formats and for files that cannot be read.
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(14)
+            if len(header) < 12:
+                return None
+            if header[:4] in (b'RIFF', b'RF64'):
+                return _riff_info(f, header)
+            if header[:4] == b'FORM':
+                return _aiff_info(f, header)
+            if header[:4] == b'fLaC' or header[:3] == b'ID3':
+                return _flac_info(f, header)
+            if header[:4] == b'MThd' and len(header) >= 14:
+                return _midi_info(f, header)
+    except (OSError, struct.error):
+        return None
+    return None
+
+def info_to_json(info):
+    """
+    Serializes an AudioInfo (or None) for the index.
+    """
+    return json.dumps(list(info) if info else None)
+
+def info_from_json(text):
+    """
+    Restores an AudioInfo (or None) stored with info_to_json.
+    """
+    values = json.loads(text)
+    return AudioInfo(*values) if values else None
+
+def format_tip(name, info):
+    """
+    Returns the .nfo Tip for an item: its name, followed by the audio properties
+    when they are known, e.g. 'Kick.wav | 0:01.3 | 44.1 kHz | 24-bit | Stereo'.
+    """
+    if info is None:
+        return name
+    parts = [name]
+    if info.tracks is not None:
+        parts.append(f"MIDI, {info.tracks} track{'s' if info.tracks != 1 else ''}")
+    if info.duration is not None:
+        minutes, seconds = divmod(round(info.duration, 1), 60)
+        parts.append(f"{int(minutes)}:{seconds:04.1f}")
+    if info.sample_rate:
+        parts.append(f"{info.sample_rate / 1000:g} kHz")
+    if info.bit_depth:
+        parts.append(f"{info.bit_depth}-bit")
+    if info.channels:
+        parts.append({1: "Mono", 2: "Stereo"}.get(info.channels, f"{info.channels} channels"))
+    return " | ".join(parts)
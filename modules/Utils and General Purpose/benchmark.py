@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from collections import deque
+
+from folders import SOUNDKIT_STRUCTURE
+from fsutil import atomic_write
+
+TOOLS = ('nfo', 'nfo2', 'filenamer', 'folders')
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+AUDIO_SUFFIXES = ('.wav', '.mp3', '.flac', '.aiff', '.ogg', '.mid')
+
+# Audit events counted as filesystem calls (see the sys.audit events table)
+IO_AUDIT_EVENTS = {
+    'open', 'os.scandir', 'os.listdir', 'os.rename', 'os.remove', 'os.mkdir',
+    'os.rmdir', 'os.utime', 'os.chmod', 'shutil.copyfile', 'sqlite3.connect',
+}
+
+def _sample_words(structure=SOUNDKIT_STRUCTURE):
+    words = []
+    for name, children in structure.items():
+        if name.startswith('_'):
+            continue
+        words.append(name)
+        words.extend(_sample_words(children))
+    return words
+
+def build_library(root, items, depth=3, fanout=8, hidden_ratio=0.05, bpm_ratio=0.3, seed=0):
+    """
+    Creates a reproducible synthetic sample library of empty files below root.
+
+    The tree has `fanout` folders per level down to `depth`, named after the sound
+    kit folders in SOUNDKIT_STRUCTURE with mixed separators and casing, and `items`
+    audio files spread over the leaf folders. A share of the names carries a
+    "<tempo> bpm" tag, and hidden_ratio of the folders get a hidden sibling that
+    the tools are expected to skip. The same arguments always produce the same tree.
+    """
+    rng = random.Random(seed)
+    words = _sample_words()
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+
+    def styled(word, index):
+        style = rng.randrange(3)
+        if style == 0:
+            return f"{word}_{index:03d}"
+        if style == 1:
+            return f"{word.lower()}-{index}"
+        return f"{word}{index}"
+
+    leaves = [root]
+    for level in range(depth):
+        next_leaves = []
+        for parent in leaves:
+            for index in range(fanout):
+                folder = parent / styled(rng.choice(words), index)
+                folder.mkdir(exist_ok=True)
+                next_leaves.append(folder)
+                if rng.random() < hidden_ratio:
+                    hidden = parent / f".cache{index}"
+                    hidden.mkdir(exist_ok=True)
+                    (hidden / "ignored.wav").touch()
+        leaves = next_leaves
+
+    for index in range(items):
+        name = styled(rng.choice(words), index)
+        if rng.random() < bpm_ratio:
+            name += f" {rng.randrange(70, 180)}bpm"
+        (leaves[index % len(leaves)] / f"{name}{rng.choice(AUDIO_SUFFIXES)}").touch()
+    return root
+
+def scaffold_structure(items, fanout=8):
+    """
+    Returns a nested folder dictionary with `items` folders in total, for use with
+    generate_soundkit_structure.
+    """
+    words = _sample_words()
+    structure = {}
+    queue = deque([structure])
+    created = 0
+    while created < items:
+        node = queue.popleft()
+        for index in range(fanout):
+            if created >= items:
+                break
+            child = {}
+            node[f"{words[created % len(words)]}{created}"] = child
+            queue.append(child)
+            created += 1
+    return structure
+
+def _read_proc_io():
+    try:
+        with open('/proc/self/io', encoding='ascii') as f:
+            return {key: int(value) for key, value in (line.split(':') for line in f)}
+    except OSError:
+        return {}
+
+def _peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def run_tool(tool, target, structure_path=None):
+    """
+    Runs one tool against target in the current process and returns its metrics:
+    wall-clock time, audited filesystem calls, read/write syscall counts where
+    /proc/self/io is available, and peak RSS. For folders, structure_path names a
+    JSON file holding the structure to scaffold (default: the built-in one).
+    """
+    from reporting import Reporter
+    reporter = Reporter('quiet')
+    io_calls = 0
+
+    def audit(event, args):
+        nonlocal io_calls
+        if event in IO_AUDIT_EVENTS:
+            io_calls += 1
+
+    if tool == 'nfo':
+        from nfo import traverse_and_generate
+        call = lambda: traverse_and_generate(Path(target), reporter=reporter)
+    elif tool == 'nfo2':
+        from nfo2 import traverse_and_generate
+        call = lambda: traverse_and_generate(Path(target), reporter=reporter)
+    elif tool == 'filenamer':
+        from filenamer import main
+        call = lambda: main(target, reporter=reporter)
+    elif tool == 'folders':
+        from folders import generate_soundkit_structure
+        structure = None
+        if structure_path:
+            with open(structure_path, encoding='utf-8') as f:
+                structure = json.load(f)
+        call = lambda: generate_soundkit_structure(Path(target), structure=structure, reporter=reporter)
+    else:
+        raise ValueError(f"Unknown tool: {tool}")
+
+    sys.addaudithook(audit)
+    io_before = _read_proc_io()
+    start = time.perf_counter()
+    call()
+    elapsed = time.perf_counter() - start
+    io_after = _read_proc_io()
+    return {
+        "seconds": round(elapsed, 6),
+        "io_calls": io_calls,
+        "read_syscalls": io_after.get('syscr', 0) - io_before.get('syscr', 0) if io_after else None,
+        "write_syscalls": io_after.get('syscw', 0) - io_before.get('syscw', 0) if io_after else None,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "counters": dict(reporter.counters),
+    }
+
+def _run_isolated(tool, target, structure_path=None):
+    # A fresh interpreter per run keeps peak RSS and import state independent;
+    # large structures go through a file, as they exceed the limits on arguments
+    # and environment strings
+    command = [sys.executable, os.path.abspath(__file__), '--run-one', tool, str(target)]
+    if structure_path is not None:
+        command += ['--structure', str(structure_path)]
+    completed = subprocess.run(
+        command, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def run_suite(sizes, tools, workdir, depth=3, fanout=8, seed=0, log=print, on_result=None):
+    """
+    Builds a synthetic library per tool and size, then times a cold run (first run on
+    the fresh tree) and a warm run (immediate re-run, nothing left to do).
+    Returns the list of result records; on_result, if given, is called with the
+    list after every run, so results can be saved as they come in.
+    """
+    results = []
+    for size in sizes:
+        for tool in tools:
+            target = Path(workdir) / f"{tool}-{size}"
+            if target.exists():
+                shutil.rmtree(target)
+            structure_path = None
+            build_start = time.perf_counter()
+            if tool == 'folders':
+                target.mkdir(parents=True)
+                structure_path = Path(workdir) / f"{tool}-{size}.structure.json"
+                with open(structure_path, 'w', encoding='utf-8') as f:
+                    json.dump(scaffold_structure(size, fanout), f)
+            else:
+                build_library(target, size, depth=depth, fanout=fanout, seed=seed)
+            log(f"[{tool} @ {size}] library built in {time.perf_counter() - build_start:.1f}s")
+            for phase in ('cold', 'warm'):
+                metrics = _run_isolated(tool, target, structure_path)
+                log(f"[{tool} @ {size}] {phase}: {metrics['seconds']:.3f}s, "
+                    f"peak RSS {(metrics['peak_rss_bytes'] or 0) / 2**20:.1f} MiB")
+                results.append({"tool": tool, "items": size, "run": phase, **metrics})
+                if on_result:
+                    on_result(results)
+            shutil.rmtree(target)
+            if structure_path is not None:
+                structure_path.unlink()
+    return results
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(baseline_path, current_path):
+    """
+    Prints the run times of two result files side by side with their ratio.
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['tool'], r['items'], r['run']): r for r in json.load(f)['results']}
+    with open(current_path, encoding='utf-8') as f:
+        current = json.load(f)['results']
+    print(f"{'tool':<10}{'items':>10}{'run':>6}{'before':>12}{'after':>12}{'ratio':>8}")
+    for record in current:
+        key = (record['tool'], record['items'], record['run'])
+        before = baseline.get(key)
+        if before is None:
+            continue
+        ratio = record['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+        print(f"{key[0]:<10}{key[1]:>10}{key[2]:>6}{before['seconds']:>11.3f}s{record['seconds']:>11.3f}s{ratio:>7.2f}x")
+
+def main():
+    """
+    Main function to execute the script.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark nfo.py, nfo2.py, filenamer.py and folders.py on synthetic sample libraries.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Library sizes in items (default: 1000 100000 1000000).")
+    parser.add_argument('--tools', nargs='+', choices=TOOLS, default=list(TOOLS), help="Tools to benchmark (default: all).")
+    parser.add_argument('--depth', type=int, default=3, help="Folder depth of the synthetic library (default: 3).")
+    parser.add_argument('--fanout', type=int, default=8, help="Folders per level (default: 8).")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for library names (default: 0).")
+    parser.add_argument('--workdir', default=None, help="Where to build libraries (default: a temporary directory).")
+    parser.add_argument('--output', default='benchmark_results.json', help="Result file (default: benchmark_results.json).")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help="Compare two result files instead of running.")
+    parser.add_argument('--run-one', nargs=2, metavar=('TOOL', 'TARGET'), help=argparse.SUPPRESS)
+    parser.add_argument('--structure', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_tool(*args.run_one, structure_path=args.structure)))
+        return
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    report = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "parameters": {"depth": args.depth, "fanout": args.fanout, "seed": args.seed},
+        "results": [],
+    }
+
+    def save(results):
+        # Rewritten after every run, so an interrupted or failed suite keeps what it measured
+        report["results"] = results
+        atomic_write(args.output, json.dumps(report, indent=4))
+
+    with tempfile.TemporaryDirectory(prefix="nfo-bench-", dir=args.workdir) as workdir:
+        run_suite(args.sizes, args.tools, workdir, args.depth, args.fanout, args.seed, on_result=save)
+    print(f"Results written to '{args.output}'.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+import os
+import sqlite3
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from parallel import bounded_map
+from pcm import PCM_ERRORS, PCM_EXTENSIONS, numpy_available, open_pcm
+from reporting import Reporter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Formats whose PCM can be decoded without extra dependencies
+BPM_EXTENSIONS = PCM_EXTENSIONS
+
+# Stored in the library root; the leading dot keeps it out of the walker's results
+BPM_CACHE_FILENAME = ".bpm_cache.sqlite"
+
+# Onset envelope resolution in frames per second
+ENVELOPE_RATE = 200
+
+# Only the start of long files is analyzed
+MAX_SECONDS = 60
+
+MIN_BPM = 60
+MAX_BPM = 200
+
+# Autocorrelation peaks weaker than this (relative to zero lag) are not trusted
+MIN_CONFIDENCE = 0.05
+
+def onset_envelope(path):
+    """
+    Reads the PCM of a WAV or AIFF file chunk by chunk and returns its onset
+    envelope and the envelope's frame rate, or None if the file cannot be decoded.
+
+    The envelope is the half-wave rectified rise of the log energy of the
+    differentiated signal, computed over hops of about 1/ENVELOPE_RATE seconds.
+    Only the first MAX_SECONDS are read.
+    """
+    try:
+        rate, _, chunks = open_pcm(path, MAX_SECONDS)
+        hop = max(1, int(round(rate / ENVELOPE_RATE)))
+        energies = []
+        carry = np.zeros(0, np.float32)
+        previous = 0.0
+        for mono in chunks:
+            signal = np.concatenate((carry, mono))
+            frames = len(signal) // hop
+            if frames:
+                used = signal[:frames * hop]
+                # Differentiating emphasizes transients over sustained low end
+                flux = np.diff(used, prepend=previous).reshape(frames, hop)
+                energies.append(np.sqrt(np.mean(flux * flux, axis=1)))
+                previous = used[-1]
+            carry = signal[frames * hop:]
+    except PCM_ERRORS:
+        return None
+    if not energies:
+        return None
+    energy = np.log(np.concatenate(energies) + 1e-4)
+    return np.maximum(np.diff(energy), 0.0), rate / hop
+
+def estimate_bpm(envelope, frame_rate, min_bpm=MIN_BPM, max_bpm=MAX_BPM):
+    """
+    Estimates the tempo of an onset envelope by autocorrelation and returns it
+    in BPM rounded to one decimal, or None if no clear periodicity is found.
+
+    Each candidate lag is scored by its autocorrelation plus that of its double
+    and quadruple, weighted towards 120 BPM to settle octave ambiguities.
+    """
+    n = len(envelope)
+    min_lag = int(frame_rate * 60 / max_bpm)
+    max_lag = int(np.ceil(frame_rate * 60 / min_bpm))
+    if n < 2 * max_lag:
+        return None
+    onset = envelope - envelope.mean()
+    spectrum = np.fft.rfft(onset, 2 * n)
+    autocorrelation = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+    if autocorrelation[0] <= 0:
+        return None
+    autocorrelation = autocorrelation / autocorrelation[0]
+
+    lags = np.arange(min_lag, max_lag + 1)
+    score = np.zeros(len(lags))
+    # Only power-of-two multiples, so a lag of one and a half beats is not rewarded
+    for multiple in (1, 2, 4):
+        valid = lags * multiple < n
+        score[valid] += autocorrelation[lags[valid] * multiple] / multiple
+    bpms = 60 * frame_rate / lags
+    score *= np.exp(-0.5 * np.log2(bpms / 120) ** 2)
+    best = int(np.argmax(score))
+    lag = float(lags[best])
+    if autocorrelation[lags[best]] < MIN_CONFIDENCE:
+        return None
+    # Parabolic interpolation around the peak for sub-frame precision
+    if 0 < best < len(lags) - 1:
+        left, center, right = score[best - 1], score[best], score[best + 1]
+        denominator = left - 2 * center + right
+        if denominator < 0:
+            lag += 0.5 * (left - right) / denominator
+    return round(60 * frame_rate / lag, 1)
+
+def analyze_file(path):
+    """
+    Returns the estimated tempo of a WAV or AIFF file, or None.
+    """
+    result = onset_envelope(path)
+    if result is None:
+        return None
+    return estimate_bpm(*result)
+
+def file_digest(path):
+    """
+    Returns the blake2b digest of a file's content, or None if it cannot be read.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, 'rb') as f:
+            while block := f.read(1 << 20):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+class BpmCache:
+    """
+    Persistent cache of detected tempos, stored as SQLite in the library root.
+
+    Tempos are keyed by content digest, so renamed or copied files are never
+    analyzed twice. A second table maps paths to their digest by mtime and size,
+    so unchanged files are not even re-hashed.
+    """
+
+    def __init__(self, root_path, filename=BPM_CACHE_FILENAME):
+        self.root_path = os.fspath(root_path)
+        self.connection = sqlite3.connect(os.path.join(self.root_path, filename))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, digest TEXT)"
+        )
+        self.connection.execute("CREATE TABLE IF NOT EXISTS tempos (digest TEXT PRIMARY KEY, bpm REAL)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _key(self, path):
+        return os.path.relpath(os.fspath(path), self.root_path).replace(os.sep, '/')
+
+    def known_digest(self, path, st):
+        """
+        Returns the recorded digest of path if its mtime and size still match st.
+        """
+        row = self.connection.execute(
+            "SELECT mtime_ns, size, digest FROM files WHERE path = ?", (self._key(path),)
+        ).fetchone()
+        if row is None or (row[0], row[1]) != (st.st_mtime_ns, st.st_size):
+            return None
+        return row[2]
+
+    def record_digest(self, path, st, digest):
+        """
+        Records the digest of path at the given stat result.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files (path, mtime_ns, size, digest) VALUES (?, ?, ?, ?)",
+            (self._key(path), st.st_mtime_ns, st.st_size, digest)
+        )
+
+    def tempo(self, digest):
+        """
+        Returns (True, bpm) if digest was analyzed before (bpm may be None), else (False, None).
+        """
+        row = self.connection.execute("SELECT bpm FROM tempos WHERE digest = ?", (digest,)).fetchone()
+        return (True, row[0]) if row else (False, None)
+
+    def record_tempo(self, digest, bpm):
+        """
+        Records the result of analyzing the content with this digest.
+        """
+        self.connection.execute("INSERT OR REPLACE INTO tempos (digest, bpm) VALUES (?, ?)", (digest, bpm))
+
+    def close(self):
+        """
+        Commits pending changes and closes the database.
+        """
+        self.connection.commit()
+        self.connection.close()
+
+def _hash(item):
+    path, st, digest = item
+    return path, st, digest or file_digest(path)
+
+def detect_bpms(paths, cache=None, processes=None, jobs=1, reporter=None):
+    """
+    Detects the tempo of every WAV/AIFF file in paths and returns a dict mapping
+    each path with a detected tempo to its BPM.
+
+    Files are hashed on `jobs` threads; content already in the cache is not
+    analyzed again. The rest is analyzed on a pool of `processes` workers (one
+    per CPU by default). Each analyzed file is reported as a 'bpm' event.
+    """
+    reporter = reporter or Reporter('verbose')
+    if not numpy_available():
+        reporter.error("NumPy is not installed; skipping BPM detection.")
+        return {}
+
+    fingerprints = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        fingerprints.append((path, st, cache.known_digest(path, st) if cache else None))
+    tempos = {}
+    pending = {}
+    for path, st, digest in bounded_map(_hash, fingerprints, jobs):
+        if digest is None:
+            continue
+        if cache:
+            cache.record_digest(path, st, digest)
+            known, bpm = cache.tempo(digest)
+            if known:
+                if bpm is not None:
+                    tempos[path] = bpm
+                continue
+        # Identical content is analyzed once
+        pending.setdefault(digest, []).append(path)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    jobs_by_digest = list(pending.items())
+    results = bounded_map(analyze_file, (group[0] for _, group in jobs_by_digest), processes,
+                          executor_class=ProcessPoolExecutor)
+    for (digest, group), bpm in zip(jobs_by_digest, results):
+        if cache:
+            cache.record_tempo(digest, bpm)
+        for path in group:
+            if bpm is not None:
+                tempos[path] = bpm
+            reporter.event('bpm', path, [f"Detected {bpm} BPM: {path}" if bpm else f"No tempo found: {path}"])
+    return tempos
@@ -0,0 +1,267 @@
+import io
+import os
+import ast
+import heapq
+import importlib.util
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from walker import walk_tree
+from parallel import bounded_map, chunked
+
+# Source files parsed per worker task
+CHUNK_SIZE = 16
+
+# Directory names never searched for modules
+IGNORED_DIRECTORIES = ('__pycache__',)
+
+# One bundled source file. lines holds the decoded source; imports holds
+# (first_line, last_line, separable, node) for every top-level import, where
+# separable means no other statement shares its lines; main_guards holds the
+# (first_line, last_line) spans of top-level `if __name__ == '__main__':` blocks.
+ModuleInfo = namedtuple("ModuleInfo", ["name", "relpath", "is_package", "lines", "imports", "main_guards", "error"])
+
+def module_name(relpath, prefix=''):
+    """
+    Returns (dotted module name, is_package) for a .py file path relative to the
+    bundle root, e.g. 'pkg/sub/__init__.py' -> ('pkg.sub', True).
+    """
+    parts = relpath[:-len('.py')].split('/')
+    is_package = parts[-1] == '__init__'
+    if is_package:
+        parts = parts[:-1]
+    if prefix:
+        parts = [prefix] + parts
+    return '.'.join(parts), is_package
+
+def _is_main_guard(node):
+    if not isinstance(node, ast.If) or not isinstance(node.test, ast.Compare):
+        return False
+    compare = node.test
+    if len(compare.ops) != 1 or not isinstance(compare.ops[0], ast.Eq):
+        return False
+    sides = [compare.left, compare.comparators[0]]
+    return (any(isinstance(side, ast.Name) and side.id == '__name__' for side in sides)
+            and any(isinstance(side, ast.Constant) and side.value == '__main__' for side in sides))
+
+def _first_line(node):
+    # Decorators come before the line a decorated definition reports
+    return min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+
+def parse_module(job):
+    """
+    Reads and parses one source file for the bundler and returns its ModuleInfo.
+    Runs in worker processes, so everything it returns is plain data.
+    """
+    path, relpath, name, is_package = job
+    try:
+        with open(path, 'rb') as f:
+            source = importlib.util.decode_source(f.read())
+        tree = ast.parse(source, filename=relpath)
+    except (OSError, SyntaxError, UnicodeDecodeError, ValueError) as e:
+        return ModuleInfo(name, relpath, is_package, None, [], [], str(e))
+
+    imports = []
+    main_guards = []
+    body = tree.body
+    for index, node in enumerate(body):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            separable = ((index == 0 or body[index - 1].end_lineno < node.lineno)
+                         and (index == len(body) - 1 or _first_line(body[index + 1]) > node.end_lineno))
+            if isinstance(node, ast.Import):
+                data = ('import', [(alias.name, alias.asname) for alias in node.names])
+            else:
+                data = ('from', node.module, node.level, [(alias.name, alias.asname) for alias in node.names])
+            imports.append((node.lineno, node.end_lineno, separable, data))
+        elif _is_main_guard(node):
+            main_guards.append((_first_line(node), node.end_lineno))
+    return ModuleInfo(name, relpath, is_package, io.StringIO(source).readlines(), imports, main_guards, None)
+
+def _parse_chunk(chunk):
+    return [parse_module(job) for job in chunk]
+
+def find_modules(target_dir):
+    """
+    Returns (path, relpath, module name, is_package) for every .py file below
+    target_dir, in walk order. If target_dir is itself a package (it has an
+    __init__.py), module names start with its directory name.
+    """
+    prefix = os.path.basename(os.path.abspath(target_dir)) if os.path.isfile(
+        os.path.join(target_dir, '__init__.py')) else ''
+    modules = []
+    for entry, _ in walk_tree(target_dir, ignore_patterns=IGNORED_DIRECTORIES):
+        if entry.name.endswith('.py') and entry.is_file():
+            relpath = os.path.relpath(entry.path, target_dir).replace(os.sep, '/')
+            name, is_package = module_name(relpath, prefix)
+            modules.append((entry.path, relpath, name, is_package))
+    return modules
+
+def resolve_import(importer, is_package, module, level):
+    """
+    Returns the absolute name of the module a `from` import refers to, or None if
+    a relative import climbs above the top-level package.
+    """
+    if level == 0:
+        return module
+    package = importer if is_package else importer.rpartition('.')[0]
+    parts = package.split('.') if package else []
+    if level - 1 > len(parts):
+        return None
+    base = parts[:len(parts) - (level - 1)]
+    return '.'.join(base + ([module] if module else []))
+
+def topological_order(dependencies, last=None):
+    """
+    Orders module names so that every module comes after the modules it imports,
+    breaking ties by name; `last` is held back as long as possible. Returns
+    (order, cyclic), where cyclic lists the modules caught in import cycles,
+    which are appended to order by name.
+    """
+    dependents = {name: [] for name in dependencies}
+    remaining = {}
+    for name, needed in dependencies.items():
+        remaining[name] = len(needed)
+        for dependency in needed:
+            dependents[dependency].append(name)
+    ready = [(name == last, name) for name, count in remaining.items() if count == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, name = heapq.heappop(ready)
+        order.append(name)
+        for dependent in dependents[name]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                heapq.heappush(ready, (dependent == last, dependent))
+    emitted = set(order)
+    cyclic = sorted(name for name in dependencies if name not in emitted)
+    return order + cyclic, cyclic
+
+class _Imports:
+    # Hoisted external imports, deduplicated alias by alias
+    def __init__(self):
+        self.future = {}
+        self.plain = {}
+        self.from_imports = {}
+
+    def add_import(self, name, asname):
+        self.plain[f"import {name}" + (f" as {asname}" if asname and asname != name else "")] = None
+
+    def add_from(self, module, name, asname):
+        target = self.future if module == '__future__' else self.from_imports.setdefault(module, {})
+        target[name + (f" as {asname}" if asname and asname != name else "")] = None
+
+    def render(self):
+        lines = []
+        if self.future:
+            lines.append(f"from __future__ import {', '.join(self.future)}\n")
+        lines.extend(f"{statement}\n" for statement in sorted(self.plain))
+        lines.extend(f"from {module} import {', '.join(names)}\n" for module, names in sorted(self.from_imports.items()))
+        return lines
+
+def _rewrite_import(info, data, modules, packages, hoisted, dependencies):
+    # Returns the replacement lines for one separable top-level import
+    def internal(name):
+        return name in modules or name in packages
+
+    replacement = []
+    if data[0] == 'import':
+        for name, asname in data[1]:
+            if not internal(name):
+                hoisted.add_import(name, asname)
+                continue
+            # Only the named module is a dependency; parent packages often import their
+            # children, so depending on them as well would turn that into a cycle
+            if name in modules:
+                dependencies.add(name)
+            # Every module shares the bundle's namespace, so a module object is the bundle itself
+            replacement.append(f"{asname or name.partition('.')[0]} = sys.modules[__name__]\n")
+        return replacement
+
+    _, module, level, names = data
+    target = resolve_import(info.name, info.is_package, module, level)
+    if target is None or not internal(target):
+        if level:
+            return None
+        for name, asname in names:
+            hoisted.add_from(module, name, asname)
+        return replacement
+    for name, asname in names:
+        submodule = f"{target}.{name}"
+        if submodule in modules:
+            dependencies.add(submodule)
+            replacement.append(f"{asname or name} = sys.modules[__name__]\n")
+            continue
+        # A name defined in the package or module itself
+        if target in modules:
+            dependencies.add(target)
+        if name != '*' and asname and asname != name:
+            replacement.append(f"{asname} = {name}\n")
+    return replacement
+
+def bundle_modules(target_dir, jobs=None, entry=None, found=None):
+    """
+    Bundles every .py file below target_dir into one source text and returns
+    (lines, module_count, cyclic modules), or raises ValueError if a file cannot
+    be parsed.
+
+    Files are parsed with ast on a process pool of `jobs` workers (one per CPU
+    by default). Modules are emitted in topological order of their imports within
+    the tree. Top-level imports of outside modules are hoisted to the top of the
+    bundle and deduplicated; imports between bundled modules are dropped because
+    all modules share one namespace (module objects become the bundle module and
+    aliases become assignments). Attribute access therefore resolves one level
+    deep: after `import pkg.util`, `pkg.twice` works but `pkg.util.twice` does
+    not. Imports nested in functions or try blocks are left alone. `if __name__ == '__main__':` blocks are removed except in the
+    entry module, which is emitted as late as its dependents allow. found may
+    pass the result of find_modules(target_dir) if it is already known.
+    """
+    if found is None:
+        found = find_modules(target_dir)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    infos = [info for chunk in bounded_map(_parse_chunk, chunked(found, CHUNK_SIZE), jobs,
+                                           executor_class=ProcessPoolExecutor) for info in chunk]
+    errors = [f"{info.relpath}: {info.error}" for info in infos if info.error]
+    if errors:
+        raise ValueError("Cannot parse " + "; ".join(errors))
+
+    by_name = {info.name: info for info in infos}
+    modules = set(by_name)
+    packages = {'.'.join(name.split('.')[:i]) for name in modules for i in range(1, name.count('.') + 1)}
+    hoisted = _Imports()
+    dependencies = {}
+    bodies = {}
+    for info in infos:
+        needed = set()
+        lines = list(info.lines)
+        replaced = False
+        for first, last, separable, data in info.imports:
+            replacement = _rewrite_import(info, data, modules, packages, hoisted, needed) if separable else None
+            if replacement is None:
+                continue
+            lines[first - 1:last] = [replacement] + [[]] * (last - first)
+            replaced = True
+            if any(line.endswith("= sys.modules[__name__]\n") for line in replacement):
+                hoisted.add_import('sys', None)
+        if info.name != entry:
+            for first, last in info.main_guards:
+                lines[first - 1:last] = [[]] * (last - first + 1)
+                replaced = True
+        if replaced:
+            lines = [line for item in lines for line in ([item] if isinstance(item, str) else item)]
+        needed.discard(info.name)
+        dependencies[info.name] = needed & modules
+        bodies[info.name] = lines
+
+    order, cyclic = topological_order(dependencies, last=entry)
+    output = hoisted.render()
+    for name in order:
+        relpath = by_name[name].relpath
+        body = bodies[name]
+        output.append(f"\n# ----- Begin {relpath} -----\n")
+        output.extend(body)
+        if body and not body[-1].endswith('\n'):
+            output.append('\n')
+        output.append(f"# ----- End {relpath} -----\n")
+    return output, len(order), cyclic
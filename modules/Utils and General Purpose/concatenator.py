@@ -1,13 +1,320 @@
 import os
-import sys
+import json
+import errno
+import codecs
+import filecmp
+import hashlib
+import argparse
+from contextlib import nullcontext
 
-def combine_python_files(target_dir, output_file):
+from bundler import bundle_modules, find_modules
+from fsutil import atomic_write, file_matches, temp_path_for
+
+# Block size for copies the kernel cannot do
+COPY_BUFFER = 1 << 20
+
+# Bumped whenever the manifest layout or the output format changes
+MANIFEST_VERSION = 1
+
+# Errors meaning a kernel copy call is not supported for this pair of files
+UNSUPPORTED_COPY_ERRORS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EBADF, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+HEADER = "# Combined Python File\n# This file is autogenerated by combine_python_files.py\n\n"
+
+def begin_marker(filename):
+    """
+    Returns the comment line written before a file's contents.
+    """
+    return f"# ----- Begin {filename} -----\n"
+
+def end_marker(filename):
+    """
+    Returns the comment lines written after a file's contents.
+    """
+    return f"\n# ----- End {filename} -----\n\n"
+
+def _check_utf8(decoder, block):
+    # Feeds one block to an incremental UTF-8 decoder, which raises UnicodeDecodeError
+    # on invalid input; a multi-byte sequence split across blocks still has to be decoded
+    if block.isascii() and not decoder.getstate()[0]:
+        return
+    decoder.decode(block)
+
+def is_valid_utf8(path):
+    """
+    Returns True if the file at path is valid UTF-8.
+
+    The file is read in COPY_BUFFER blocks; pure-ASCII blocks are accepted with
+    bytes.isascii() and only the others are run through an incremental decoder.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(path, 'rb') as f:
+            while block := f.read(COPY_BUFFER):
+                _check_utf8(decoder, block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def hash_file(path, validate=False):
+    """
+    Returns (digest, valid) for the file at path, reading it in COPY_BUFFER blocks.
+    digest is the hex digest the manifest records; with validate, valid tells
+    whether the file is UTF-8 (checked as in is_valid_utf8), otherwise it is None.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    decoder = codecs.getincrementaldecoder('utf-8')() if validate else None
+    valid = True if validate else None
+    with open(path, 'rb') as f:
+        while block := f.read(COPY_BUFFER):
+            digest.update(block)
+            if valid:
+                try:
+                    _check_utf8(decoder, block)
+                except UnicodeDecodeError:
+                    valid = False
+    if valid:
+        try:
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            valid = False
+    return digest.hexdigest(), valid
+
+def _copy_in_kernel(source_fd, target_fd, offset, length):
+    # Returns the number of bytes copied from offset with copy_file_range or
+    # sendfile; given an offset, neither moves the source's file position
+    copied = 0
+    for name in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, name):
+            continue
+        try:
+            while copied < length:
+                if name == 'copy_file_range':
+                    sent = os.copy_file_range(source_fd, target_fd, length - copied, offset + copied)
+                else:
+                    sent = os.sendfile(target_fd, source_fd, offset + copied, length - copied)
+                if sent == 0:
+                    break
+                copied += sent
+            return copied
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_COPY_ERRORS:
+                raise
+    return copied
+
+def copy_range(source, target, offset, length):
+    """
+    Appends length bytes of source, starting at offset, to target; both are
+    binary files and target is positioned at its end.
+
+    The data is copied inside the kernel with os.copy_file_range, or os.sendfile
+    where that is unavailable or unsupported (e.g. across filesystems), and with
+    buffered reads as a last resort.
+    """
+    target.flush()
+    copied = _copy_in_kernel(source.fileno(), target.fileno(), offset, length)
+    # Resynchronize target's buffer with the file position the kernel advanced
+    target.seek(0, os.SEEK_END)
+    source.seek(offset + copied)
+    while copied < length:
+        block = source.read(min(COPY_BUFFER, length - copied))
+        if not block:
+            raise ValueError(f"{source.name} is shorter than its manifest says")
+        target.write(block)
+        copied += len(block)
+
+def list_python_files(target_dir):
+    """
+    Returns the sorted names of the .py files directly inside target_dir.
+    """
+    return sorted([
+        f for f in os.listdir(target_dir)
+        if f.endswith('.py') and os.path.isfile(os.path.join(target_dir, f))
+    ])
+
+def manifest_path(output_file):
+    """
+    Returns the path of the manifest kept next to output_file.
+    """
+    directory, name = os.path.split(os.path.abspath(output_file))
+    return os.path.join(directory, f".{name}.manifest.json")
+
+def load_manifest(output_file, mode):
+    """
+    Returns the input entries recorded for the last build of output_file, keyed
+    by name in output order, or None if there is no usable manifest: it is
+    missing or unreadable, was written for another mode, or the output has been
+    modified since.
+    """
+    try:
+        with open(manifest_path(output_file), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        st = os.stat(output_file)
+        if (manifest['version'] != MANIFEST_VERSION or manifest['mode'] != mode
+                or manifest['output'] != [st.st_size, st.st_mtime_ns]):
+            return None
+        return {entry['name']: entry for entry in manifest['files']}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def save_manifest(output_file, mode, entries):
+    """
+    Records the input entries of output_file, together with the output's current
+    size and mtime, in the manifest next to it.
+    """
+    st = os.stat(output_file)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'mode': mode,
+        'output': [st.st_size, st.st_mtime_ns],
+        'files': entries,
+    }
+    atomic_write(manifest_path(output_file), json.dumps(manifest))
+
+def check_input(name, path, previous, validate=False):
+    """
+    Returns (entry, changed, valid) for one input file. Files whose size and
+    mtime match their entry in previous (a loaded manifest or None) are not read;
+    the others are hashed block by block with hash_file, and with validate also
+    checked to be UTF-8 (valid is None for files that were not read). An
+    unchanged file's entry keeps the old output range of its body.
+    """
+    st = os.stat(path)
+    old = previous.get(name) if previous else None
+    if old and old['size'] == st.st_size and old['mtime_ns'] == st.st_mtime_ns:
+        return dict(old), False, None
+    digest, valid = hash_file(path, validate)
+    entry = {'name': name, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'hash': digest}
+    if old and old['hash'] == digest:
+        # Touched but not modified
+        return dict(old, size=entry['size'], mtime_ns=entry['mtime_ns']), False, valid
+    return entry, True, valid
+
+def _encode_text(text):
+    # The bytes writing text to a file opened in text mode would produce
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    return text.encode('utf-8')
+
+def _encode_binary(text):
+    return text.encode('utf-8')
+
+def _copy_body(path, target, binary):
+    # Appends the body of one changed input to target without holding it in memory
+    if binary:
+        with open(path, 'rb', buffering=0) as source:
+            copy_range(source, target, 0, os.fstat(source.fileno()).st_size)
+        return
+    # Text mode reads with universal newlines, block by block
+    with open(path, 'r', encoding='utf-8') as source:
+        while block := source.read(COPY_BUFFER):
+            target.write(_encode_text(block))
+
+def _replace_if_changed(temp_path, output_file):
+    # Moves temp_path over output_file unless both hold the same bytes
+    if os.path.isfile(output_file) and filecmp.cmp(temp_path, output_file, shallow=False):
+        os.remove(temp_path)
+        return False
+    os.replace(temp_path, output_file)
+    return True
+
+def _combine(target_dir, py_files, output_file, binary, validate, use_manifest):
+    # Returns (status, number of file bodies reused from the previous output)
+    mode = 'binary' if binary else 'text'
+    previous = load_manifest(output_file, mode) if use_manifest else None
+    inputs = [check_input(name, os.path.join(target_dir, name), previous, binary and validate) for name in py_files]
+    entries = [entry for entry, _, _ in inputs]
+    reused = sum(1 for _, changed, _ in inputs if not changed)
+
+    invalid = [entry['name'] for entry, _, valid in inputs if valid is False]
+    if invalid:
+        raise ValueError(f"Not valid UTF-8: {', '.join(invalid)}")
+
+    if previous is not None and reused == len(inputs) and list(previous) == py_files:
+        if entries != list(previous.values()):
+            save_manifest(output_file, mode, entries)
+        return 'up to date', reused
+
+    encode = _encode_binary if binary else _encode_text
+    temp_path = temp_path_for(output_file)
+    try:
+        with open(temp_path, 'wb') as target, \
+                (open(output_file, 'rb', buffering=0) if reused else nullcontext()) as old_output:
+            target.write(encode(HEADER))
+            for entry, changed, _ in inputs:
+                target.write(encode(begin_marker(entry['name'])))
+                offset = target.tell()
+                if changed:
+                    _copy_body(os.path.join(target_dir, entry['name']), target, binary)
+                else:
+                    copy_range(old_output, target, entry['offset'], entry['length'])
+                entry['offset'], entry['length'] = offset, target.tell() - offset
+                target.write(encode(end_marker(entry['name'])))
+        replaced = _replace_if_changed(temp_path, output_file)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    if use_manifest:
+        save_manifest(output_file, mode, entries)
+    return ('written' if replaced else 'unchanged'), reused
+
+def _write_bundle(target_dir, output_file, jobs, entry, use_manifest):
+    # Returns (status, module count); bundles are always rebuilt as a whole,
+    # since one changed import can reorder every module after it
+    mode = f"bundle:{entry or ''}"
+    previous = load_manifest(output_file, mode) if use_manifest else None
+    found = find_modules(target_dir)
+    inputs = [check_input(relpath, path, previous) for path, relpath, _, _ in found]
+    entries = [input_entry for input_entry, _, _ in inputs]
+    if (previous is not None and not any(changed for _, changed, _ in inputs)
+            and list(previous) == [relpath for _, relpath, _, _ in found]):
+        if entries != list(previous.values()):
+            save_manifest(output_file, mode, entries)
+        return 'up to date', len(found)
+
+    lines, count, cyclic = bundle_modules(target_dir, jobs=jobs, entry=entry, found=found)
+    if cyclic:
+        print(f"Warning: Import cycle between {', '.join(cyclic)}; these modules are emitted by name.")
+    data = _encode_text(HEADER + ''.join(lines))
+    replaced = file_matches(output_file, data) is not True
+    if replaced:
+        atomic_write(output_file, data)
+    if use_manifest:
+        save_manifest(output_file, mode, entries)
+    return ('written' if replaced else 'unchanged'), count
+
+def combine_python_files(target_dir, output_file, binary=False, validate=True, bundle=False, jobs=None, entry=None,
+                         use_manifest=True):
     """
     Combine all .py files in the target directory into a single Python file.
 
     Args:
         target_dir (str): Path to the directory containing .py files to combine.
         output_file (str): Path to the output Python file.
+        binary (bool): Stream file bodies byte for byte instead of decoding and
+            re-encoding them. The bodies are copied inside the kernel where
+            possible, and line endings are kept as they are instead of being
+            normalized.
+        validate (bool): In binary mode, check that every changed input is UTF-8
+            before anything is written, block by block while it is hashed.
+            Pure-ASCII files pass the check at memory speed.
+        bundle (bool): Take .py files from all subdirectories and order them by
+            their imports, hoisting and deduplicating outside imports; see
+            bundler.bundle_modules.
+        jobs (int): Worker processes used to parse files in bundle mode
+            (default: one per CPU).
+        entry (str): Module whose `if __name__ == '__main__':` block is kept in
+            bundle mode, e.g. 'cli' or 'pkg.__main__'.
+        use_manifest (bool): Keep a manifest of the inputs (size, mtime and
+            content hash) next to the output, in a hidden .<output>.manifest.json.
+            When no input changed, nothing is rebuilt; otherwise the bodies of
+            unchanged files are copied from the previous output (in the kernel
+            where possible) and only changed files are read. The output is built
+            in a temp file and only renamed into place if its bytes differ.
     """
     if not os.path.isdir(target_dir):
         print(f"Error: The target directory '{target_dir}' does not exist or is not a directory.")
@@ -20,49 +327,94 @@ def combine_python_files(target_dir, output_file):
         print("Error: The output file must not be inside the target directory.")
         return
 
+    if bundle:
+        try:
+            status, count = _write_bundle(target_dir, output_file, jobs, entry, use_manifest)
+        except Exception as e:
+            print(f"An error occurred while bundling files: {e}")
+            return
+        if not count:
+            print(f"No Python files found below the directory '{target_dir}'.")
+        elif status == 'up to date':
+            print(f"'{output_file}' is up to date; none of its {count} modules changed.")
+        elif status == 'unchanged':
+            print(f"Bundled {count} modules; the result matches '{output_file}', which was left as it was.")
+        else:
+            print(f"Successfully bundled {count} modules into '{output_file}'.")
+        return
+
     # Get a sorted list of .py files in the target directory
-    py_files = sorted([
-        f for f in os.listdir(target_dir)
-        if f.endswith('.py') and os.path.isfile(os.path.join(target_dir, f))
-    ])
+    py_files = list_python_files(target_dir)
 
     if not py_files:
         print(f"No Python files found in the directory '{target_dir}'.")
         return
 
     try:
-        with open(output_file, 'w', encoding='utf-8') as outfile:
-            outfile.write("# Combined Python File\n")
-            outfile.write("# This file is autogenerated by combine_python_files.py\n\n")
-
-            for filename in py_files:
-                file_path = os.path.join(target_dir, filename)
-                outfile.write(f"# ----- Begin {filename} -----\n")
-                with open(file_path, 'r', encoding='utf-8') as infile:
-                    contents = infile.read()
-                    outfile.write(contents)
-                outfile.write(f"\n# ----- End {filename} -----\n\n")
-
-        print(f"Successfully combined {len(py_files)} files into '{output_file}'.")
+        status, reused = _combine(target_dir, py_files, output_file, binary, validate, use_manifest)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
     except Exception as e:
         print(f"An error occurred while combining files: {e}")
+        return
 
-def print_usage():
-    """
-    Print usage instructions.
-    """
-    script_name = os.path.basename(sys.argv[0])
-    print(f"Usage: python {script_name} <target_directory> <output_file>")
-    print("Example:")
-    print(f"    python {script_name} ./my_python_files combined.py")
+    if status == 'up to date':
+        print(f"'{output_file}' is up to date; none of its {len(py_files)} files changed.")
+    elif status == 'unchanged':
+        print(f"Combined {len(py_files)} files; the result matches '{output_file}', which was left as it was.")
+    elif reused:
+        print(f"Successfully combined {len(py_files)} files into '{output_file}' "
+              f"({reused} unchanged, copied from the previous output).")
+    else:
+        print(f"Successfully combined {len(py_files)} files into '{output_file}'.")
 
 if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print("Error: Incorrect number of arguments.")
-        print_usage()
-        sys.exit(1)
-
-    target_directory = sys.argv[1]
-    output_python_file = sys.argv[2]
+    parser = argparse.ArgumentParser(description="Combine all .py files in a directory into a single Python file.")
+    parser.add_argument(
+        "target_directory",
+        help="Directory containing the .py files to combine."
+    )
+    parser.add_argument(
+        "output_file",
+        help="Path to the combined output file (outside the target directory)."
+    )
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="Copy file bodies byte for byte (zero-copy where the OS allows) instead of decoding them as text."
+    )
+    parser.add_argument(
+        "--no-validate",
+        action="store_true",
+        help="With --binary, skip the UTF-8 check of the input files."
+    )
+    parser.add_argument(
+        "--no-manifest",
+        action="store_true",
+        help="Rebuild the whole output without reading or writing the manifest kept next to it."
+    )
+    parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help="Include subdirectories and order modules by their imports, hoisting shared imports to the top."
+    )
+    parser.add_argument(
+        "--entry",
+        default=None,
+        metavar="MODULE",
+        help="With --bundle, keep the `if __name__ == '__main__':` block of this module (dotted name)."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="With --bundle, number of worker processes used to parse files (default: one per CPU)."
+    )
+    args = parser.parse_args()
+    if args.bundle and args.binary:
+        parser.error("--bundle rewrites imports and cannot be combined with --binary.")
 
-    combine_python_files(target_directory, output_python_file)
+    combine_python_files(args.target_directory, args.output_file, binary=args.binary,
+                         validate=not args.no_validate, bundle=args.bundle, jobs=args.jobs, entry=args.entry,
+                         use_manifest=not args.no_manifest)
@@ -0,0 +1,313 @@
+import os
+import uuid
+import sqlite3
+import hashlib
+import argparse
+from pathlib import Path
+from collections import defaultdict, namedtuple
+
+from walker import walk_tree
+from nfo import is_audio_entry
+from parallel import bounded_map
+from reporting import Reporter, add_reporting_arguments, run_reported
+
+# Stored in the library root; the leading dot keeps it out of the walker's results
+HASH_INDEX_FILENAME = ".dedupe_index.sqlite"
+
+# Bytes hashed at each end of a file in the partial-hash stage
+EDGE_SIZE = 64 * 1024
+
+# Read size for full hashes; large sequential reads keep spinning disks streaming
+READ_SIZE = 1 << 20
+
+# inode is (st_dev, st_ino), so existing hardlinks are recognized as one file
+Sample = namedtuple("Sample", ["path", "size", "mtime_ns", "inode"])
+
+class HashIndex:
+    """
+    Persistent partial and full hashes of audio files, stored as SQLite in the
+    library root.
+
+    Rows are keyed by path (relative to the root) and only trusted while the
+    file's mtime and size match, so later runs hash only new or changed files.
+    The table is loaded up front; save() writes this run's hashes and drops rows
+    for files that are gone.
+    """
+
+    def __init__(self, root_path, filename=HASH_INDEX_FILENAME):
+        self.root_path = os.fspath(root_path)
+        self.connection = sqlite3.connect(os.path.join(self.root_path, filename))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, partial TEXT, full TEXT)"
+        )
+        self.rows = {
+            path: (mtime_ns, size, partial, full)
+            for path, mtime_ns, size, partial, full in self.connection.execute(
+                "SELECT path, mtime_ns, size, partial, full FROM hashes")
+        }
+        self.current = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _key(self, path):
+        return os.path.relpath(os.fspath(path), self.root_path).replace(os.sep, '/')
+
+    def get(self, sample, kind):
+        """
+        Returns the stored 'partial' or 'full' hash of sample if the file is
+        unchanged, otherwise None.
+        """
+        key = self._key(sample.path)
+        row = self.current.get(key) or self.rows.get(key)
+        if row is None or (row[0], row[1]) != (sample.mtime_ns, sample.size):
+            return None
+        return row[2] if kind == 'partial' else row[3]
+
+    def put(self, sample, partial=None, full=None):
+        """
+        Records hashes of sample; hashes passed as None keep their stored value.
+        """
+        key = self._key(sample.path)
+        previous = self.current.get(key) or self.rows.get(key)
+        if previous is None or (previous[0], previous[1]) != (sample.mtime_ns, sample.size):
+            previous = (sample.mtime_ns, sample.size, None, None)
+        self.current[key] = (sample.mtime_ns, sample.size, partial or previous[2], full or previous[3])
+
+    def save(self, samples):
+        """
+        Replaces the stored table with the hashes of the given samples.
+        """
+        rows = []
+        for sample in samples:
+            key = self._key(sample.path)
+            row = self.current.get(key) or self.rows.get(key)
+            if row is not None and (row[0], row[1]) == (sample.mtime_ns, sample.size):
+                rows.append((key,) + row)
+        with self.connection:
+            self.connection.execute("DELETE FROM hashes")
+            self.connection.executemany(
+                "INSERT INTO hashes (path, mtime_ns, size, partial, full) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def close(self):
+        """
+        Closes the database without saving.
+        """
+        self.connection.close()
+
+def partial_hash(path, size):
+    """
+    Returns a digest of the first and last EDGE_SIZE bytes of a file, or None if
+    it cannot be read. For files of at most 2 * EDGE_SIZE bytes this covers the
+    whole content.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, 'rb') as f:
+            digest.update(f.read(EDGE_SIZE))
+            if size > 2 * EDGE_SIZE:
+                f.seek(size - EDGE_SIZE)
+            digest.update(f.read(EDGE_SIZE))
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def full_hash(path):
+    """
+    Returns a digest of a file's whole content read in large sequential blocks,
+    or None if it cannot be read.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            buffer = bytearray(READ_SIZE)
+            view = memoryview(buffer)
+            while read := f.readinto(buffer):
+                digest.update(view[:read])
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def collect_samples(root_path, ignore_patterns=(), scan_jobs=1, reporter=None):
+    """
+    Walks root_path and returns a Sample for every audio file. Symlinks are skipped.
+    """
+    reporter = reporter or Reporter('verbose')
+    samples = []
+    for entry, _ in walk_tree(root_path, ignore_patterns, jobs=scan_jobs):
+        if entry.is_symlink() or not is_audio_entry(entry):
+            continue
+        try:
+            st = entry.stat()
+        except OSError as e:
+            reporter.error(f"Error reading {entry.path}: {e}")
+            continue
+        reporter.count('scanned')
+        samples.append(Sample(entry.path, st.st_size, st.st_mtime_ns, (st.st_dev, st.st_ino)))
+    return samples
+
+def _refine(groups, kind, hash_function, jobs, hash_index, reporter):
+    # Splits each group by a hash; files that share an inode are hashed once
+    refined = []
+    todo = []
+    hashes = {}
+    for group in groups:
+        for sample in group:
+            if sample.inode in hashes:
+                continue
+            known = hash_index.get(sample, kind) if hash_index else None
+            if known:
+                hashes[sample.inode] = known
+            else:
+                hashes[sample.inode] = None
+                todo.append(sample)
+    for sample, digest in zip(todo, bounded_map(hash_function, todo, jobs)):
+        hashes[sample.inode] = digest
+        reporter.count(f'{kind}_hashes')
+    for group in groups:
+        by_hash = defaultdict(list)
+        for sample in group:
+            digest = hashes[sample.inode]
+            if digest is None:
+                reporter.error(f"Error reading {sample.path}")
+                continue
+            if hash_index:
+                hash_index.put(sample, **{kind: digest})
+            by_hash[digest].append(sample)
+        refined.extend(members for members in by_hash.values() if len({s.inode for s in members}) > 1)
+    return refined
+
+def find_duplicates(samples, jobs=4, hash_index=None, reporter=None):
+    """
+    Returns the groups of byte-identical samples, each sorted by path.
+
+    Candidates are narrowed in stages: equal size, then equal hashes of the first
+    and last 64 KiB, and only then equal full-content hashes, computed on `jobs`
+    threads. Paths that are already hardlinks of one file count as a single file.
+    """
+    reporter = reporter or Reporter('verbose')
+    by_size = defaultdict(list)
+    for sample in samples:
+        if sample.size:
+            by_size[sample.size].append(sample)
+    groups = [group for group in by_size.values() if len({s.inode for s in group}) > 1]
+
+    with reporter.phase('partial'):
+        groups = _refine(groups, 'partial', lambda s: partial_hash(s.path, s.size), jobs, hash_index, reporter)
+    # Small files were hashed completely in the partial stage
+    complete = [group for group in groups if group[0].size <= 2 * EDGE_SIZE]
+    with reporter.phase('full'):
+        groups = _refine([group for group in groups if group[0].size > 2 * EDGE_SIZE], 'full',
+                         lambda s: full_hash(s.path), jobs, hash_index, reporter)
+    return sorted((sorted(group) for group in complete + groups), key=lambda group: group[0].path)
+
+def hardlink_duplicates(groups, reporter=None):
+    """
+    Replaces every copy in each group by a hardlink to the group's first path.
+    Each replacement goes through a temporary link that is renamed over the copy,
+    so a failure never leaves a copy missing. Files that changed since they were
+    hashed are left alone.
+    """
+    reporter = reporter or Reporter('verbose')
+    for group in groups:
+        keeper = group[0]
+        for sample in group[1:]:
+            if sample.inode == keeper.inode:
+                continue
+            directory, name = os.path.split(sample.path)
+            temp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+            try:
+                for current in (keeper, sample):
+                    st = os.stat(current.path)
+                    if (st.st_size, st.st_mtime_ns) != (current.size, current.mtime_ns):
+                        raise OSError(f"{current.path} changed since it was hashed")
+                os.link(keeper.path, temp_path)
+                os.replace(temp_path, sample.path)
+            except OSError as e:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                reporter.event('failed', sample.path, [f"Error linking {sample.path}: {e}"])
+                continue
+            reporter.event('linked', sample.path, [f"Linked: {sample.path} -> {keeper.path}"])
+
+def main(root_path, ignore_patterns=(), scan_jobs=1, jobs=4, use_index=True, hardlink=False, reporter=None):
+    """
+    Reports groups of byte-identical audio files below root_path and, with
+    hardlink, replaces the copies by hardlinks. Returns the duplicate groups.
+    """
+    reporter = reporter or Reporter('verbose')
+    if not os.path.isdir(root_path):
+        reporter.error(f"The provided path '{root_path}' is not a directory.")
+        return None
+    hash_index = HashIndex(root_path) if use_index else None
+    try:
+        with reporter.phase('walk'):
+            samples = collect_samples(root_path, ignore_patterns, scan_jobs, reporter)
+        groups = find_duplicates(samples, jobs, hash_index, reporter)
+        if hash_index:
+            hash_index.save(samples)
+    finally:
+        if hash_index:
+            hash_index.close()
+
+    for group in groups:
+        copies = len({sample.inode for sample in group})
+        reporter.count('groups')
+        reporter.count('reclaimable_bytes', group[0].size * (copies - 1))
+        reporter.info(f"{copies} copies of {group[0].size} bytes:")
+        for sample in group:
+            reporter.info(f"  {sample.path}")
+    if hardlink:
+        with reporter.phase('link'):
+            hardlink_duplicates(groups, reporter)
+    return groups
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find byte-identical audio files and optionally replace them with hardlinks.")
+    parser.add_argument(
+        "input_directory",
+        type=str,
+        help="Path to the root directory containing the audio files."
+    )
+    parser.add_argument(
+        "--hardlink",
+        action="store_true",
+        help="Replace every duplicate with a hardlink to the first copy (same filesystem only)."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Number of threads used to hash files (default: 4)."
+    )
+    parser.add_argument(
+        "--scan-jobs",
+        type=int,
+        default=1,
+        help="Number of threads used to list directories during the scan (default: 1)."
+    )
+    parser.add_argument(
+        "--ignore",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Glob pattern for file or folder names to skip, including their subtrees. Can be repeated."
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Do not read or update the persistent hash index and hash every candidate again."
+    )
+    add_reporting_arguments(parser)
+    args = parser.parse_args()
+    run_reported(main, args, Path(args.input_directory).resolve(), ignore_patterns=args.ignore,
+                 scan_jobs=args.scan_jobs, jobs=args.jobs, use_index=not args.no_index, hardlink=args.hardlink)
@@ -0,0 +1,85 @@
+import os
+import json
+import time
+import sqlite3
+
+# Stored in the library root; the leading dot keeps it out of the walker's results
+CACHE_FILENAME = ".filenamer_cache.sqlite"
+
+# Separate record for runs with tempo detection, which normalize names differently
+DETECT_BPM_CACHE_FILENAME = ".filenamer_cache_bpm.sqlite"
+
+# Directories modified this recently are not cached, because a change within the
+# same timestamp tick would not alter their mtime
+RACY_WINDOW_NS = 2_000_000_000
+
+class DirectoryCache:
+    """
+    Persistent record of directories whose children were already normalized,
+    stored as SQLite in the library root.
+
+    Each row holds a directory's path (relative to the root), its mtime and the
+    names of its subdirectories. Adding, removing or renaming a child changes a
+    directory's mtime, so a directory whose mtime still matches its row needs no
+    listing: its children are known to be normalized and its subdirectories are
+    known without a scandir. The whole table is loaded up front and replaced by
+    save() after a successful run.
+    """
+
+    def __init__(self, root_path, filename=CACHE_FILENAME):
+        self.root_path = os.fspath(root_path)
+        self.connection = sqlite3.connect(os.path.join(self.root_path, filename))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY, mtime_ns INTEGER, subdirs TEXT)"
+        )
+        self.entries = {
+            path: (mtime_ns, subdirs)
+            for path, mtime_ns, subdirs in self.connection.execute("SELECT path, mtime_ns, subdirs FROM directories")
+        }
+        self.clean = {}
+        self.started_ns = time.time_ns()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _key(self, path):
+        return os.path.relpath(os.fspath(path), self.root_path).replace(os.sep, '/')
+
+    def lookup(self, path, mtime_ns):
+        """
+        Returns the subdirectory names of path if it was normalized at this mtime,
+        otherwise None.
+        """
+        entry = self.entries.get(self._key(path))
+        if entry is None or entry[0] != mtime_ns:
+            return None
+        return json.loads(entry[1])
+
+    def mark_clean(self, path, mtime_ns, subdirs):
+        """
+        Notes that the children of path needed no renames at mtime_ns. Takes
+        effect when save() is called.
+        """
+        if mtime_ns > self.started_ns - RACY_WINDOW_NS:
+            return
+        self.clean[self._key(path)] = (mtime_ns, json.dumps(subdirs))
+
+    def save(self):
+        """
+        Replaces the stored table with the directories marked clean in this run.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM directories")
+            self.connection.executemany(
+                "INSERT INTO directories (path, mtime_ns, subdirs) VALUES (?, ?, ?)",
+                ((path, mtime_ns, subdirs) for path, (mtime_ns, subdirs) in self.clean.items())
+            )
+
+    def close(self):
+        """
+        Closes the database without saving.
+        """
+        self.connection.close()
@@ -1,47 +1,450 @@
-import os, re, sys
+import os, re
+import uuid
+import errno
+import argparse
+from contextlib import nullcontext
+from collections import Counter, defaultdict, namedtuple
+
+from walker import make_filter, scan_directory
+from parallel import bounded_map
+from journal import RenameJournal, find_interrupted_journal, new_journal_path, read_journal
+from dircache import CACHE_FILENAME, DETECT_BPM_CACHE_FILENAME, DirectoryCache
+from bpm import BPM_EXTENSIONS, BpmCache, detect_bpms
+from reporting import Reporter, add_reporting_arguments, run_reported
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.aac', '.ogg', '.mid', '.aif', '.aiff')
+
+# Name transforms, compiled once instead of on every call
+BPM_PATTERN = re.compile(r'\b(\d{2,3})\s?bpm\b', re.IGNORECASE)
+SEPARATOR_PATTERN = re.compile(r'[_\-]+')
+SPACE_PATTERN = re.compile(r'\s+')
+SPACED_BPM_PATTERN = re.compile(r'B\s+P\s+M', re.IGNORECASE)
+# Any tempo tag, including ones glued to the name that BPM_PATTERN does not pick up
+LOOSE_BPM_PATTERN = re.compile(r'\d{2,3}\s?bpm', re.IGNORECASE)
+
+# One rename inside a directory. display_name is the entry's name at scan time, or
+# None for the intermediate step that parks an entry under a temporary name.
+Rename = namedtuple("Rename", ["old_name", "new_name", "display_name"])
+
+# The ordered renames of the direct children of one directory
+DirectoryPlan = namedtuple("DirectoryPlan", ["path", "depth", "renames"])
 
 def format_filename(filename, bpm):
     name, ext = os.path.splitext(filename)
     # Remove any existing BPM references first
-    name = re.sub(r'\b\d{2,3}\s?bpm\b', '', name, flags=re.IGNORECASE)
-    name = re.sub(r'[_\-]+', '', name)
-    name = re.sub(r'(?<!^)(?=[A-Z])', '', name).title()
-    name = re.sub(r'\s+', ' ', name)  # Shrink multiple spaces to single space
-    name = re.sub(r'B\s+P\s+M', 'BPM', name, flags=re.IGNORECASE)  # Remove spaces in BPM
+    name = BPM_PATTERN.sub('', name)
+    name = SEPARATOR_PATTERN.sub('', name).title()
+    name = SPACE_PATTERN.sub(' ', name)  # Shrink multiple spaces to single space
+    name = SPACED_BPM_PATTERN.sub('BPM', name)  # Remove spaces in BPM
     if bpm:
         name = f"{name}{int(bpm)}BPM"
     return f"{name}{ext}"
 
 def format_dirname(dirname):
-    name = re.sub(r'[_\-]+', '', dirname)
-    name = re.sub(r'(?<!^)(?=[A-Z])', '', name).title()
-    name = re.sub(r'\s+', ' ', name)  # Shrink multiple spaces to single space
-    name = re.sub(r'B\s+P\s+M', 'BPM', name, flags=re.IGNORECASE)  # Remove spaces in BPM
+    name = SEPARATOR_PATTERN.sub('', dirname).title()
+    name = SPACE_PATTERN.sub(' ', name)  # Shrink multiple spaces to single space
+    name = SPACED_BPM_PATTERN.sub('BPM', name)  # Remove spaces in BPM
     return name
 
-def main(directory):
-    for root, dirs, files in os.walk(directory, topdown=True):
-        # Format and rename directories
-        for i, dirname in enumerate(dirs):
-            new_dirname = format_dirname(dirname)
-            if new_dirname != dirname:
-                old_path = os.path.join(root, dirname)
-                new_path = os.path.join(root, new_dirname)
-                os.rename(old_path, new_path)
-                dirs[i] = new_dirname
-
-        # Format and rename files
-        for filename in files:
-            filepath = os.path.join(root, filename)
-            if os.path.isfile(filepath):
-                name, ext = os.path.splitext(filename)
-                if ext.lower() in ['.mp3', '.wav', '.flac', '.aac', '.ogg', '.mid']:
-                    bpm_match = re.search(r'\b(\d{2,3})\s?bpm\b', name, re.IGNORECASE)
-                    bpm = float(bpm_match.group(1)) if bpm_match else None
-                    new_name = format_filename(filename, bpm)
-                    if new_name != filename:
-                        new_path = os.path.join(root, new_name)
-                        os.rename(filepath, new_path)
+def find_bpm(name):
+    """
+    Returns the tempo tagged in a name such as 'Loop 120 bpm', or None.
+    """
+    match = BPM_PATTERN.search(name)
+    return float(match.group(1)) if match else None
+
+def needs_bpm(entry):
+    """
+    Returns True for WAV/AIFF files whose name carries no tempo in any form.
+    """
+    name, ext = os.path.splitext(entry.name)
+    return ext.lower() in BPM_EXTENSIONS and not LOOSE_BPM_PATTERN.search(name) and entry.is_file()
+
+def desired_name(entry, bpms=None):
+    """
+    Returns the normalized name for a DirEntry, or None if the entry is not renamed
+    by this tool (anything but directories and audio files). bpms maps paths to
+    detected tempos, used for files whose name carries none.
+    """
+    if entry.is_dir():
+        return format_dirname(entry.name)
+    name, ext = os.path.splitext(entry.name)
+    if ext.lower() in AUDIO_EXTENSIONS and entry.is_file():
+        bpm = find_bpm(name)
+        if bpm is None and bpms and entry.path in bpms:
+            # Formatted as if the name were tagged, so the result is stable on later runs
+            bpm = round(bpms[entry.path])
+            return format_filename(f"{name} {bpm}bpm{ext}", bpm)
+        return format_filename(entry.name, bpm)
+    return None
+
+def plan_directory(entries, bpms=None):
+    """
+    Works out the renames of the direct children of one directory.
+
+    Returns (renames, conflicts, unchanged). renames is a list of Rename steps in an
+    order that never overwrites an entry: chains are ordered so each name is vacated
+    before it is reused, and cycles are broken by parking one entry under a
+    temporary name. conflicts lists (name, new_name, reason) for entries that are
+    left alone because the new name is taken by an entry that stays, is claimed by
+    several entries, or is empty. unchanged lists audio files that are already normalized.
+    """
+    names = [entry.name for entry in entries]
+    wanted = {}
+    unchanged = []
+    conflicts = []
+    for entry in entries:
+        new_name = desired_name(entry, bpms)
+        if new_name is None:
+            continue
+        if new_name == entry.name:
+            if not entry.is_dir():
+                unchanged.append(entry.name)
+        elif not new_name.strip('.'):
+            conflicts.append((entry.name, new_name, "is not a valid name"))
+        else:
+            wanted[entry.name] = new_name
+
+    # Dropping a rename keeps its name occupied, which can block further renames
+    while True:
+        staying = set(names) - set(wanted)
+        claims = Counter(wanted.values())
+        blocked = [name for name, new_name in wanted.items() if new_name in staying or claims[new_name] > 1]
+        if not blocked:
+            break
+        for name in blocked:
+            new_name = wanted.pop(name)
+            reason = "is already taken" if new_name in staying else "is claimed by several entries"
+            conflicts.append((name, new_name, reason))
+
+    renames = []
+    pending = {name: (new_name, name) for name, new_name in wanted.items()}
+    while pending:
+        ready = [name for name, (new_name, _) in pending.items() if new_name not in pending]
+        if ready:
+            for name in ready:
+                new_name, display_name = pending.pop(name)
+                renames.append(Rename(name, new_name, display_name))
+            continue
+        # Only cycles are left: park one entry to free its name
+        name, (new_name, display_name) = next(iter(pending.items()))
+        parked = f".{name}.{uuid.uuid4().hex}.renaming"
+        renames.append(Rename(name, parked, None))
+        del pending[name]
+        pending[parked] = (new_name, display_name)
+    return renames, conflicts, unchanged
+
+def scan_tree(directory, visit, jobs=1, cache=None):
+    """
+    Lists directory breadth-first on `jobs` worker threads, calling visit(entries)
+    on the worker for every listed directory, and yields
+    (path, depth, mtime_ns, subdir_names, result) per directory.
+
+    With a DirectoryCache, directories whose mtime matches the cache cost a single
+    stat: they are not listed, their subdirectories come from the cache, and
+    result is None. Symlinked directories are not entered.
+    """
+    keep = make_filter(skip_hidden=False)
+
+    def scan(item):
+        path, depth = item
+        mtime_ns = None
+        if cache is not None:
+            try:
+                # Taken before listing, so a change during the scan invalidates the entry
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                pass
+            names = cache.lookup(path, mtime_ns) if mtime_ns is not None else None
+            if names is not None:
+                return path, depth, mtime_ns, names, None
+        entries = scan_directory(path, keep)
+        subdirs = [entry.name for entry in entries if entry.is_dir(follow_symlinks=False)]
+        return path, depth, mtime_ns, subdirs, visit(entries)
+
+    level = [(os.fspath(directory), 0)]
+    while level:
+        next_level = []
+        for path, depth, mtime_ns, subdirs, result in bounded_map(scan, level, jobs):
+            yield path, depth, mtime_ns, subdirs, result
+            next_level.extend((os.path.join(path, name), depth + 1) for name in subdirs)
+        level = next_level
+
+def build_plan(directory, jobs=1, reporter=None, cache=None, bpms=None):
+    """
+    Scans directory breadth-first without touching it and returns the list of
+    DirectoryPlans for every directory that has something to rename.
+
+    Each level of the tree is listed and planned on `jobs` worker threads.
+    Conflicts and already normalized files are reported while scanning.
+    Directories the DirectoryCache knows to be unchanged are skipped, and those
+    that need no renames are marked clean in it. bpms maps file paths to detected
+    tempos for files whose name carries none.
+    """
+    reporter = reporter or Reporter('verbose')
+
+    def visit(entries):
+        return (len(entries),) + plan_directory(entries, bpms)
+
+    plans = []
+    for path, depth, mtime_ns, subdirs, result in scan_tree(directory, visit, jobs, cache):
+        if result is None:
+            reporter.count('cached')
+            result = (0, [], [], [])
+        scanned, renames, conflicts, unchanged = result
+        reporter.count('scanned', scanned)
+        if cache is not None and mtime_ns is not None and not renames and not conflicts:
+            cache.mark_clean(path, mtime_ns, subdirs)
+        for name in unchanged:
+            reporter.event('skipped', os.path.join(path, name))
+        for name, new_name, reason in conflicts:
+            reporter.count('conflicts')
+            reporter.error(f"Not renaming {os.path.join(path, name)}: '{new_name}' {reason}")
+        if renames:
+            plans.append(DirectoryPlan(path, depth, renames))
+    return plans
+
+def find_bpm_candidates(directory, jobs=1, cache=None):
+    """
+    Returns the paths of WAV/AIFF files below directory whose name carries no
+    tempo, skipping directories the DirectoryCache knows to be unchanged.
+    """
+    def visit(entries):
+        return [entry.path for entry in entries if needs_bpm(entry)]
+
+    return [path for *_, result in scan_tree(directory, visit, jobs, cache) if result for path in result]
+
+def describe_plan(plans, reporter):
+    """
+    Reports every planned rename without touching the disk.
+    """
+    for plan in plans:
+        for step in plan.renames:
+            if step.display_name is None:
+                continue
+            reporter.count('planned')
+            reporter.info(f"Would rename: {os.path.join(plan.path, step.display_name)} -> "
+                          f"{os.path.join(plan.path, step.new_name)}")
+
+def apply_directory(plan, done_steps=frozenset(), resuming=False):
+    """
+    Performs the renames of one DirectoryPlan in order and returns the outcome of
+    each as (step index, status, path, message). A rename whose target exists by
+    now (because an earlier step failed or the tree changed since it was scanned)
+    fails instead of overwriting it.
+
+    Steps in done_steps are skipped. When resuming an interrupted run, a step whose
+    source is gone and whose target exists is taken as already done.
+    """
+    outcomes = []
+    for index, step in enumerate(plan.renames):
+        if index in done_steps:
+            continue
+        old_path = os.path.join(plan.path, step.old_name)
+        new_path = os.path.join(plan.path, step.new_name)
+        shown_path = os.path.join(plan.path, step.display_name or step.old_name)
+        if resuming and not os.path.lexists(old_path) and os.path.lexists(new_path):
+            outcomes.append((index, 'resumed' if step.display_name else None, new_path, f"Already renamed: {shown_path}"))
+            continue
+        try:
+            # Case-only renames see the entry itself on case-insensitive filesystems
+            if os.path.lexists(new_path) and not os.path.samefile(old_path, new_path):
+                raise FileExistsError(errno.EEXIST, "Target already exists", new_path)
+            os.rename(old_path, new_path)
+        except OSError as e:
+            outcomes.append((index, 'failed', shown_path, f"Error renaming {shown_path}: {e}"))
+            continue
+        # Parking steps are journaled but not reported
+        outcomes.append((index, 'renamed' if step.display_name else None, new_path, f"Renamed: {shown_path} -> {new_path}"))
+    return outcomes
+
+def apply_plan(plans, jobs=1, reporter=None, journal=None, done=frozenset(), resuming=False):
+    """
+    Applies DirectoryPlans deepest level first, so every planned path is still
+    valid when its rename runs. Directories on the same level are independent
+    subtrees and are renamed in parallel on `jobs` worker threads.
+
+    Completed renames are recorded in journal, if given, by (plan index, step
+    index); pairs already in done are skipped.
+    """
+    reporter = reporter or Reporter('verbose')
+    done_by_plan = defaultdict(set)
+    for plan_id, step in done:
+        done_by_plan[plan_id].add(step)
+    levels = defaultdict(list)
+    for plan_id, plan in enumerate(plans):
+        levels[plan.depth].append((plan_id, plan))
+
+    def apply(job):
+        plan_id, plan = job
+        return plan_id, apply_directory(plan, done_by_plan.get(plan_id, frozenset()), resuming)
+
+    for depth in sorted(levels, reverse=True):
+        for plan_id, outcomes in bounded_map(apply, levels[depth], jobs):
+            for index, status, path, message in outcomes:
+                if status != 'failed' and journal:
+                    journal.record_done(plan_id, index)
+                if status:
+                    reporter.event(status, path, [message])
+
+def undo_directory(plan):
+    """
+    Reverses the renames of one DirectoryPlan, last step first, and returns the
+    outcomes like apply_directory. Steps that were never applied are left alone,
+    and a name that has been reused since is not overwritten.
+    """
+    outcomes = []
+    for index in range(len(plan.renames) - 1, -1, -1):
+        step = plan.renames[index]
+        old_path = os.path.join(plan.path, step.old_name)
+        new_path = os.path.join(plan.path, step.new_name)
+        if not os.path.lexists(new_path):
+            continue
+        try:
+            if os.path.lexists(old_path) and not os.path.samefile(old_path, new_path):
+                raise FileExistsError(errno.EEXIST, "Target already exists", old_path)
+            os.rename(new_path, old_path)
+        except OSError as e:
+            outcomes.append((index, 'failed', new_path, f"Error restoring {new_path}: {e}"))
+            continue
+        if step.display_name is not None:
+            outcomes.append((index, 'restored', old_path, f"Restored: {new_path} -> {old_path}"))
+    return outcomes
+
+def undo_run(journal_path, jobs=1, reporter=None):
+    """
+    Reverses every rename recorded in a journal in one pass, shallowest level
+    first so the recorded paths are valid again by the time each level is undone.
+    Works for finished and interrupted runs alike, and marks the journal as undone.
+    """
+    reporter = reporter or Reporter('verbose')
+    state = read_journal(journal_path)
+    if state.finished == 'undone':
+        reporter.error(f"Journal {journal_path} has already been undone.")
+        return
+    levels = defaultdict(list)
+    for directory, depth, renames in state.plans:
+        levels[depth].append(DirectoryPlan(directory, depth, [Rename(*step) for step in renames]))
+    with reporter.phase('undo'):
+        for depth in sorted(levels):
+            for outcomes in bounded_map(undo_directory, levels[depth], jobs):
+                for index, status, path, message in outcomes:
+                    reporter.event(status, path, [message])
+    with RenameJournal(journal_path) as journal:
+        journal.finish('undone')
+
+def main(directory, reporter=None, dry_run=False, jobs=1, journal_path=None, use_cache=True,
+         detect_bpm=False, bpm_processes=None):
+    """
+    Normalizes the audio file and folder names below directory. The whole tree is
+    planned first and then renamed in bulk; with dry_run the plan is only printed.
+
+    The run is recorded in a journal (a timestamped file in directory unless
+    journal_path is given). If the journal of an interrupted run is found, that run
+    is resumed from its recorded plan instead of rescanning the tree.
+
+    Unless use_cache is False or this is a dry run, directories left unchanged
+    since the last successful run are skipped through the DirectoryCache in
+    directory.
+
+    With detect_bpm, WAV/AIFF files without a tempo in their name are analyzed on
+    `bpm_processes` worker processes and get the detected tempo appended; the
+    tempos are kept in a BpmCache in directory, except on a dry run.
+    Returns the list of DirectoryPlans.
+    """
+    reporter = reporter or Reporter('verbose')
+    if not dry_run:
+        interrupted = journal_path if journal_path and os.path.exists(journal_path) else find_interrupted_journal(directory)
+        if interrupted:
+            state = read_journal(interrupted)
+            if state.finished or not state.planned:
+                reporter.error(f"Journal {interrupted} does not belong to an interrupted run.")
+                return []
+            reporter.info(f"Resuming interrupted run from {interrupted}")
+            plans = [DirectoryPlan(path, depth, [Rename(*step) for step in renames])
+                     for path, depth, renames in state.plans]
+            with RenameJournal(interrupted) as journal, reporter.phase('rename'):
+                apply_plan(plans, jobs, reporter, journal, state.done, resuming=True)
+                journal.finish()
+            return plans
+
+    # A dry run leaves nothing behind in the library, so it neither reads nor records the caches
+    cache = None
+    if use_cache and not dry_run:
+        cache = DirectoryCache(directory, DETECT_BPM_CACHE_FILENAME if detect_bpm else CACHE_FILENAME)
+    try:
+        bpms = None
+        if detect_bpm:
+            with reporter.phase('bpm'):
+                candidates = find_bpm_candidates(directory, jobs, cache)
+                with nullcontext() if dry_run else BpmCache(directory) as bpm_cache:
+                    bpms = detect_bpms(candidates, bpm_cache, bpm_processes, jobs, reporter)
+        with reporter.phase('plan'):
+            plans = build_plan(directory, jobs, reporter, cache, bpms)
+        if dry_run:
+            describe_plan(plans, reporter)
+            return plans
+        if plans:
+            with RenameJournal(journal_path or new_journal_path(directory)) as journal:
+                with reporter.phase('journal'):
+                    journal.write_plan(directory, plans)
+                with reporter.phase('rename'):
+                    apply_plan(plans, jobs, reporter, journal)
+                journal.finish()
+        if cache:
+            cache.save()
+    finally:
+        if cache:
+            cache.close()
+    return plans
 
 if __name__ == "__main__":
-    main(sys.argv[1] if len(sys.argv) > 1 else '.')
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Normalize audio file and folder names, appending detected BPM.")
+    parser.add_argument('directory', nargs='?', default='.', help="Root directory to process (default: current directory).")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the planned renames without touching the disk."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker threads used to scan and to rename independent subtrees (default: 1)."
+    )
+    parser.add_argument(
+        "--journal",
+        metavar="FILE",
+        default=None,
+        help="Journal file for this run (default: a timestamped .filenamer-journal-*.jsonl in the directory). "
+             "An unfinished journal is resumed."
+    )
+    parser.add_argument(
+        "--undo",
+        metavar="JOURNAL",
+        default=None,
+        help="Reverse every rename recorded in JOURNAL instead of renaming."
+    )
+    parser.add_argument(
+        "--detect-bpm",
+        action="store_true",
+        help="Detect the tempo of WAV/AIFF files without one in their name and append it (requires NumPy)."
+    )
+    parser.add_argument(
+        "--bpm-processes",
+        type=int,
+        default=None,
+        help="Number of worker processes used for tempo detection (default: one per CPU)."
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or update the directory cache and re-check every folder."
+    )
+    add_reporting_arguments(parser)
+    args = parser.parse_args()
+    if args.undo:
+        run_reported(undo_run, args, args.undo, jobs=args.jobs)
+    else:
+        run_reported(main, args, args.directory, dry_run=args.dry_run, jobs=args.jobs, journal_path=args.journal, use_cache=not args.no_cache,
+                     detect_bpm=args.detect_bpm, bpm_processes=args.bpm_processes)
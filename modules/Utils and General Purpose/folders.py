@@ -1,109 +1,396 @@
 import os
+import json
+import argparse
 from pathlib import Path
 
-def create_placeholder_file(file_path, content="Placeholder"):
-    """
-    Creates a placeholder file with the given content.
-    If the file already exists, it skips creation.
-    """
-    if not file_path.exists():
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"Created file: {file_path}")
-    else:
-        print(f"File already exists: {file_path}")
-
-def generate_soundkit_structure(base_path):
-    """
-    Generates a comprehensive sound kit folder structure with placeholder .nfo and .png files.
-    """
-    # Define the folder structure as a nested dictionary
-    soundkit_structure = {
-        "Drums": {
-            "BassDrum": {},
-            "Snare": {},
-            "Toms": {
-                "HighTom": {},
-                "MidTom": {},
-                "LowTom": {}
-            },
-            "Cymbals": {
-                "HiHat": {},
-                "Crash": {},
-                "Ride": {}
-            },
-            "Accessories": {
-                "Stands": {},
-                "Pedals": {}
-            }
-        },
-        "Bass": {
-            "ElectricBass": {},
-            "AcousticBass": {}
-        },
-        "Synths": {
-            "AnalogSynth": {},
-            "DigitalSynth": {}
-        },
-        "Guitars": {
-            "ElectricGuitar": {},
-            "AcousticGuitar": {}
-        },
-        "Vocals": {
-            "LeadVocals": {},
-            "BackingVocals": {}
-        },
-        "Effects": {
-            "Reverbs": {},
-            "Delays": {},
-            "OtherEffects": {}
+from gradient import hue_to_color
+from archive import ArchiveSink, add_archive_arguments
+from icons import generate_icons, pillow_available
+from parallel import bounded_map, chunked
+from reporting import Reporter, add_reporting_arguments, run_reported
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+# Directories or placeholder files created per worker task
+BATCH_SIZE = 256
+
+# Keys starting with '_' are folder options rather than subfolders:
+# _placeholder is the stem of the folder's .nfo/.png placeholders (false for none)
+# and _content the text of its .nfo placeholder.
+OPTION_KEYS = ('_placeholder', '_content')
+
+# Define the folder structure as a nested dictionary
+SOUNDKIT_STRUCTURE = {
+    "Drums": {
+        "BassDrum": {},
+        "Snare": {},
+        "Toms": {
+            "HighTom": {},
+            "MidTom": {},
+            "LowTom": {}
         },
-        "Misc": {
-            "Loops": {},
-            "OneShots": {}
+        "Cymbals": {
+            "HiHat": {},
+            "Crash": {},
+            "Ride": {}
         },
-        "Documentation": {
-            "README": {}
+        "Accessories": {
+            "Stands": {},
+            "Pedals": {}
         }
+    },
+    "Bass": {
+        "ElectricBass": {},
+        "AcousticBass": {}
+    },
+    "Synths": {
+        "AnalogSynth": {},
+        "DigitalSynth": {}
+    },
+    "Guitars": {
+        "ElectricGuitar": {},
+        "AcousticGuitar": {}
+    },
+    "Vocals": {
+        "LeadVocals": {},
+        "BackingVocals": {}
+    },
+    "Effects": {
+        "Reverbs": {},
+        "Delays": {},
+        "OtherEffects": {}
+    },
+    "Misc": {
+        "Loops": {},
+        "OneShots": {}
+    },
+    "Documentation": {
+        "_placeholder": "README",
+        "_content": "SoundKit Documentation",
+        "README": {}
     }
+}
 
-    def create_structure(current_path, structure):
+def is_valid_name(name):
+    """
+    Returns True if name can be used as a single folder or file name below a kit
+    root: it is not blank, '.' or '..', and contains no path separator.
+    """
+    return name not in ('.', '..') and '/' not in name and os.sep not in name and bool(name.strip())
+
+def validate_structure(structure, where="template"):
+    """
+    Checks that structure is a nested dictionary of folder names with valid
+    options, and raises ValueError naming the first problem found.
+    """
+    if not isinstance(structure, dict):
+        raise ValueError(f"{where}: expected a table of folders, got {type(structure).__name__}")
+    for name, value in structure.items():
+        if name.startswith('_'):
+            if name not in OPTION_KEYS:
+                raise ValueError(f"{where}: unknown option '{name}' (expected one of {', '.join(OPTION_KEYS)})")
+            if name == '_placeholder' and value is not False and not (isinstance(value, str) and is_valid_name(value)):
+                raise ValueError(f"{where}: '_placeholder' must be a file name stem or false")
+            if name == '_content' and not isinstance(value, str):
+                raise ValueError(f"{where}: '_content' must be a string")
+            continue
+        if not is_valid_name(name):
+            raise ValueError(f"{where}: '{name}' is not a valid folder name")
+        validate_structure(value, f"{where}/{name}")
+
+def load_template(template_path):
+    """
+    Reads a scaffold template from a .json or .toml file and returns its structure.
+    A template has the same shape as SOUNDKIT_STRUCTURE. Raises ValueError if the
+    file cannot be read or parsed, or describes an invalid structure.
+    """
+    template_path = Path(template_path)
+    is_toml = template_path.suffix.lower() == '.toml'
+    if is_toml and tomllib is None:
+        raise ValueError("TOML templates need Python 3.11 or newer")
+    try:
+        if is_toml:
+            with open(template_path, 'rb') as f:
+                structure = tomllib.load(f)
+        else:
+            with open(template_path, encoding='utf-8') as f:
+                structure = json.load(f)
+    except OSError as e:
+        raise ValueError(f"Cannot read {template_path}: {e}") from None
+    except ValueError as e:
+        # Covers JSON and TOML syntax errors as well as undecodable text
+        raise ValueError(f"Cannot parse {template_path}: {e}") from None
+    validate_structure(structure, template_path.name)
+    if not any(not name.startswith('_') for name in structure):
+        raise ValueError(f"{template_path.name}: the template has no folders")
+    return structure
+
+def plan_scaffold(roots, structure):
+    """
+    Lays structure out below every root and returns (levels, placeholders).
+
+    levels[depth] lists the directories at that depth, with the roots at depth 0.
+    placeholders lists (nfo_path, content, png_path, label, color_hex) for every
+    folder with placeholders, in a rainbow gradient that is the same for each root.
+    """
+    levels = [list(roots)]
+    slots = []
+
+    def add(current_path, structure, depth):
         for folder, subfolders in structure.items():
+            if folder.startswith('_'):
+                continue
             folder_path = current_path / folder
-            folder_path.mkdir(parents=True, exist_ok=True)
-            print(f"Created directory: {folder_path}")
+            if len(levels) <= depth:
+                levels.append([])
+            levels[depth].append(folder_path)
+            stem = subfolders.get('_placeholder', folder)
+            if stem is not False:
+                slots.append((folder_path / f"{stem}.nfo", subfolders.get('_content', f"{folder} information"),
+                              folder_path / f"{stem}.png", stem))
+            add(folder_path, subfolders, depth + 1)
 
-            # Create placeholder .nfo and .png files in each folder, except for Documentation
-            if folder != "Documentation":
-                nfo_file = folder_path / f"{folder}.nfo"
-                png_file = folder_path / f"{folder}.png"
+    placeholders = []
+    for root in roots:
+        slots.clear()
+        add(root, structure, 1)
+        placeholders.extend(slot + (hue_to_color(index / len(slots)),) for index, slot in enumerate(slots))
+    return levels, placeholders
 
-                create_placeholder_file(nfo_file, content=f"{folder} information")
+def _list_names(path):
+    try:
+        with os.scandir(path) as it:
+            return path, [entry.name for entry in it]
+    except OSError:
+        return path, None
 
-            # Special handling for Documentation
+def scan_existing(levels, jobs=4):
+    """
+    Returns the set of paths (as strings) that already exist among the planned
+    directories and their direct children.
+
+    Each planned directory that exists is listed once, level by level on `jobs`
+    threads; directories whose parent was missing are known to be missing and
+    are never touched.
+    """
+    existing = set()
+    for depth, level in enumerate(levels):
+        present = level if depth == 0 else [path for path in level if os.fspath(path) in existing]
+        for path, names in bounded_map(_list_names, present, jobs):
+            if names is None:
+                continue
+            directory = os.fspath(path)
+            existing.add(directory)
+            existing.update(os.path.join(directory, name) for name in names)
+    return existing
+
+def _make_directories(batch):
+    results = []
+    for path, is_root in batch:
+        try:
+            if is_root:
+                os.makedirs(path, exist_ok=True)
             else:
-                # Create README.nfo and README.png in Documentation
-                readme_nfo = folder_path / "README.nfo"
-                readme_png = folder_path / "README.png"
+                os.mkdir(path)
+            results.append((path, None))
+        except FileExistsError:
+            results.append((path, None) if os.path.isdir(path) else (path, f"{path} exists and is not a directory"))
+        except OSError as e:
+            results.append((path, e))
+    return results
 
-                create_placeholder_file(readme_nfo, content="SoundKit Documentation")
+def _write_placeholders(batch):
+    results = []
+    for path, content in batch:
+        try:
+            # 'x' never overwrites a file created since the scan
+            with open(path, 'x', encoding='utf-8') as f:
+                f.write(content)
+            results.append((path, True, None))
+        except FileExistsError:
+            results.append((path, False, None))
+        except OSError as e:
+            results.append((path, False, e))
+    return results
 
-            # Recursively create subfolders
-            if isinstance(subfolders, dict):
-                create_structure(folder_path, subfolders)
+def create_placeholder_file(file_path, content="Placeholder", reporter=None, sink=None):
+    """
+    Creates a placeholder file with the given content.
+    If the file already exists, it skips creation. With a sink (see
+    archive.ArchiveSink), the file is added to it instead of the filesystem.
+    """
+    reporter = reporter or Reporter('verbose')
+    if sink is not None:
+        stored = sink.add_file(file_path, content)
+        if stored is None:
+            reporter.event('skipped', file_path, [f"File already archived: {file_path}"])
+        else:
+            reporter.event('created', file_path, [f"Archived file: {file_path}"])
+            if stored == 'linked':
+                reporter.count('deduplicated')
+        return
+    for path, created, error in _write_placeholders([(file_path, content)]):
+        if error:
+            reporter.event('failed', path, [f"Error creating {path}: {error}"])
+        elif created:
+            reporter.event('created', path, [f"Created file: {path}"])
+        else:
+            reporter.event('skipped', path, [f"File already exists: {path}"])
 
-    create_structure(base_path, soundkit_structure)
+def _create_scaffold(levels, placeholders, existing, jobs, reporter):
+    # Returns the number of entries created and the paths that could not be created
+    created = 0
+    failed = set()
+    for depth, level in enumerate(levels):
+        missing = []
+        for path in level:
+            if os.fspath(path) in existing:
+                reporter.count('skipped')
+            elif os.fspath(path.parent) in failed:
+                failed.add(os.fspath(path))
+            else:
+                missing.append((path, depth == 0))
+        for batch in bounded_map(_make_directories, chunked(missing, BATCH_SIZE), jobs):
+            for path, error in batch:
+                if error:
+                    failed.add(os.fspath(path))
+                    reporter.event('failed', path, [f"Error creating directory {path}: {error}"])
+                else:
+                    created += 1
+                    reporter.event('directories', path, [f"Created directory: {path}"])
 
-if __name__ == "__main__":
-    # Define the base path for the sound kit
-    # For example, create it in the current working directory
-    base_soundkit_path = Path.cwd() / "SoundKit"
+    pending = []
+    for nfo_path, content, _, _, _ in placeholders:
+        if os.fspath(nfo_path) in existing:
+            reporter.count('skipped')
+        elif os.fspath(nfo_path.parent) not in failed:
+            pending.append((nfo_path, content))
+    for batch in bounded_map(_write_placeholders, chunked(pending, BATCH_SIZE), jobs):
+        for path, was_created, error in batch:
+            if error:
+                reporter.event('failed', path, [f"Error creating {path}: {error}"])
+            elif was_created:
+                created += 1
+                reporter.event('created', path, [f"Created file: {path}"])
+            else:
+                reporter.count('skipped')
+    return created, failed
+
+def _archive_scaffold(levels, placeholders, reporter, sink):
+    for level in levels:
+        for path in level:
+            sink.add_directory(path)
+            reporter.event('directories', path, [f"Archived directory: {path}"])
+    for nfo_path, content, _, _, _ in placeholders:
+        create_placeholder_file(nfo_path, content, reporter, sink)
+    return sum(len(level) for level in levels) + len(placeholders)
+
+def scaffold(roots, structure=None, jobs=4, reporter=None, sink=None):
+    """
+    Creates structure (a nested dictionary of folder names, SOUNDKIT_STRUCTURE by
+    default) below every root, with placeholder .nfo and .png files in each folder.
+
+    The destination is scanned once up front; afterwards only the missing
+    directories (level by level) and placeholder files are created, in batches on
+    `jobs` threads. Existing files are left untouched and only counted. The .png
+    placeholders are rendered as labeled icons in a rainbow gradient when Pillow
+    is installed. Returns the number of directories and files created.
 
-    # Create the base sound kit directory
-    base_soundkit_path.mkdir(parents=True, exist_ok=True)
-    print(f"Created base directory: {base_soundkit_path}")
+    With a sink (see archive.ArchiveSink), everything is added to the archive
+    instead, under the roots as given; the filesystem is not touched.
+    """
+    reporter = reporter or Reporter('verbose')
+    roots = [Path(root) for root in roots]
+    levels, placeholders = plan_scaffold(roots, SOUNDKIT_STRUCTURE if structure is None else structure)
+    reporter.set_total(sum(len(level) for level in levels) + len(placeholders))
+
+    existing = set()
+    failed = set()
+    if sink is None:
+        with reporter.phase('scan'):
+            existing = scan_existing(levels, jobs)
+        with reporter.phase('write'):
+            created, failed = _create_scaffold(levels, placeholders, existing, jobs, reporter)
+    else:
+        with reporter.phase('write'):
+            created = _archive_scaffold(levels, placeholders, reporter, sink)
 
-    # Generate the folder structure
-    generate_soundkit_structure(base_soundkit_path)
+    if pillow_available():
+        with reporter.phase('icons'):
+            created += generate_icons((
+                (png_path, label, color_hex)
+                for _, _, png_path, label, color_hex in placeholders
+                if os.fspath(png_path) not in existing and os.fspath(png_path.parent) not in failed
+            ), reporter=reporter, sink=sink)
+    else:
+        reporter.info("Pillow is not installed; skipping .png icon placeholders.")
+    return created
+
+def generate_soundkit_structure(base_path, structure=None, reporter=None, jobs=4, sink=None):
+    """
+    Generates a comprehensive sound kit folder structure with placeholder .nfo and .png
+    files below base_path, or into sink; see scaffold.
+    """
+    return scaffold([base_path], structure, jobs, reporter, sink)
+
+def main(base_paths, template=None, jobs=4, archive=None, archive_format=None, reporter=None):
+    """
+    Stamps the sound kit structure, or the structure from a template file, onto
+    every base path, creating the base directories as needed. With archive (a
+    file name or '-' for standard output), the kits are written into a tar or zip
+    archive instead, with the base paths as the top-level names.
+    """
+    reporter = reporter or Reporter('verbose')
+    structure = None
+    if template:
+        try:
+            structure = load_template(template)
+        except ValueError as e:
+            reporter.error(str(e))
+            return
+    if archive:
+        try:
+            with ArchiveSink(archive, archive_format) as sink:
+                scaffold(base_paths, structure, jobs, reporter, sink)
+        except (OSError, ValueError) as e:
+            reporter.error(f"Error writing archive {archive}: {e}")
+            return
+    else:
+        scaffold(base_paths, structure, jobs, reporter)
+    reporter.info(f"SoundKit folder structure generation complete for {len(base_paths)} "
+                  f"kit{'s' if len(base_paths) != 1 else ''}.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate sound kit folder structures with placeholder .nfo and .png files.")
+    parser.add_argument(
+        "base_paths",
+        nargs="*",
+        metavar="base_path",
+        help="Kit roots to create or complete; the structure is stamped onto each (default: ./SoundKit). "
+             "With --archive, these are the top-level names inside the archive (default: SoundKit)."
+    )
+    parser.add_argument(
+        "--template",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="JSON or TOML file with the folder structure to create instead of the built-in sound kit."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Number of threads used to scan and create directories and files (default: 4)."
+    )
+    add_archive_arguments(parser)
+    add_reporting_arguments(parser)
+    args = parser.parse_args()
 
-    print("SoundKit folder structure generation complete.")
+    # By default, create the sound kit in the current working directory
+    default_path = Path("SoundKit") if args.archive else Path.cwd() / "SoundKit"
+    base_paths = [Path(path) for path in args.base_paths] or [default_path]
+    run_reported(main, args, base_paths, template=args.template, jobs=args.jobs,
+                 archive=args.archive, archive_format=args.archive_format)
@@ -0,0 +1,71 @@
+import os
+import mmap
+import uuid
+
+def temp_path_for(path):
+    """
+    Returns a unique temporary path in the same directory as path, for content
+    that is renamed over path once it is complete.
+    """
+    directory, name = os.path.split(os.fspath(path))
+    # Leading dot keeps in-flight temp files out of the walker's results
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+
+def atomic_write(path, data, durable=False):
+    """
+    Writes data (str or bytes) to path through a temporary file in the same
+    directory that is renamed into place, so readers and crashes never observe a
+    half-written file. With durable=True the data is fsynced before the rename.
+    """
+    path = os.fspath(path)
+    temp_path = temp_path_for(path)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+# Files at least this large are compared through mmap instead of a single read
+MMAP_THRESHOLD = 1 << 20
+
+def file_matches(path, data):
+    """
+    Checks whether the file at path holds exactly the given bytes.
+    Returns None if the file does not exist, otherwise True or False; a file that
+    cannot be read counts as not matching.
+
+    The size is compared first, so most mismatches cost a single stat. Small files
+    are read in one call; large ones are compared through mmap.
+    """
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        return None
+    except OSError:
+        return False
+    if size != len(data):
+        return False
+    try:
+        with open(path, 'rb') as f:
+            if size < MMAP_THRESHOLD:
+                return f.read(size + 1) == data
+            expected = memoryview(data)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, size, MMAP_THRESHOLD):
+                    end = offset + MMAP_THRESHOLD
+                    if mapped[offset:end] != expected[offset:end]:
+                        return False
+            return True
+    except OSError:
+        return False
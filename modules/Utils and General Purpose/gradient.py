@@ -0,0 +1,118 @@
+import colorsys
+
+def hue_to_color(hue):
+    """
+    Converts a hue in [0, 1) to a fully saturated '$RRGGBB' color string.
+    """
+    r, g, b = colorsys.hsv_to_rgb(hue % 1.0, 1.0, 1.0)
+    return f"${int(r * 255):02X}{int(g * 255):02X}{int(b * 255):02X}"
+
+def color_to_hue(color_hex):
+    """
+    Converts a '$RRGGBB' color string back to its hue in [0, 1).
+    Returns None if the value is not a valid color.
+    """
+    if not color_hex or len(color_hex) != 7 or not color_hex.startswith('$'):
+        return None
+    try:
+        r, g, b = (int(color_hex[i:i + 2], 16) / 255 for i in (1, 3, 5))
+    except ValueError:
+        return None
+    return colorsys.rgb_to_hsv(r, g, b)[0]
+
+def spread_colors(low_hue, high_hue, count):
+    """
+    Returns count colors spread evenly over the hue gap from low_hue to high_hue,
+    excluding both ends. The gap runs forward around the color wheel; equal ends
+    mean a full turn.
+    """
+    span = (high_hue - low_hue) % 1.0 or 1.0
+    return [hue_to_color(low_hue + span * j / (count + 1)) for j in range(1, count + 1)]
+
+def assign_stable_colors(existing_colors):
+    """
+    Assigns a color to every position of an ordered item list while keeping the
+    colors items already have.
+
+    existing_colors holds the current color of each item in traversal order, or
+    None for items that have no color yet. Existing colors are returned unchanged;
+    each run of new items is spread evenly over the hue gap between the colored
+    neighbours around it, wrapping around the color wheel at the ends. When no item
+    has a color yet, the whole list gets an evenly spaced gradient.
+    """
+    total = len(existing_colors)
+    hues = [color_to_hue(color) if color else None for color in existing_colors]
+    anchors = [i for i, hue in enumerate(hues) if hue is not None]
+    if not anchors:
+        return [hue_to_color(i / total) for i in range(total)]
+
+    colors = list(existing_colors)
+    for k, start in enumerate(anchors):
+        end = anchors[(k + 1) % len(anchors)]
+        gap = (end - start - 1) % total if len(anchors) > 1 else total - 1
+        if gap == 0:
+            continue
+        for j, color in enumerate(spread_colors(hues[start], hues[end], gap), start=1):
+            colors[(start + j) % total] = color
+    return colors
+
+class StreamingColorAssigner:
+    """
+    Streaming counterpart of assign_stable_colors for item sequences that are too
+    large to hold in memory.
+
+    Items are pushed in traversal order together with their existing color (or
+    None). Colored items pass straight through; new items are buffered until the
+    next colored item arrives and are then spread over the gap, like
+    assign_stable_colors does. Where a neighbour is unknown (the start and end of
+    the stream, or when more than max_pending new items are buffered) the hue the
+    position would get in an even gradient over total items stands in for it.
+    """
+
+    def __init__(self, total, max_pending=4096):
+        self.total = max(total, 1)
+        self.max_pending = max_pending
+        self.position = 0
+        self.low_hue = None
+        self.pending = []
+
+    def _flush(self, high_hue=None):
+        first = self.position - len(self.pending)
+        if self.low_hue is None and high_hue is None:
+            # No known neighbour on either side: use the even gradient positions
+            colors = [hue_to_color(i / self.total) for i in range(first, self.position)]
+        else:
+            low_hue = self.low_hue if self.low_hue is not None else (first - 1) / self.total
+            if high_hue is None:
+                high_hue = self.position / self.total
+            colors = spread_colors(low_hue, high_hue, len(self.pending))
+        ready = list(zip(self.pending, colors))
+        self.pending = []
+        return ready
+
+    def push(self, item, existing_color):
+        """
+        Adds the next item and returns the (item, color) pairs that are now resolved.
+        """
+        hue = color_to_hue(existing_color) if existing_color else None
+        if hue is None:
+            self.pending.append(item)
+            self.position += 1
+            if len(self.pending) < self.max_pending:
+                return []
+            ready = self._flush()
+            self.low_hue = None
+            return ready
+        ready = self._flush(hue) if self.pending else []
+        ready.append((item, existing_color))
+        self.low_hue = hue
+        self.position += 1
+        return ready
+
+    def finish(self):
+        """
+        Resolves and returns the items still buffered at the end of the stream.
+        """
+        if not self.pending:
+            return []
+        return self._flush()
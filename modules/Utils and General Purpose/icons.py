@@ -0,0 +1,120 @@
+import io
+import os
+import hashlib
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+from fsutil import atomic_write
+from parallel import bounded_map, chunked
+from reporting import Reporter
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+# Edge length of generated icons in pixels
+ICON_SIZE = 64
+
+# Number of icons rendered per worker task
+CHUNK_SIZE = 64
+
+def pillow_available():
+    """
+    Returns True if Pillow could be imported.
+    """
+    return Image is not None
+
+def icon_digest(label, color_hex, size):
+    """
+    Returns a digest of the inputs an icon is rendered from.
+    """
+    return hashlib.blake2b(f"{label}\0{color_hex}\0{size}".encode('utf-8'), digest_size=16).hexdigest()
+
+@lru_cache(maxsize=None)
+def _load_font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only ships a fixed-size bitmap font
+        return ImageFont.load_default()
+
+def _fit_label(draw, label, font, max_width):
+    if draw.textlength(label, font=font) <= max_width:
+        return label
+    while label and draw.textlength(label + "..", font=font) > max_width:
+        label = label[:-1]
+    return label + ".."
+
+@lru_cache(maxsize=4096)
+def render_icon(label, color_hex, size=ICON_SIZE):
+    """
+    Renders a square PNG icon filled with color_hex ('$RRGGBB') and labeled with
+    label, and returns the encoded bytes. Results are memoized by (label, color, size).
+    """
+    rgb = tuple(int(color_hex[i:i + 2], 16) for i in (1, 3, 5))
+    # Dark text on light colors, light text on dark ones
+    luminance = 0.299 * rgb[0] + 0.587 * rgb[1] + 0.114 * rgb[2]
+    text_color = (0, 0, 0) if luminance > 140 else (255, 255, 255)
+
+    image = Image.new('RGB', (size, size), rgb)
+    draw = ImageDraw.Draw(image)
+    font = _load_font(max(8, size // 6))
+    margin = max(2, size // 16)
+    text = _fit_label(draw, label, font, size - 2 * margin)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    position = ((size - (right - left)) / 2 - left, (size - (bottom - top)) / 2 - top)
+    draw.text(position, text, fill=text_color, font=font)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+def _render_chunk(chunk):
+    return [(job, render_icon(job[1], job[2], size)) for job, size in chunk]
+
+def generate_icons(icons, size=ICON_SIZE, processes=None, nfo_index=None, reporter=None, sink=None):
+    """
+    Renders and writes a PNG icon for every (png_path, label, color_hex) tuple.
+
+    Rendering fans out across a process pool of `processes` workers (one per CPU
+    by default, rendered in-process if processes is 1). If an index is given, icons whose
+    file is unchanged since it was rendered from the same inputs are skipped.
+    icons may be a generator; only a bounded number of icons is in flight at once.
+    Each written icon is reported as an 'icons' event. Returns the number of icons written.
+    With a sink (see archive.ArchiveSink), icons are added to it instead of the filesystem.
+    """
+    reporter = reporter or Reporter('verbose')
+    if not pillow_available():
+        reporter.error("Pillow is not installed; skipping icon generation.")
+        return 0
+
+    def pending_icons():
+        for png_path, label, color_hex in icons:
+            digest = icon_digest(label, color_hex, size)
+            if nfo_index:
+                entry = nfo_index.lookup(png_path)
+                if entry is not None and entry.digest == digest:
+                    continue
+            yield (png_path, label, color_hex, digest), size
+
+    written = 0
+    if processes is None:
+        processes = os.cpu_count() or 1
+    results = bounded_map(_render_chunk, chunked(pending_icons(), CHUNK_SIZE), processes,
+                          executor_class=ProcessPoolExecutor)
+    for (png_path, label, color_hex, digest), data in (pair for chunk in results for pair in chunk):
+        try:
+            if sink is not None:
+                if sink.add_file(png_path, data) == 'linked':
+                    reporter.count('deduplicated')
+            else:
+                atomic_write(png_path, data)
+            written += 1
+            reporter.event('icons', png_path, [f"Wrote icon: {png_path}"])
+        except Exception as e:
+            reporter.event('failed', png_path, [f"Error writing icon {png_path}: {e}"])
+            continue
+        if nfo_index:
+            nfo_index.record(png_path, digest, color_hex)
+    return written
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+from collections import namedtuple
+
+# Journals live in the library root; the leading dot keeps them out of the walker's results
+JOURNAL_PREFIX = ".filenamer-journal-"
+JOURNAL_SUFFIX = ".jsonl"
+
+# Number of completion records written between two fsyncs
+SYNC_EVERY = 1024
+
+# plans holds (directory, depth, renames) per plan id with directory joined to
+# the root and renames as (old_name, new_name, display_name) tuples; done holds
+# the (plan id, step index) pairs recorded as completed.
+JournalState = namedtuple("JournalState", ["root", "plans", "done", "planned", "finished"])
+
+def new_journal_path(root_path):
+    """
+    Returns a fresh timestamped journal path inside root_path.
+    """
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(os.fspath(root_path), f"{JOURNAL_PREFIX}{stamp}-{os.getpid()}{JOURNAL_SUFFIX}")
+
+class RenameJournal:
+    """
+    Append-only JSON lines log of a rename run.
+
+    A run writes a 'start' record, one 'plan' record per directory, and a 'planned'
+    record, and syncs them to disk before the first rename. Completed renames are
+    then appended as 'done' records, fsynced every sync_every records, and the run
+    ends with 'complete' (or 'undone' after an undo). Records lost in a crash only
+    cost a stat per rename on resume, because renames are idempotent to check.
+    """
+
+    def __init__(self, path, sync_every=SYNC_EVERY):
+        self.path = os.fspath(path)
+        self.sync_every = sync_every
+        self.unsynced = 0
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record):
+        """
+        Appends one record without syncing it.
+        """
+        self.file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self.unsynced += 1
+
+    def write_plan(self, root_path, plans):
+        """
+        Writes the start record and the whole plan, given as (directory, depth,
+        renames) tuples, and syncs it to disk.
+        """
+        root_path = os.fspath(root_path)
+        self.write({"type": "start", "root": os.path.abspath(root_path), "created": time.strftime('%Y-%m-%dT%H:%M:%S%z')})
+        for plan_id, (directory, depth, renames) in enumerate(plans):
+            self.write({
+                "type": "plan",
+                "id": plan_id,
+                "dir": os.path.relpath(directory, root_path).replace(os.sep, '/'),
+                "depth": depth,
+                "renames": [list(step) for step in renames],
+            })
+        self.write({"type": "planned", "count": len(plans)})
+        self.sync()
+
+    def record_done(self, plan_id, step):
+        """
+        Records a completed rename; syncs once sync_every records are pending.
+        """
+        self.write({"type": "done", "id": plan_id, "step": step})
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+    def finish(self, status='complete'):
+        """
+        Marks the run as finished ('complete' or 'undone') and syncs the journal.
+        """
+        self.write({"type": status})
+        self.sync()
+
+    def sync(self):
+        """
+        Flushes and fsyncs pending records.
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        """
+        Syncs pending records and closes the journal.
+        """
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+def read_journal(path):
+    """
+    Reads a journal back into a JournalState. A torn last line left by a crash is
+    ignored.
+    """
+    root = None
+    plans = []
+    done = set()
+    planned = False
+    finished = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            kind = record.get("type")
+            if kind == "start":
+                root = record["root"]
+            elif kind == "plan":
+                directory = os.path.normpath(os.path.join(root, record["dir"]))
+                plans.append((directory, record["depth"], [tuple(step) for step in record["renames"]]))
+            elif kind == "planned":
+                planned = True
+            elif kind == "done":
+                done.add((record["id"], record["step"]))
+            elif kind in ("complete", "undone"):
+                finished = kind
+    return JournalState(root, plans, done, planned, finished)
+
+def _last_record_type(path):
+    # Finished runs end with a short record, so the tail is enough to skip them
+    try:
+        with open(path, 'rb') as f:
+            f.seek(max(0, os.fstat(f.fileno()).st_size - 256))
+            tail = f.read().splitlines()
+        return json.loads(tail[-1]).get("type") if tail else None
+    except (OSError, ValueError):
+        return None
+
+def find_interrupted_journal(root_path):
+    """
+    Returns the path of the newest journal in root_path whose run was planned but
+    never finished, or None.
+    """
+    try:
+        names = sorted(name for name in os.listdir(root_path)
+                       if name.startswith(JOURNAL_PREFIX) and name.endswith(JOURNAL_SUFFIX))
+    except OSError:
+        return None
+    for name in reversed(names):
+        path = os.path.join(root_path, name)
+        if _last_record_type(path) in ("complete", "undone"):
+            continue
+        state = read_journal(path)
+        if state.planned and state.finished is None:
+            return path
+    return None
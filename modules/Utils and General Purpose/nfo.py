@@ -1,8 +1,24 @@
 import os
+import tempfile
 from pathlib import Path
+from bisect import bisect_left, insort
+from collections import Counter
+from contextlib import nullcontext
 import colorsys
 import argparse
 
+from walker import walk_tree
+from gradient import StreamingColorAssigner, assign_stable_colors
+from nfo_index import NfoIndex, content_digest
+from fsutil import atomic_write, file_matches
+from parallel import bounded_map
+from watcher import watch_batches
+from archive import ArchiveSink, add_archive_arguments
+from icons import ICON_SIZE, generate_icons
+from waveform import generate_waveforms
+from audiometa import format_tip, info_from_json, info_to_json, read_audio_info
+from reporting import Reporter, add_reporting_arguments, run_reported
+
 # Define supported audio file extensions
 AUDIO_EXTENSIONS = {'.wav', '.mp3', '.flac', '.aiff', '.aac', '.ogg', '.wma', '.mid', '.midi', '.fst'}
 
@@ -71,81 +87,585 @@ def compare_metadata(existing_metadata, desired_metadata):
             return False
     return True
 
-def create_or_validate_nfo(path, color_hex, is_folder, root_path):
+def get_nfo_path(path, is_folder, root_path):
+    """
+    Returns where the .nfo file for an item lives.
+    Folder .nfo files are placed in the root_path, file .nfo files next to the file.
+    """
+    if is_folder:
+        return root_path / f"{path.name}.nfo"
+    return path.with_suffix('.nfo')
+
+def get_icon_path(path, is_folder, root_path):
+    """
+    Returns where the .png icon for an item lives, next to its .nfo file.
+    """
+    return get_nfo_path(path, is_folder, root_path).with_suffix('.png')
+
+def get_icon_label(path, is_folder):
+    """
+    Returns the text drawn on an item's icon.
+    """
+    return path.name if is_folder else path.stem
+
+def read_existing_color(nfo_path):
+    """
+    Returns the Color value of an existing .nfo file, or None if there is none.
+    """
+    if not nfo_path.exists():
+        return None
+    return parse_existing_nfo(nfo_path).get("Color")
+
+def create_or_validate_nfo(path, color_hex, is_folder, root_path, log=print, reporter=None, tip=None):
     """
     Creates a new .nfo file or validates and updates an existing one.
-    For folders, the .nfo file is placed in the root_path.
+    For folders, the .nfo file is placed in the root_path. The Tip is the item's
+    name unless tip is given.
+    Returns 'created', 'updated', 'skipped' (already valid) or 'failed'.
+
+    The file is written to a temporary file and renamed into place, so an interrupted
+    run never leaves a half-written .nfo. Progress messages are passed to log.
+
+    Validation first compares the raw bytes of the existing file with the rendered
+    template; the key/value parser only runs when they differ, so files with extra
+    user-edited lines are still accepted. Time spent comparing and writing is added
+    to the reporter's 'compare' and 'write' phases.
     """
-    name = path.name
+    phase = reporter.phase if reporter else (lambda _: nullcontext())
+    name = tip or path.name
     desired_content = generate_nfo_content(color_hex, name)
-    desired_metadata = {
-        "Color": color_hex,
-        "IconIndex": "33",
-        "HeightOfs": "5",
-        "SortGroup": "8",
-        "Tip": f"PROPHET SOUNDKIT | {name}"
-    }
 
-    if is_folder:
-        nfo_path = root_path / f"{path.name}.nfo"
-    else:
-        nfo_path = path.with_suffix('.nfo')
-        
-    if nfo_path.exists():
-        existing_metadata = parse_existing_nfo(nfo_path)
-        if compare_metadata(existing_metadata, desired_metadata):
-            return
+    nfo_path = get_nfo_path(path, is_folder, root_path)
+
+    with phase('compare'):
+        matches = file_matches(nfo_path, desired_content.encode('utf-8'))
+        if matches:
+            return 'skipped'
+        elif matches is not None:
+            desired_metadata = {
+                "Color": color_hex,
+                "IconIndex": "33",
+                "HeightOfs": "5",
+                "SortGroup": "8",
+                "Tip": name
+            }
+            existing_metadata = parse_existing_nfo(nfo_path)
+            if compare_metadata(existing_metadata, desired_metadata):
+                return 'skipped'
+            else:
+                log(f"Updating .nfo file: {nfo_path}")
+                status = 'updated'
         else:
-            print(f"Updating .nfo file: {nfo_path}")
-    else:
-        print(f"Creating .nfo file: {nfo_path}")
+            log(f"Creating .nfo file: {nfo_path}")
+            status = 'created'
 
     try:
-        with open(nfo_path, 'w', encoding='utf-8') as nfo_file:
-            nfo_file.write(desired_content)
-        print(f"Successfully wrote .nfo file: {nfo_path}")
+        with phase('write'):
+            atomic_write(nfo_path, desired_content)
+        log(f"Successfully wrote .nfo file: {nfo_path}")
+        return status
     except Exception as e:
-        print(f"Error writing .nfo for {path}: {e}")
+        log(f"Error writing .nfo for {path}: {e}")
+        return 'failed'
+
+def validate_items(root_path, items, nfo_index=None, jobs=1, reporter=None, audio_info=False, sink=None):
+    """
+    Creates or validates the .nfo file for every (item, is_folder, color_hex, index_entry)
+    tuple on a bounded pool of `jobs` threads and reports the results in input order.
+    Items whose index entry already matches the desired content are skipped, and the
+    index is updated for every item that ends up valid.
+
+    With audio_info=True, the Tip of audio files also shows their duration, sample
+    rate, bit depth and channels, read from the file headers on the same thread
+    pool. The index caches them by path, mtime and size, so unchanged files cost a stat.
+
+    With a sink (see archive.ArchiveSink), every .nfo file is added to it instead
+    and nothing on disk is read or written.
+    """
+    reporter = reporter or Reporter('verbose')
+
+    def with_stats():
+        for item, is_folder, color_hex, entry in items:
+            st = stored = None
+            if audio_info and not is_folder:
+                try:
+                    st = item.stat()
+                except OSError:
+                    pass
+                if st is not None and nfo_index:
+                    stored = nfo_index.lookup_info(item, st)
+            yield item, is_folder, color_hex, entry, st, stored
+
+    def read_info(record):
+        item, _, _, _, st, stored = record
+        if st is None:
+            return record, None
+        if stored is not None:
+            return record, info_from_json(stored)
+        with reporter.phase('headers'):
+            return record, read_audio_info(item)
+
+    def pending_jobs():
+        records = bounded_map(read_info, with_stats(), jobs) if audio_info else ((record, None) for record in with_stats())
+        for (item, is_folder, color_hex, entry, st, stored), info in records:
+            if st is not None and stored is None and nfo_index:
+                nfo_index.record_info(item, st, info_to_json(info))
+            tip = format_tip(item.name, info)
+            digest = content_digest(generate_nfo_content(color_hex, tip))
+            if entry is None or entry.digest != digest:
+                yield item, is_folder, color_hex, digest, tip
+            else:
+                reporter.event('skipped', get_nfo_path(item, is_folder, root_path))
+
+    if sink is not None:
+        for item, is_folder, color_hex, _, tip in pending_jobs():
+            nfo_path = get_nfo_path(item, is_folder, root_path)
+            stored = sink.add_file(nfo_path, generate_nfo_content(color_hex, tip))
+            if stored is None:
+                reporter.event('skipped', nfo_path, [f".nfo file already archived: {nfo_path}"])
+                continue
+            reporter.event('created', nfo_path, [f"Archived .nfo file: {nfo_path}"])
+            if stored == 'linked':
+                reporter.count('deduplicated')
+        return
+
+    def run_job(job):
+        item, is_folder, color_hex, _, tip = job
+        messages = []
+        # Create or validate .nfo file
+        status = create_or_validate_nfo(item, color_hex, is_folder, root_path,
+                                        log=messages.append, reporter=reporter, tip=tip)
+        return job, status, messages
+
+    for (item, is_folder, color_hex, digest, _), status, messages in bounded_map(run_job, pending_jobs(), jobs):
+        nfo_path = get_nfo_path(item, is_folder, root_path)
+        reporter.event(status, nfo_path, messages)
+        if status != 'failed' and nfo_index:
+            nfo_index.record(nfo_path, digest, color_hex)
 
-def traverse_and_generate(root_path, enable_pillow=False):
+def traverse_and_generate(root_path, enable_pillow=False, scan_jobs=1, ignore_patterns=(), rebalance=False,
+                          use_index=True, jobs=1, icon_processes=None, icon_size=ICON_SIZE, audio_info=False,
+                          waveforms=False, reporter=None, sink=None):
     """
     Traverses the root_path directory and generates/validates .nfo files with a rainbow gradient.
+    Hidden and ignored subtrees are pruned during the walk; scan_jobs > 1 lists
+    directories on a thread pool.
+
+    Items keep the color already stored in their .nfo file and new items are colored
+    in the gaps between their neighbours, so a routine run only rewrites changed
+    items. With rebalance=True the gradient is recomputed evenly for every item.
+
+    With use_index=True, a persistent index in the root_path remembers the fingerprint
+    of every validated .nfo file, and unchanged files are skipped without being read.
+
+    With jobs > 1, existing .nfo files are read, validated and written on a bounded
+    thread pool; results are still reported in traversal order.
+
+    With enable_pillow=True, a labeled .png icon in the item's color is rendered next
+    to every .nfo file on a pool of icon_processes worker processes; icons whose
+    inputs are unchanged according to the index are skipped.
+
+    With waveforms=True, the .png next to every .nfo file shows the waveform of the
+    WAV/AIFF file instead, and folders show the overlaid waveforms of their
+    contents; see waveform.generate_waveforms.
+
+    With audio_info=True, the Tip of every audio file also lists its duration,
+    sample rate, bit depth and channels, read from the file headers.
+
+    With a sink (see archive.ArchiveSink), the .nfo files and images are added to
+    it, relative to root_path, instead of being written next to the items; the
+    index is not used and the library is left untouched.
+
+    Progress, counters and phase timings go to reporter (one line per item by default).
+
+    Returns the (item, is_folder, color_hex) tuples in traversal order, or None if
+    root_path is not a directory.
     """
+    reporter = reporter or Reporter('verbose')
     if not root_path.exists() or not root_path.is_dir():
-        print(f"The provided path does not exist or is not a directory: {root_path}")
-        return
+        reporter.error(f"The provided path does not exist or is not a directory: {root_path}")
+        return None
 
     # Gather all audio files and folders in traversal order
     all_items = []
     folders = []
-    
-    for item in root_path.rglob('*'):
-        if item.is_file() and item.suffix.lower() in AUDIO_EXTENSIONS:
-            all_items.append((item, False))
-        elif item.is_dir() and not any(p.name.startswith('.') for p in item.parents):
-            folders.append(item)
-    
+    scanned = 0
+
+    with reporter.phase('walk'):
+        for entry, depth in walk_tree(root_path, ignore_patterns=ignore_patterns, jobs=scan_jobs):
+            scanned += 1
+            if entry.is_dir():
+                folders.append((Path(entry.path), depth))
+            elif is_audio_entry(entry):
+                all_items.append((Path(entry.path), False))
+    reporter.count('scanned', scanned)
+
     # Sort folders by depth (deeper folders first) and add them to all_items
-    folders.sort(key=lambda x: len(x.parts), reverse=True)
-    for folder in folders:
+    folders.sort(key=lambda x: x[1], reverse=True)
+    for folder, _ in folders:
         all_items.append((folder, True))
 
     total_items = len(all_items)
 
     if total_items == 0:
-        print("No audio files or folders found in the provided directory.")
+        reporter.info("No audio files or folders found in the provided directory.")
+        return []
+
+    reporter.info(f"Found {total_items} items. Generating/Validating .nfo files with rainbow gradient...")
+    reporter.set_total(total_items)
+
+    nfo_index = NfoIndex(root_path) if use_index and sink is None else None
+    try:
+        with reporter.phase('colors'):
+            nfo_paths = [get_nfo_path(item, is_folder, root_path) for item, is_folder in all_items]
+            cached = [nfo_index.lookup(nfo_path) if nfo_index else None for nfo_path in nfo_paths]
+
+            if rebalance:
+                # Spread the colors evenly based on traversal order
+                colors = [get_rainbow_color(index, total_items) for index in range(total_items)]
+            else:
+                colors = assign_stable_colors(list(bounded_map(
+                    lambda pair: pair[1].color if pair[1] else read_existing_color(pair[0]),
+                    zip(nfo_paths, cached), jobs
+                )))
+
+        validate_items(root_path, (
+            (item, is_folder, color_hex, entry)
+            for (item, is_folder), entry, color_hex in zip(all_items, cached, colors)
+        ), nfo_index, jobs, reporter, audio_info, sink)
+        if nfo_index:
+            nfo_index.set_meta('item_count', total_items)
+
+        if enable_pillow:
+            with reporter.phase('icons'):
+                generate_icons((
+                    (get_icon_path(item, is_folder, root_path), get_icon_label(item, is_folder), color_hex)
+                    for (item, is_folder), color_hex in zip(all_items, colors)
+                ), size=icon_size, processes=icon_processes, nfo_index=nfo_index, reporter=reporter, sink=sink)
+        elif waveforms:
+            with reporter.phase('waveforms'):
+                generate_waveforms((
+                    (item, is_folder, get_icon_path(item, is_folder, root_path), color_hex)
+                    for (item, is_folder), color_hex in zip(all_items, colors)
+                ), size=icon_size, processes=icon_processes, nfo_index=nfo_index, reporter=reporter, sink=sink)
+    finally:
+        if nfo_index:
+            nfo_index.close()
+
+    reporter.info("Metadata generation and validation complete.")
+    return [(item, is_folder, color_hex) for (item, is_folder), color_hex in zip(all_items, colors)]
+
+def is_audio_entry(entry):
+    """
+    Returns True if a walker DirEntry is an audio file.
+    """
+    return os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS and entry.is_file()
+
+def count_items(root_path, ignore_patterns=(), scan_jobs=1):
+    """
+    Counts the audio files and folders below root_path without keeping them.
+    """
+    return sum(
+        1 for entry, _ in walk_tree(root_path, ignore_patterns=ignore_patterns, jobs=scan_jobs)
+        if entry.is_dir() or is_audio_entry(entry)
+    )
+
+def _read_spill(bucket):
+    bucket.seek(0)
+    remainder = ''
+    while chunk := bucket.read(1 << 16):
+        *paths, remainder = (remainder + chunk).split('\0')
+        for path in paths:
+            yield path
+
+def stream_items(root_path, spill_dir, ignore_patterns=(), scan_jobs=1):
+    """
+    Yields (item, is_folder) pairs in traversal order without holding the tree in memory.
+
+    Audio files are yielded as soon as the walk finds them. Folders are appended to
+    one spill file per depth in spill_dir and replayed afterwards from the deepest
+    depth to the shallowest, which reproduces the depth ordering without a sort.
+    """
+    buckets = {}
+    try:
+        for entry, depth in walk_tree(root_path, ignore_patterns=ignore_patterns, jobs=scan_jobs):
+            if entry.is_dir():
+                bucket = buckets.get(depth)
+                if bucket is None:
+                    bucket = buckets[depth] = open(os.path.join(spill_dir, f"depth-{depth}.lst"), 'w+',
+                                                   encoding='utf-8', errors='surrogateescape')
+                bucket.write(entry.path + '\0')
+            elif is_audio_entry(entry):
+                yield Path(entry.path), False
+
+        for depth in sorted(buckets, reverse=True):
+            for path in _read_spill(buckets[depth]):
+                yield Path(path), True
+    finally:
+        for bucket in buckets.values():
+            bucket.close()
+
+def stream_and_generate(root_path, enable_pillow=False, scan_jobs=1, ignore_patterns=(), use_index=True, jobs=1,
+                        icon_processes=None, icon_size=ICON_SIZE, max_pending=4096, audio_info=False,
+                        waveforms=False, reporter=None):
+    """
+    Constant-memory variant of traverse_and_generate for very large libraries.
+
+    Items flow through a generator pipeline with bounded buffers: audio files are
+    validated as the walk finds them and folders follow from depth-bucketed spill
+    files. Colors are assigned by a StreamingColorAssigner; the item count it needs
+    comes from the index if a previous run stored it, otherwise from a counting
+    pre-pass. With enable_pillow=True or waveforms=True, icons or waveform
+    thumbnails are rendered in a second streaming pass that reads the colors back
+    from the index or the .nfo files.
+
+    Returns the number of items processed, or None if root_path is not a directory.
+    """
+    reporter = reporter or Reporter('verbose')
+    if not root_path.exists() or not root_path.is_dir():
+        reporter.error(f"The provided path does not exist or is not a directory: {root_path}")
+        return None
+
+    nfo_index = NfoIndex(root_path) if use_index else None
+    processed = 0
+    try:
+        total = int(nfo_index.get_meta('item_count', 0)) if nfo_index else 0
+        if not total:
+            with reporter.phase('count'):
+                total = count_items(root_path, ignore_patterns, scan_jobs)
+        if total == 0:
+            reporter.info("No audio files or folders found in the provided directory.")
+            return 0
+        reporter.info(f"Streaming about {total} items. Generating/Validating .nfo files with rainbow gradient...")
+        reporter.set_total(total)
+
+        def with_entries(spill_dir):
+            for item, is_folder in stream_items(root_path, spill_dir, ignore_patterns, scan_jobs):
+                reporter.count('scanned')
+                nfo_path = get_nfo_path(item, is_folder, root_path)
+                yield item, is_folder, nfo_path, nfo_index.lookup(nfo_path) if nfo_index else None
+
+        def with_existing_color(record):
+            _, _, nfo_path, entry = record
+            return record, entry.color if entry else read_existing_color(nfo_path)
+
+        def colored(spill_dir):
+            nonlocal processed
+            assigner = StreamingColorAssigner(total, max_pending)
+            for record, existing_color in bounded_map(with_existing_color, with_entries(spill_dir), jobs):
+                for (item, is_folder, _, entry), color_hex in assigner.push(record, existing_color):
+                    processed += 1
+                    yield item, is_folder, color_hex, entry
+            for (item, is_folder, _, entry), color_hex in assigner.finish():
+                processed += 1
+                yield item, is_folder, color_hex, entry
+
+        with tempfile.TemporaryDirectory(prefix="nfo-spill-") as spill_dir:
+            validate_items(root_path, colored(spill_dir), nfo_index, jobs, reporter, audio_info)
+        if nfo_index:
+            nfo_index.set_meta('item_count', processed)
+            nfo_index.commit()
+
+        def colored_again(spill_dir):
+            for item, is_folder in stream_items(root_path, spill_dir, ignore_patterns, scan_jobs):
+                nfo_path = get_nfo_path(item, is_folder, root_path)
+                entry = nfo_index.lookup(nfo_path) if nfo_index else None
+                color_hex = entry.color if entry else read_existing_color(nfo_path)
+                if color_hex:
+                    yield item, is_folder, color_hex
+
+        if enable_pillow:
+            def icon_jobs(spill_dir):
+                for item, is_folder, color_hex in colored_again(spill_dir):
+                    yield get_icon_path(item, is_folder, root_path), get_icon_label(item, is_folder), color_hex
+
+            with reporter.phase('icons'), tempfile.TemporaryDirectory(prefix="nfo-spill-") as spill_dir:
+                generate_icons(icon_jobs(spill_dir), size=icon_size, processes=icon_processes,
+                               nfo_index=nfo_index, reporter=reporter)
+        elif waveforms:
+            def waveform_jobs(spill_dir):
+                for item, is_folder, color_hex in colored_again(spill_dir):
+                    yield item, is_folder, get_icon_path(item, is_folder, root_path), color_hex
+
+            with reporter.phase('waveforms'), tempfile.TemporaryDirectory(prefix="nfo-spill-") as spill_dir:
+                generate_waveforms(waveform_jobs(spill_dir), size=icon_size, processes=icon_processes,
+                                   nfo_index=nfo_index, reporter=reporter)
+    finally:
+        if nfo_index:
+            nfo_index.close()
+
+    reporter.info("Metadata generation and validation complete.")
+    return processed
+
+def item_sort_key(item, is_folder, root_path):
+    """
+    Returns the position key of an item in traversal order: audio files in walk
+    order, followed by folders from the deepest to the shallowest.
+    """
+    parts = item.relative_to(root_path).parts
+    if is_folder:
+        return (1, -len(parts), parts)
+    return (0, 0, parts)
+
+def watch_and_update(root_path, enable_pillow=False, scan_jobs=1, ignore_patterns=(), rebalance=False,
+                     use_index=True, jobs=1, icon_processes=None, icon_size=ICON_SIZE, debounce=0.5,
+                     audio_info=False, waveforms=False, reporter=None):
+    """
+    Runs one full pass over root_path, then watches it and only creates, updates or
+    deletes the .nfo files affected by each batch of filesystem changes.
+
+    New items are colored in the gap between their neighbours in traversal order,
+    so existing .nfo files are never rewritten because of an addition elsewhere.
+    With waveforms=True, new folders show the waveforms of the new files in them;
+    existing folders are updated by the next full pass. Known files that are
+    written again, such as copies that were still in progress when first seen,
+    get their audio info and waveform refreshed.
+    """
+    reporter = reporter or Reporter('verbose')
+    items = traverse_and_generate(root_path, enable_pillow=enable_pillow, scan_jobs=scan_jobs,
+                                  ignore_patterns=ignore_patterns, rebalance=rebalance, use_index=use_index,
+                                  jobs=jobs, icon_processes=icon_processes, icon_size=icon_size,
+                                  audio_info=audio_info, waveforms=waveforms, reporter=reporter)
+    if items is None:
         return
 
-    print(f"Found {total_items} items. Generating/Validating .nfo files with rainbow gradient...\n")
+    known = {item: is_folder for item, is_folder, _ in items}
+    colors = {item: color_hex for item, _, color_hex in items}
+    keys = [item_sort_key(item, is_folder, root_path) for item, is_folder, _ in items]
+    items_by_key = dict(zip(keys, known))
+    folder_names = Counter(item.name for item, is_folder, _ in items if is_folder)
 
-    for index, (item, is_folder) in enumerate(all_items):
-        # Calculate color based on traversal order
-        color_hex = get_rainbow_color(index, total_items)
+    def add_candidate(path, is_dir, added):
+        if path in known:
+            return
+        if is_dir:
+            added[path] = True
+        elif path.suffix.lower() in AUDIO_EXTENSIONS:
+            added[path] = False
 
-        # Create or validate .nfo file
-        create_or_validate_nfo(item, color_hex, is_folder, root_path)
+    def below(path):
+        prefix = f"{path}{os.sep}"
+        return {item for item in known if str(item).startswith(prefix)}
 
-    print("\nMetadata generation and validation complete.")
+    reporter.info(f"Watching {root_path} for changes. Press Ctrl+C to stop.")
+    reporter.set_total(None)
+    nfo_index = NfoIndex(root_path) if use_index else None
+    try:
+        for batch in watch_batches(root_path, ignore_patterns, debounce=debounce):
+            added = {}
+            removed = set()
+            modified = set()
+            for changed in sorted(batch):
+                path = Path(changed)
+                if path.is_dir():
+                    if path != root_path:
+                        add_candidate(path, True, added)
+                    if path in known or path == root_path:
+                        # Known directory reported as a whole (e.g. after a queue overflow)
+                        removed |= {item for item in below(path) if not item.exists()}
+                    for entry, _ in walk_tree(path, ignore_patterns=ignore_patterns):
+                        add_candidate(Path(entry.path), entry.is_dir(), added)
+                elif path.is_file():
+                    if known.get(path) is False:
+                        modified.add(path)
+                    add_candidate(path, False, added)
+                elif path in known:
+                    removed.add(path)
+                    if known[path]:
+                        removed |= below(path)
+
+            for item in sorted(removed):
+                is_folder = known.pop(item)
+                key = item_sort_key(item, is_folder, root_path)
+                del keys[bisect_left(keys, key)]
+                del items_by_key[key]
+                colors.pop(item, None)
+                if is_folder:
+                    folder_names[item.name] -= 1
+                    if folder_names[item.name] > 0:
+                        # Another folder with the same name still uses this .nfo
+                        continue
+                nfo_path = get_nfo_path(item, is_folder, root_path)
+                stale_paths = [nfo_path, nfo_path.with_suffix('.png')] if enable_pillow or waveforms else [nfo_path]
+                for stale_path in stale_paths:
+                    try:
+                        stale_path.unlink()
+                        reporter.event('removed', stale_path, [f"Removed file: {stale_path}"])
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        reporter.event('failed', stale_path, [f"Error removing {stale_path}: {e}"])
+                    if nfo_index:
+                        nfo_index.forget(stale_path)
+
+            # Only the audio info and waveforms depend on what is in a file
+            refreshed = sorted(item for item in modified if item in known) if audio_info or waveforms else []
+            if refreshed:
+                validate_items(root_path, (
+                    (item, False, colors[item], nfo_index.lookup(get_nfo_path(item, False, root_path)) if nfo_index else None)
+                    for item in refreshed
+                ), nfo_index, jobs, reporter, audio_info)
+                if waveforms:
+                    generate_waveforms((
+                        (item, False, get_icon_path(item, False, root_path), colors[item])
+                        for item in refreshed
+                    ), size=icon_size, processes=icon_processes, nfo_index=nfo_index, reporter=reporter)
+
+            if not added:
+                if nfo_index:
+                    nfo_index.commit()
+                continue
+
+            new_keys = set()
+            for item, is_folder in added.items():
+                key = item_sort_key(item, is_folder, root_path)
+                known[item] = is_folder
+                items_by_key[key] = item
+                insort(keys, key)
+                new_keys.add(key)
+                if is_folder:
+                    folder_names[item.name] += 1
+
+            # Color each run of consecutive new items from its old neighbours
+            total = len(keys)
+            positions = sorted(bisect_left(keys, key) for key in new_keys)
+            runs = []
+            for position in positions:
+                if runs and runs[-1][-1] == position - 1:
+                    runs[-1].append(position)
+                else:
+                    runs.append([position])
+            for run in runs:
+                if len(run) == total:
+                    run_colors = assign_stable_colors([None] * total)
+                else:
+                    before = colors[items_by_key[keys[(run[0] - 1) % total]]]
+                    after = colors[items_by_key[keys[(run[-1] + 1) % total]]]
+                    run_colors = assign_stable_colors([before] + [None] * len(run) + [after])[1:-1]
+                for position, color_hex in zip(run, run_colors):
+                    colors[items_by_key[keys[position]]] = color_hex
+
+            new_items = [items_by_key[keys[position]] for position in positions]
+            validate_items(root_path, (
+                (item, known[item], colors[item], None) for item in new_items
+            ), nfo_index, jobs, reporter, audio_info)
+            if enable_pillow:
+                generate_icons((
+                    (get_icon_path(item, known[item], root_path), get_icon_label(item, known[item]), colors[item])
+                    for item in new_items
+                ), size=icon_size, processes=icon_processes, nfo_index=nfo_index, reporter=reporter)
+            elif waveforms:
+                generate_waveforms((
+                    (item, known[item], get_icon_path(item, known[item], root_path), colors[item])
+                    for item in new_items
+                ), size=icon_size, processes=icon_processes, nfo_index=nfo_index, reporter=reporter)
+            if nfo_index:
+                nfo_index.commit()
+    except KeyboardInterrupt:
+        reporter.info("Stopped watching.")
+    finally:
+        if nfo_index:
+            nfo_index.close()
 
 def main():
     """
@@ -162,10 +682,106 @@ def main():
         action="store_true",
         help="Enable generation of .png icon files with text labels using Pillow."
     )
+    parser.add_argument(
+        "--waveforms",
+        action="store_true",
+        help="Write waveform thumbnails of WAV/AIFF files (and their folders) to the .png files instead of labeled icons (needs NumPy and Pillow)."
+    )
+    parser.add_argument(
+        "--scan-jobs",
+        type=int,
+        default=1,
+        help="Number of threads used to list directories during the scan (default: 1)."
+    )
+    parser.add_argument(
+        "--ignore",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Glob pattern for file or folder names to skip, including their subtrees. Can be repeated."
+    )
+    parser.add_argument(
+        "--rebalance",
+        action="store_true",
+        help="Recompute the gradient evenly for all items instead of keeping existing colors."
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Do not read or update the persistent index and validate every .nfo file from disk."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker threads used to validate and write .nfo files (default: 1)."
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After the initial pass, keep watching the directory and update .nfo files as items change."
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.5,
+        help="Seconds of quiet used to coalesce filesystem events into one batch in --watch mode (default: 0.5)."
+    )
+    parser.add_argument(
+        "--icon-processes",
+        type=int,
+        default=None,
+        help="Number of worker processes used to render icons (default: one per CPU)."
+    )
+    parser.add_argument(
+        "--icon-size",
+        type=int,
+        default=ICON_SIZE,
+        help=f"Edge length of generated icons in pixels (default: {ICON_SIZE})."
+    )
+    parser.add_argument(
+        "--audio-info",
+        action="store_true",
+        help="Add duration, sample rate, bit depth and channels from the audio file headers to the Tip."
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Process items as a constant-memory stream instead of collecting the whole tree first."
+    )
+    add_archive_arguments(parser)
+    add_reporting_arguments(parser)
     args = parser.parse_args()
+    if args.archive and (args.stream or args.watch):
+        parser.error("--archive cannot be combined with --stream or --watch.")
+    if args.stream and (args.watch or args.rebalance):
+        parser.error("--stream cannot be combined with --watch or --rebalance.")
+    if args.waveforms and args.generate_icons:
+        parser.error("--waveforms and --generate-icons both write the .png files; choose one.")
 
     input_dir = Path(args.input_directory).resolve()
-    traverse_and_generate(input_dir, enable_pillow=args.generate_icons)
+    if args.stream:
+        run_reported(stream_and_generate, args, input_dir, enable_pillow=args.generate_icons,
+                     scan_jobs=args.scan_jobs, ignore_patterns=args.ignore,
+                     use_index=not args.no_index, jobs=args.jobs,
+                     icon_processes=args.icon_processes, icon_size=args.icon_size,
+                     audio_info=args.audio_info, waveforms=args.waveforms)
+        return
+
+    if args.watch:
+        run_reported(watch_and_update, args, input_dir, enable_pillow=args.generate_icons,
+                     scan_jobs=args.scan_jobs, ignore_patterns=args.ignore, rebalance=args.rebalance,
+                     use_index=not args.no_index, jobs=args.jobs,
+                     icon_processes=args.icon_processes, icon_size=args.icon_size,
+                     debounce=args.debounce, audio_info=args.audio_info, waveforms=args.waveforms)
+        return
+
+    with ArchiveSink(args.archive, args.archive_format, input_dir) if args.archive else nullcontext() as sink:
+        run_reported(traverse_and_generate, args, input_dir, enable_pillow=args.generate_icons,
+                     scan_jobs=args.scan_jobs, ignore_patterns=args.ignore,
+                     rebalance=args.rebalance, use_index=not args.no_index, jobs=args.jobs,
+                     icon_processes=args.icon_processes, icon_size=args.icon_size, audio_info=args.audio_info,
+                     waveforms=args.waveforms, sink=sink)
 
 if __name__ == "__main__":
     main()
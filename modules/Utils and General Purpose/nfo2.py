@@ -1,8 +1,17 @@
 import os
 from pathlib import Path
+from contextlib import nullcontext
 import colorsys
 import argparse
 
+from walker import walk_tree
+from gradient import assign_stable_colors
+from nfo_index import NfoIndex, content_digest
+from fsutil import atomic_write, file_matches
+from parallel import bounded_map
+from archive import ArchiveSink, add_archive_arguments
+from reporting import Reporter, add_reporting_arguments, run_reported
+
 # Template for .nfo files
 NFO_TEMPLATE = """Color={color}
 IconIndex=33
@@ -68,66 +77,160 @@ def compare_metadata(existing_metadata, desired_metadata):
             return False
     return True
 
-def create_or_validate_nfo(folder_name, color_hex, root_path):
+def read_existing_color(nfo_path):
+    """
+    Returns the Color value of an existing .nfo file, or None if there is none.
+    """
+    if not nfo_path.exists():
+        return None
+    return parse_existing_nfo(nfo_path).get("Color")
+
+def create_or_validate_nfo(folder_name, color_hex, root_path, log=print, reporter=None):
     """
     Creates a new .nfo file or validates and updates an existing one for a given folder.
     The .nfo file is placed in the root_path with the folder's name.
+    Returns 'created', 'updated', 'skipped' (already valid) or 'failed'.
+
+    The file is written to a temporary file and renamed into place, so an interrupted
+    run never leaves a half-written .nfo. Progress messages are passed to log.
+
+    Validation first compares the raw bytes of the existing file with the rendered
+    template; the key/value parser only runs when they differ, so files with extra
+    user-edited lines are still accepted. Time spent comparing and writing is added
+    to the reporter's 'compare' and 'write' phases.
     """
+    phase = reporter.phase if reporter else (lambda _: nullcontext())
     desired_content = generate_nfo_content(color_hex, folder_name)
-    desired_metadata = {
-        "Color": color_hex,
-        "IconIndex": "33",
-        "HeightOfs": "5",
-        "SortGroup": "8",
-        "Tip": f"PROPHET SOUNDKIT | {folder_name}"
-    }
 
     nfo_path = root_path / f"{folder_name}.nfo"
 
-    if nfo_path.exists():
-        existing_metadata = parse_existing_nfo(nfo_path)
-        if compare_metadata(existing_metadata, desired_metadata):
-            print(f"No changes needed for .nfo file: {nfo_path}")
-            return
+    with phase('compare'):
+        matches = file_matches(nfo_path, desired_content.encode('utf-8'))
+        if matches:
+            log(f"No changes needed for .nfo file: {nfo_path}")
+            return 'skipped'
+        elif matches is not None:
+            desired_metadata = {
+                "Color": color_hex,
+                "IconIndex": "33",
+                "HeightOfs": "5",
+                "SortGroup": "8",
+                "Tip": f"PROPHET SOUNDKIT | {folder_name}"
+            }
+            existing_metadata = parse_existing_nfo(nfo_path)
+            if compare_metadata(existing_metadata, desired_metadata):
+                log(f"No changes needed for .nfo file: {nfo_path}")
+                return 'skipped'
+            else:
+                log(f"Updating .nfo file: {nfo_path}")
+                status = 'updated'
         else:
-            print(f"Updating .nfo file: {nfo_path}")
-    else:
-        print(f"Creating .nfo file: {nfo_path}")
+            log(f"Creating .nfo file: {nfo_path}")
+            status = 'created'
 
     try:
-        with open(nfo_path, 'w', encoding='utf-8') as nfo_file:
-            nfo_file.write(desired_content)
-        print(f"Successfully wrote .nfo file: {nfo_path}\n")
+        with phase('write'):
+            atomic_write(nfo_path, desired_content)
+        log(f"Successfully wrote .nfo file: {nfo_path}\n")
+        return status
     except Exception as e:
-        print(f"Error writing .nfo for {folder_name}: {e}\n")
+        log(f"Error writing .nfo for {folder_name}: {e}\n")
+        return 'failed'
 
-def traverse_and_generate(root_path):
+def traverse_and_generate(root_path, ignore_patterns=(), rebalance=False, use_index=True, jobs=1, reporter=None,
+                          sink=None):
     """
     Traverses the root_path directory and generates/validates .nfo files for immediate subdirectories with a rainbow gradient.
+    Hidden and ignored subdirectories are skipped.
+
+    Folders keep the color already stored in their .nfo file and new folders are
+    colored in the gaps between their neighbours. With rebalance=True the gradient
+    is recomputed evenly for every folder.
+
+    With use_index=True, a persistent index in the root_path remembers the fingerprint
+    of every validated .nfo file, and unchanged files are skipped without being read.
+
+    With jobs > 1, existing .nfo files are read, validated and written on a bounded
+    thread pool; results are still reported in folder order.
+
+    With a sink (see archive.ArchiveSink), the .nfo files are added to it,
+    relative to root_path, instead of being written; the index is not used.
+
+    Progress, counters and phase timings go to reporter (one line per folder by default).
     """
+    reporter = reporter or Reporter('verbose')
     if not root_path.exists() or not root_path.is_dir():
-        print(f"The provided path does not exist or is not a directory: {root_path}")
+        reporter.error(f"The provided path does not exist or is not a directory: {root_path}")
         return
 
     # Gather all immediate subdirectories
-    subdirectories = [item for item in root_path.iterdir() if item.is_dir()]
+    with reporter.phase('walk'):
+        entries = list(walk_tree(root_path, ignore_patterns=ignore_patterns, max_depth=1))
+        subdirectories = [Path(entry.path) for entry, _ in entries if entry.is_dir()]
+    reporter.count('scanned', len(entries))
 
     total_folders = len(subdirectories)
 
     if total_folders == 0:
-        print("No subdirectories found in the provided directory.")
+        reporter.info("No subdirectories found in the provided directory.")
         return
 
-    print(f"Found {total_folders} subdirectories. Generating/Validating .nfo files with rainbow gradient...\n")
+    reporter.info(f"Found {total_folders} subdirectories. Generating/Validating .nfo files with rainbow gradient...")
+    reporter.set_total(total_folders)
+
+    subdirectories.sort(key=lambda x: x.name.lower())
 
-    for index, folder in enumerate(sorted(subdirectories, key=lambda x: x.name.lower())):
-        # Calculate color based on position
-        color_hex = get_rainbow_color(index, total_folders)
+    nfo_index = NfoIndex(root_path) if use_index and sink is None else None
+    try:
+        with reporter.phase('colors'):
+            nfo_paths = [root_path / f"{folder.name}.nfo" for folder in subdirectories]
+            cached = [nfo_index.lookup(nfo_path) if nfo_index else None for nfo_path in nfo_paths]
+
+            if rebalance:
+                # Spread the colors evenly based on position
+                colors = [get_rainbow_color(index, total_folders) for index in range(total_folders)]
+            else:
+                colors = assign_stable_colors(list(bounded_map(
+                    lambda pair: pair[1].color if pair[1] else read_existing_color(pair[0]),
+                    zip(nfo_paths, cached), jobs
+                )))
+
+        if sink is not None:
+            for folder, nfo_path, color_hex in zip(subdirectories, nfo_paths, colors):
+                stored = sink.add_file(nfo_path, generate_nfo_content(color_hex, folder.name))
+                if stored is None:
+                    reporter.event('skipped', nfo_path, [f".nfo file already archived: {nfo_path}"])
+                    continue
+                reporter.event('created', nfo_path, [f"Archived .nfo file: {nfo_path}"])
+                if stored == 'linked':
+                    reporter.count('deduplicated')
+            return
 
-        # Create or validate .nfo file
-        create_or_validate_nfo(folder.name, color_hex, root_path)
+        def pending_jobs():
+            for folder, nfo_path, entry, color_hex in zip(subdirectories, nfo_paths, cached, colors):
+                digest = content_digest(generate_nfo_content(color_hex, folder.name))
+                if entry is None or entry.digest != digest:
+                    yield folder.name, nfo_path, color_hex, digest
+                else:
+                    reporter.event('skipped', nfo_path)
 
-    print("Metadata generation and validation complete.")
+        def run_job(job):
+            folder_name, _, color_hex, _ = job
+            messages = []
+            # Create or validate .nfo file
+            status = create_or_validate_nfo(folder_name, color_hex, root_path,
+                                            log=messages.append, reporter=reporter)
+            return job, status, messages
+
+        for (_, nfo_path, color_hex, digest), status, messages in bounded_map(run_job, pending_jobs(), jobs):
+            reporter.event(status, nfo_path, messages)
+            if status != 'failed' and nfo_index:
+                nfo_index.record(nfo_path, digest, color_hex)
+    finally:
+        if nfo_index:
+            nfo_index.close()
+
+    reporter.info("Metadata generation and validation complete.")
 
 def main():
     """
@@ -139,10 +242,37 @@ def main():
         type=str,
         help="Path to the root directory containing the subdirectories."
     )
+    parser.add_argument(
+        "--ignore",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Glob pattern for subdirectory names to skip. Can be repeated."
+    )
+    parser.add_argument(
+        "--rebalance",
+        action="store_true",
+        help="Recompute the gradient evenly for all subdirectories instead of keeping existing colors."
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Do not read or update the persistent index and validate every .nfo file from disk."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker threads used to validate and write .nfo files (default: 1)."
+    )
+    add_archive_arguments(parser)
+    add_reporting_arguments(parser)
     args = parser.parse_args()
 
     input_dir = Path(args.input_directory).resolve()
-    traverse_and_generate(input_dir)
+    with ArchiveSink(args.archive, args.archive_format, input_dir) if args.archive else nullcontext() as sink:
+        run_reported(traverse_and_generate, args, input_dir, ignore_patterns=args.ignore,
+                     rebalance=args.rebalance, use_index=not args.no_index, jobs=args.jobs, sink=sink)
 
 if __name__ == "__main__":
     main()
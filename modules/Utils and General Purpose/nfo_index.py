@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import hashlib
+from collections import namedtuple
+
+# Stored in the library root; the leading dot keeps it out of the walker's results
+INDEX_FILENAME = ".nfo_index.sqlite"
+
+IndexEntry = namedtuple("IndexEntry", ["digest", "color"])
+
+def content_digest(content):
+    """
+    Returns a short hex digest of the desired .nfo content.
+    """
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+class NfoIndex:
+    """
+    Persistent index of .nfo targets stored as SQLite in the library root.
+
+    Each row records a target's path (relative to the root), mtime, size, the digest
+    of the content that was validated or written, and its color. A target whose
+    current mtime and size still match its row is known to hold that content, so it
+    can be skipped without being opened.
+    """
+
+    def __init__(self, root_path, filename=INDEX_FILENAME):
+        self.root_path = os.fspath(root_path)
+        self.connection = sqlite3.connect(os.path.join(self.root_path, filename))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, digest TEXT, color TEXT)"
+        )
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS audio_info (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, info TEXT)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS peaks (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, peaks BLOB)"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _key(self, nfo_path):
+        return os.path.relpath(os.fspath(nfo_path), self.root_path).replace(os.sep, '/')
+
+    def lookup(self, nfo_path):
+        """
+        Returns the IndexEntry for nfo_path if the file is unchanged since it was
+        recorded, otherwise None.
+        """
+        row = self.connection.execute(
+            "SELECT mtime_ns, size, digest, color FROM entries WHERE path = ?",
+            (self._key(nfo_path),)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            st = os.stat(nfo_path)
+        except OSError:
+            return None
+        if (st.st_mtime_ns, st.st_size) != (row[0], row[1]):
+            return None
+        return IndexEntry(row[2], row[3])
+
+    def record(self, nfo_path, digest, color):
+        """
+        Records the current fingerprint of nfo_path together with its content digest.
+        """
+        try:
+            st = os.stat(nfo_path)
+        except OSError:
+            self.forget(nfo_path)
+            return
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entries (path, mtime_ns, size, digest, color) VALUES (?, ?, ?, ?, ?)",
+            (self._key(nfo_path), st.st_mtime_ns, st.st_size, digest, color)
+        )
+
+    def forget(self, nfo_path):
+        """
+        Removes nfo_path from the index.
+        """
+        self.connection.execute("DELETE FROM entries WHERE path = ?", (self._key(nfo_path),))
+
+    def lookup_info(self, audio_path, st):
+        """
+        Returns the stored header metadata of an audio file (as text) if it was
+        recorded at the mtime and size in st, otherwise None.
+        """
+        row = self.connection.execute(
+            "SELECT mtime_ns, size, info FROM audio_info WHERE path = ?", (self._key(audio_path),)
+        ).fetchone()
+        if row is None or (row[0], row[1]) != (st.st_mtime_ns, st.st_size):
+            return None
+        return row[2]
+
+    def record_info(self, audio_path, st, info):
+        """
+        Stores the header metadata of an audio file (as text) for the mtime and size in st.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO audio_info (path, mtime_ns, size, info) VALUES (?, ?, ?, ?)",
+            (self._key(audio_path), st.st_mtime_ns, st.st_size, info)
+        )
+
+    def lookup_peaks(self, audio_path, st):
+        """
+        Returns the stored peak envelope of an audio file (as bytes) if it was
+        recorded at the mtime and size in st, otherwise None.
+        """
+        row = self.connection.execute(
+            "SELECT mtime_ns, size, peaks FROM peaks WHERE path = ?", (self._key(audio_path),)
+        ).fetchone()
+        if row is None or (row[0], row[1]) != (st.st_mtime_ns, st.st_size):
+            return None
+        return row[2]
+
+    def record_peaks(self, audio_path, st, peaks):
+        """
+        Stores the peak envelope of an audio file (as bytes) for the mtime and size in st.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO peaks (path, mtime_ns, size, peaks) VALUES (?, ?, ?, ?)",
+            (self._key(audio_path), st.st_mtime_ns, st.st_size, peaks)
+        )
+
+    def get_meta(self, key, default=None):
+        """
+        Returns a value stored with set_meta, or default.
+        """
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        """
+        Stores a run-level value, such as the item count of the last run.
+        """
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def commit(self):
+        """
+        Commits pending changes.
+        """
+        self.connection.commit()
+
+    def close(self):
+        """
+        Commits pending changes and closes the database.
+        """
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,34 @@
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def bounded_map(fn, iterable, jobs, executor_class=ThreadPoolExecutor, window=4):
+    """
+    Applies fn to every item of iterable on a pool of `jobs` workers and yields the
+    results in input order.
+
+    At most jobs * window tasks are in flight at once, so the input can be an
+    arbitrarily long generator without queueing everything up front. With
+    jobs <= 1 the items are processed inline in the calling thread.
+    """
+    if not jobs or jobs <= 1:
+        for item in iterable:
+            yield fn(item)
+        return
+
+    with executor_class(max_workers=jobs) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= jobs * window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def chunked(iterable, size):
+    """
+    Yields lists of up to size consecutive items of iterable.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
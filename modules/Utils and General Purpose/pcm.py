@@ -0,0 +1,109 @@
+import os
+import mmap
+import wave
+import struct
+
+from audiometa import extended_to_float
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Formats whose PCM can be read with the standard library
+PCM_EXTENSIONS = ('.wav', '.aif', '.aiff')
+
+# Audio frames decoded per read
+CHUNK_FRAMES = 1 << 16
+
+# Exceptions raised while reading a broken or unsupported file
+PCM_ERRORS = (OSError, EOFError, ValueError, wave.Error, struct.error)
+
+def numpy_available():
+    """
+    Returns True if NumPy could be imported.
+    """
+    return np is not None
+
+def _wav_chunks(path, max_seconds):
+    with wave.open(os.fspath(path), 'rb') as reader:
+        channels, width, rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+        remaining = reader.getnframes()
+        if max_seconds is not None:
+            remaining = min(remaining, int(rate * max_seconds))
+        yield channels, width, rate, False, remaining
+        while remaining > 0:
+            data = reader.readframes(min(CHUNK_FRAMES, remaining))
+            if not data:
+                break
+            remaining -= len(data) // (channels * width)
+            yield data
+
+def _aiff_chunks(path, max_seconds):
+    # aifc is deprecated, so AIFF/AIFC chunks are parsed directly from an mmap
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if mapped[:4] != b'FORM' or mapped[8:12] not in (b'AIFF', b'AIFC'):
+            raise ValueError("not an AIFF file")
+        offset = 12
+        comm = sound = None
+        while offset + 8 <= len(mapped):
+            chunk_id, size = mapped[offset:offset + 4], struct.unpack('>I', mapped[offset + 4:offset + 8])[0]
+            if chunk_id == b'COMM':
+                comm = mapped[offset + 8:offset + 8 + size]
+            elif chunk_id == b'SSND':
+                data_offset = struct.unpack('>I', mapped[offset + 8:offset + 12])[0]
+                sound = (offset + 16 + data_offset, offset + 8 + size)
+            offset += 8 + size + (size & 1)
+        if comm is None or sound is None:
+            raise ValueError("missing COMM or SSND chunk")
+        channels, frames, bits = struct.unpack('>hIh', comm[:8])
+        rate = extended_to_float(comm[8:18])
+        compression = comm[18:22] if mapped[8:12] == b'AIFC' else b'NONE'
+        if compression not in (b'NONE', b'sowt') or not 8 <= bits <= 32 or not rate or channels < 1:
+            raise ValueError("unsupported AIFF encoding")
+        width = (bits + 7) // 8
+        start, end = sound
+        end = min(end, len(mapped), start + frames * channels * width)
+        if max_seconds is not None:
+            end = min(end, start + int(rate * max_seconds) * channels * width)
+        yield channels, width, rate, compression == b'NONE', max(0, end - start) // (channels * width)
+        step = CHUNK_FRAMES * channels * width
+        for position in range(start, end, step):
+            yield mapped[position:min(position + step, end)]
+
+def _to_mono(data, channels, width, big_endian):
+    frame_bytes = channels * width
+    data = data[:len(data) - len(data) % frame_bytes]
+    order = '>' if big_endian else '<'
+    if width == 1:
+        # 8-bit WAV is unsigned, 8-bit AIFF is signed
+        samples = np.frombuffer(data, np.int8 if big_endian else np.uint8).astype(np.float32)
+        if not big_endian:
+            samples -= 128
+    elif width == 3:
+        raw = np.frombuffer(data, np.uint8).reshape(-1, 3).astype(np.int32)
+        if big_endian:
+            raw = raw[:, ::-1]
+        samples = ((raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)) << 8 >> 8).astype(np.float32)
+    else:
+        samples = np.frombuffer(data, f'{order}i{width}').astype(np.float32)
+    samples /= float(1 << (8 * width - 1))
+    return samples.reshape(-1, channels).mean(axis=1)
+
+def open_pcm(path, max_seconds=None):
+    """
+    Opens a WAV or AIFF file and returns (rate, frames, chunks), where chunks
+    yields the audio as mono float32 NumPy arrays in [-1, 1) of up to
+    CHUNK_FRAMES frames each, and frames is the number of frames it will yield.
+    Only the first max_seconds are read if given.
+
+    The headers are parsed immediately; the audio is decoded lazily, one chunk at
+    a time. Raises one of PCM_ERRORS for files that cannot be decoded.
+    """
+    reader = _aiff_chunks if os.path.splitext(os.fspath(path))[1].lower() in ('.aif', '.aiff') else _wav_chunks
+    chunks = reader(path, max_seconds)
+    try:
+        channels, width, rate, big_endian, frames = next(chunks)
+    except StopIteration:
+        raise ValueError("no audio stream") from None
+    return rate, frames, (_to_mono(data, channels, width, big_endian) for data in chunks)
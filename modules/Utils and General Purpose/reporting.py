@@ -0,0 +1,222 @@
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+OUTPUT_MODES = ('verbose', 'progress', 'quiet', 'json')
+
+# Counters listed first in summaries, in this order
+SUMMARY_COUNTERS = ('scanned', 'created', 'updated', 'skipped', 'failed')
+
+# Minimum seconds between two progress bar redraws
+PROGRESS_INTERVAL = 0.1
+
+class Reporter:
+    """
+    Collects counters and per-phase timings for a run and reports progress in one
+    of several output modes:
+
+    - verbose: one line per processed item, like the original scripts
+    - progress: a single self-updating progress line on stderr
+    - quiet: only errors
+    - json: one JSON object per event on stdout (JSON lines)
+
+    Errors are always reported. Phase timings are summed across threads, so they
+    show where work went rather than elapsed wall-clock time when run in parallel.
+    """
+
+    def __init__(self, mode='progress', stream=None, error_stream=None):
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode: {mode}")
+        self.mode = mode
+        self.stream = stream or sys.stdout
+        self.error_stream = error_stream or sys.stderr
+        self.counters = Counter()
+        self.timings = Counter()
+        self.total = None
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._last_draw = 0.0
+        self._drawn = False
+
+    def _emit_json(self, record):
+        self.stream.write(json.dumps(record) + "\n")
+
+    def set_total(self, total):
+        """
+        Sets the number of items expected, used for the progress bar.
+        """
+        self.total = total
+
+    def count(self, name, amount=1):
+        """
+        Increments a counter without reporting an event.
+        """
+        with self._lock:
+            self.counters[name] += amount
+
+    def detail(self, message):
+        """
+        Reports per-item chatter, shown only in verbose mode.
+        """
+        if self.mode == 'verbose':
+            print(message, file=self.stream)
+
+    def info(self, message):
+        """
+        Reports a headline message, shown in verbose and progress modes.
+        """
+        if self.mode == 'json':
+            self._emit_json({"event": "info", "message": message})
+        elif self.mode != 'quiet':
+            self._clear_progress()
+            print(message, file=self.stream)
+
+    def error(self, message):
+        """
+        Reports an error in every mode.
+        """
+        if self.mode == 'json':
+            self._emit_json({"event": "error", "message": message})
+        else:
+            self._clear_progress()
+            print(message, file=self.error_stream)
+
+    def event(self, status, path=None, messages=()):
+        """
+        Records the outcome of one item: increments the counter named status and
+        reports it according to the output mode. Messages of failed items are
+        reported as errors.
+        """
+        with self._lock:
+            self.counters[status] += 1
+        if self.mode == 'json':
+            record = {"event": status}
+            if path is not None:
+                record["path"] = str(path)
+            if messages:
+                record["messages"] = list(messages)
+            self._emit_json(record)
+        elif status == 'failed':
+            for message in messages:
+                self.error(message)
+        elif self.mode == 'verbose':
+            for message in messages:
+                print(message, file=self.stream)
+        elif self.mode == 'progress':
+            self._draw_progress()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager adding the time spent inside it to the named phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.timings[name] += elapsed
+
+    def _processed(self):
+        return sum(count for name, count in self.counters.items() if name != 'scanned')
+
+    def _draw_progress(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_draw < PROGRESS_INTERVAL:
+            return
+        if not self.error_stream.isatty():
+            return
+        self._last_draw = now
+        done = self._processed()
+        if self.total:
+            width = 30
+            filled = min(width, int(width * done / self.total))
+            line = f"[{'#' * filled}{'.' * (width - filled)}] {done}/{self.total}"
+        else:
+            line = f"{done} processed"
+        self.error_stream.write(f"\r{line}")
+        self.error_stream.flush()
+        self._drawn = True
+
+    def _clear_progress(self):
+        if self._drawn:
+            self.error_stream.write("\r\033[K")
+            self.error_stream.flush()
+            self._drawn = False
+
+    def summary(self):
+        """
+        Reports the counters, phase timings and total elapsed time.
+        """
+        elapsed = time.perf_counter() - self.started
+        names = [name for name in SUMMARY_COUNTERS if self.counters[name]]
+        names += sorted(name for name in self.counters if name not in SUMMARY_COUNTERS)
+        if self.mode == 'json':
+            self._emit_json({
+                "event": "summary",
+                "counters": {name: self.counters[name] for name in names},
+                "timings": {name: round(seconds, 6) for name, seconds in self.timings.items()},
+                "elapsed": round(elapsed, 6),
+            })
+            return
+        if self.mode == 'quiet':
+            return
+        self._clear_progress()
+        counts = ", ".join(f"{name}: {self.counters[name]}" for name in names) or "nothing to do"
+        print(f"Summary - {counts}", file=self.stream)
+        if self.timings:
+            timings = ", ".join(f"{name}: {seconds:.3f}s" for name, seconds in self.timings.items())
+            print(f"Timings - {timings}, total: {elapsed:.3f}s", file=self.stream)
+
+def add_reporting_arguments(parser):
+    """
+    Adds the shared --output and --profile options to an argparse parser.
+    """
+    parser.add_argument(
+        "--output",
+        choices=OUTPUT_MODES,
+        default='progress',
+        help="How to report progress: one line per item (verbose), a progress bar (progress), "
+             "errors only (quiet) or JSON lines (json). Default: progress."
+    )
+    parser.add_argument(
+        "--profile",
+        nargs='?',
+        const='-',
+        default=None,
+        metavar="FILE",
+        help="Run under cProfile. Prints the top functions to stderr, or saves raw stats to FILE."
+    )
+
+def run_reported(function, args, *call_args, **call_kwargs):
+    """
+    Runs function(*call_args, reporter=..., **call_kwargs) with a Reporter built from
+    the parsed --output option, under cProfile if --profile was given, and prints
+    the summary afterwards. Returns the function's result.
+
+    When an archive is written to standard output (--archive -), all reporting
+    goes to stderr so it cannot corrupt the archive.
+    """
+    to_stdout = getattr(args, 'archive', None) == '-'
+    reporter = Reporter(args.output, stream=sys.stderr if to_stdout else None)
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        if profiler:
+            profiler.enable()
+        return function(*call_args, reporter=reporter, **call_kwargs)
+    finally:
+        if profiler:
+            profiler.disable()
+        reporter.summary()
+        if profiler:
+            if args.profile == '-':
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(25)
+            else:
+                profiler.dump_stats(args.profile)
+                print(f"Profile written to '{args.profile}'.", file=sys.stderr)
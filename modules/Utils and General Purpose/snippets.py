@@ -1,9 +1,39 @@
 import os
 import sys
 import json
+import glob
 import argparse
 import ast
-from typing import List, Dict, Tuple
+import sqlite3
+import hashlib
+from itertools import accumulate
+from collections import Counter
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Dict, Optional, Tuple
+
+from bundler import module_name
+from fsutil import atomic_write, temp_path_for
+from parallel import bounded_map, chunked
+from walker import walk_tree
+
+# Source files handled per worker task in batch mode
+CHUNK_SIZE = 16
+
+# Directory names never searched for source files in batch mode
+IGNORED_DIRECTORIES = ('__pycache__',)
+
+# Characters that make an input a glob pattern rather than a path
+GLOB_CHARACTERS = '*?['
+
+# Cache of parsed definitions, kept in the output file's directory
+SPAN_CACHE_FILENAME = ".snippets_cache.sqlite"
+
+# Bumped whenever collect_definitions changes what it returns
+SPAN_CACHE_VERSION = 1
+
+# Key under which merged snippets record the source file and content digest they were generated from
+SOURCE_TAG = "source"
 
 def read_python_file(file_path: str) -> str:
     """
@@ -43,8 +73,22 @@ def parse_python_content(content: str) -> List[Tuple[str, int, int, str]]:
     except SyntaxError as e:
         print(f"Syntax error while parsing the Python file: {e}")
         sys.exit(1)
-    
+    return collect_definitions(tree, content)
+
+def collect_definitions(tree: ast.AST, content: str) -> List[Tuple[str, int, int, str]]:
+    """
+    Collects the functions and classes of a parsed module.
+
+    Args:
+        tree (ast.AST): The parsed module.
+        content (str): The content the module was parsed from.
+
+    Returns:
+        List[Tuple[str, int, int, str]]: A list of tuples containing
+            (name, start_line, end_line, type), where type is 'function' or 'class'.
+    """
     snippets = []
+    line_index = None
 
     for node in ast.walk(tree):
         if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
@@ -54,7 +98,8 @@ def parse_python_content(content: str) -> List[Tuple[str, int, int, str]]:
             end_line = getattr(node, 'end_lineno', None)
             if end_line is None:
                 # Fallback if end_lineno is not available (Python < 3.8)
-                end_line = find_end_line(content, node)
+                line_index = line_index or build_line_index(content)
+                end_line = find_end_line(content, node, line_index)
             snippets.append((name, start_line, end_line, type_))
         elif isinstance(node, ast.ClassDef):
             name = node.name
@@ -62,34 +107,63 @@ def parse_python_content(content: str) -> List[Tuple[str, int, int, str]]:
             start_line = node.lineno
             end_line = getattr(node, 'end_lineno', None)
             if end_line is None:
-                end_line = find_end_line(content, node)
+                line_index = line_index or build_line_index(content)
+                end_line = find_end_line(content, node, line_index)
             snippets.append((name, start_line, end_line, type_))
     
     return snippets
 
-def find_end_line(content: str, node: ast.AST) -> int:
+def build_line_index(content: str) -> List[int]:
+    """
+    Splits content into lines once and records where each one starts.
+
+    Args:
+        content (str): The full content of the Python file.
+
+    Returns:
+        List[int]: The offset of every line in content, followed by len(content).
+            Lines end where str.splitlines() would split them.
+    """
+    return list(accumulate(map(len, content.splitlines(keepends=True)), initial=0))
+
+def line_slice(content: str, line_index: List[int], first: int, last: int) -> List[str]:
+    """
+    Returns lines first to last (0-based, last excluded) of content, like
+    content.splitlines()[first:last] but without splitting the rest of the file.
+    """
+    count = len(line_index) - 1
+    first, last = min(max(first, 0), count), min(max(last, 0), count)
+    if first >= last:
+        return []
+    return content[line_index[first]:line_index[last]].splitlines()
+
+def find_end_line(content: str, node: ast.AST, line_index: List[int] = None) -> int:
     """
     Estimates the end line of a node if end_lineno is not available.
 
     Args:
         content (str): The full content of the Python file.
         node (ast.AST): The AST node.
+        line_index (List[int]): build_line_index(content), if already known.
 
     Returns:
         int: Estimated end line number.
     """
-    lines = content.splitlines()
+    line_index = line_index or build_line_index(content)
+    count = len(line_index) - 1
     start = node.lineno - 1  # 0-based index
-    for i in range(start + 1, len(lines)):
-        if lines[i].strip() == '':
+    start_line = line_slice(content, line_index, start, start + 1)
+    current_indent = len(start_line[0]) - len(start_line[0].lstrip()) if start_line else 0
+    for i in range(start + 1, count):
+        line = line_slice(content, line_index, i, i + 1)[0]
+        if line.strip() == '':
             continue
-        current_indent = len(lines[start]) - len(lines[start].lstrip())
-        next_indent = len(lines[i]) - len(lines[i].lstrip())
-        if next_indent <= current_indent and not lines[i].startswith((' ', '\t')):
+        next_indent = len(line) - len(line.lstrip())
+        if next_indent <= current_indent and not line.startswith((' ', '\t')):
             return i
-    return len(lines)
+    return count
 
-def extract_snippet_content(content: str, start_line: int, end_line: int) -> List[str]:
+def extract_snippet_content(content: str, start_line: int, end_line: int, line_index: List[int] = None) -> List[str]:
     """
     Extracts the lines corresponding to a snippet.
 
@@ -97,13 +171,15 @@ def extract_snippet_content(content: str, start_line: int, end_line: int) -> Lis
         content (str): The full content of the Python file.
         start_line (int): The starting line number (1-based).
         end_line (int): The ending line number (1-based).
+        line_index (List[int]): build_line_index(content); pass it when extracting
+            several snippets from one file so that the file is only split once.
 
     Returns:
         List[str]: List of code lines for the snippet.
     """
-    lines = content.splitlines()
+    line_index = line_index or build_line_index(content)
     # Adjust for 0-based indexing and slicing (end_line is inclusive)
-    snippet_lines = lines[start_line - 1:end_line]
+    snippet_lines = line_slice(content, line_index, start_line - 1, end_line)
     # Remove any leading/trailing empty lines
     while snippet_lines and snippet_lines[0].strip() == '':
         snippet_lines.pop(0)
@@ -139,29 +215,598 @@ def create_snippet_dict(name: str, prefix: str, description: str, code_lines: Li
     }
     return snippet
 
-def generate_snippets(content: str) -> Dict:
+def default_snippet_name(name: str, type_: str) -> str:
+    """
+    Returns the name a function or class snippet is stored under in single-file mode.
+    """
+    return f"{type_.capitalize()} - {name}"
+
+def build_snippet(content: str, name: str, start: int, end: int, type_: str,
+                  snippet_name: str = None, module: str = None, line_index: List[int] = None) -> Dict:
+    """
+    Creates the snippet dictionary for one function or class.
+
+    Args:
+        content (str): The full content of the Python file.
+        name (str): The function or class name.
+        start (int): The starting line number (1-based).
+        end (int): The ending line number (1-based).
+        type_ (str): 'function' or 'class'.
+        snippet_name (str): The name to store the snippet under (default: default_snippet_name).
+        module (str): The module the definition comes from, named in the description if given.
+        line_index (List[int]): build_line_index(content), if already known.
+
+    Returns:
+        Dict: A dictionary representing the snippet.
+    """
+    snippet_prefix = f"{type_}.{name}"
+    snippet_description = f"Snippet for {type_} '{name}'" + (f" in {module}" if module else "")
+    snippet_body = extract_snippet_content(content, start, end, line_index)
+    return create_snippet_dict(snippet_name or default_snippet_name(name, type_), snippet_prefix,
+                               snippet_description, snippet_body)
+
+def content_digest(content: str) -> str:
+    """
+    Returns the digest the span cache stores a file's definitions under.
+    """
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+class SpanCache:
+    """
+    Persistent cache of the functions and classes found in Python files, stored
+    as SQLite.
+
+    Definitions are keyed by a digest of the file content, so unchanged, renamed
+    or copied files are never parsed again. Worker processes open their own
+    connection for lookups; only the creating process records new entries.
+    """
+
+    def __init__(self, directory: str, filename: str = SPAN_CACHE_FILENAME):
+        self.path = os.path.join(os.fspath(directory), filename)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS spans (digest TEXT PRIMARY KEY, version INTEGER, spans TEXT)"
+        )
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def lookup(self, digest: str) -> Optional[List[Tuple[str, int, int, str]]]:
+        """
+        Returns the recorded (name, start_line, end_line, type) definitions of the
+        content with this digest, or None if it was never parsed.
+        """
+        try:
+            row = self.connection.execute(
+                "SELECT spans FROM spans WHERE digest = ? AND version = ?", (digest, SPAN_CACHE_VERSION)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return [tuple(span) for span in json.loads(row[0])] if row else None
+
+    def record(self, digest: str, definitions: List[Tuple[str, int, int, str]]):
+        """
+        Records the definitions found in the content with this digest.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO spans (digest, version, spans) VALUES (?, ?, ?)",
+            (digest, SPAN_CACHE_VERSION, json.dumps(definitions))
+        )
+
+    def close(self):
+        """
+        Commits pending changes and closes the database.
+        """
+        self.connection.commit()
+        self.connection.close()
+
+# Span caches opened for lookups, by database path; in worker processes they
+# stay open for the life of the process
+_lookup_caches = {}
+
+def _lookup_cache(path: str) -> Optional[SpanCache]:
+    if path not in _lookup_caches:
+        try:
+            _lookup_caches[path] = SpanCache(os.path.dirname(path), os.path.basename(path))
+        except sqlite3.Error:
+            _lookup_caches[path] = None
+    return _lookup_caches[path]
+
+def _close_lookup_caches():
+    for cache in _lookup_caches.values():
+        if cache is not None:
+            cache.connection.close()
+    _lookup_caches.clear()
+
+def generate_snippets(content: str, cache: SpanCache = None) -> Dict:
     """
     Generates a dictionary of snippets from the Python content.
 
     Args:
         content (str): The content of the Python file.
+        cache (SpanCache): If given, definitions are taken from it when the same
+            content was parsed before, and recorded in it otherwise.
 
     Returns:
         Dict: A dictionary containing all snippets.
     """
-    snippets_info = parse_python_content(content)
+    digest = content_digest(content) if cache else None
+    snippets_info = cache.lookup(digest) if cache else None
+    if snippets_info is None:
+        snippets_info = parse_python_content(content)
+        if cache:
+            cache.record(digest, snippets_info)
+    line_index = build_line_index(content)
     snippets = {}
 
     for name, start, end, type_ in snippets_info:
-        snippet_name = f"{type_.capitalize()} - {name}"
-        snippet_prefix = f"{type_}.{name}"
-        snippet_description = f"Snippet for {type_} '{name}'"
-        snippet_body = extract_snippet_content(content, start, end)
-        snippet = create_snippet_dict(snippet_name, snippet_prefix, snippet_description, snippet_body)
-        snippets.update(snippet)
+        snippets.update(build_snippet(content, name, start, end, type_, line_index=line_index))
     
     return snippets
 
+def glob_base(pattern: str) -> str:
+    """
+    Returns the directory part of a glob pattern that comes before its first wildcard.
+    """
+    parts = pattern.replace(os.sep, '/').split('/')
+    for index, part in enumerate(parts):
+        if any(character in part for character in GLOB_CHARACTERS):
+            return '/'.join(parts[:index]) or '.'
+    return os.path.dirname(pattern) or '.'
+
+def expand_inputs(inputs: List[str]) -> List[Tuple[str, str]]:
+    """
+    Expands input files, directories and glob patterns into the Python files they name.
+
+    Args:
+        inputs (List[str]): Files, directories (searched recursively, skipping hidden
+            ones) and glob patterns ('**' matches any number of directories).
+
+    Returns:
+        List[Tuple[str, str]]: Sorted (path, module name) pairs, one per file. Module
+            names are dotted paths relative to the directory that was given, the
+            directory part of the glob pattern, or the file's own directory.
+    """
+    modules = {}
+    for item in inputs:
+        if os.path.isdir(item):
+            base = item
+            found = [entry.path for entry, _ in walk_tree(item, ignore_patterns=IGNORED_DIRECTORIES)
+                     if entry.name.endswith('.py') and entry.is_file()]
+        elif any(character in item for character in GLOB_CHARACTERS):
+            base = glob_base(item)
+            found = [path for path in glob.glob(item, recursive=True)
+                     if path.endswith('.py') and os.path.isfile(path)]
+        else:
+            base = os.path.dirname(item) or '.'
+            found = [item] if os.path.isfile(item) else []
+        if not found:
+            print(f"Warning: No Python files found for '{item}'.")
+        for path in found:
+            relpath = os.path.relpath(path, base).replace(os.sep, '/')
+            modules.setdefault(os.path.abspath(path), module_name(relpath)[0])
+    return sorted(modules.items())
+
+def scan_source_file(path: str, cache_path: str = None) -> Tuple[List[Tuple[str, int, int, str]], str, bool, str]:
+    """
+    Reads and parses one file for batch mode. Runs in worker processes.
+
+    Args:
+        path (str): Path to the Python file.
+        cache_path (str): Path of a SpanCache database to look the content up in
+            before parsing it.
+
+    Returns:
+        Tuple[List[Tuple[str, int, int, str]], str, bool, str]: The file's (name,
+            start_line, end_line, type) definitions, its content digest, whether the
+            definitions came from the cache, and None; or an empty list, None, False
+            and an error message.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        digest = content_digest(content)
+        if cache_path:
+            cache = _lookup_cache(cache_path)
+            definitions = cache.lookup(digest) if cache else None
+            if definitions is not None:
+                return definitions, digest, True, None
+        return collect_definitions(ast.parse(content, filename=path), content), digest, False, None
+    except (OSError, SyntaxError, UnicodeDecodeError, ValueError) as e:
+        return [], None, False, str(e)
+
+def _scan_chunk(chunk: List[str], cache_path: str = None) -> list:
+    return [scan_source_file(path, cache_path) for path in chunk]
+
+def json_entry(snippet: Dict) -> str:
+    """
+    Returns the text json.dump(..., indent=4) writes for a one-entry snippet
+    dictionary inside the top-level object, without the separating comma.
+    """
+    return json.dumps(snippet, indent=4)[2:-2]
+
+def render_source_file(job: Tuple[str, str, List[Tuple[str, int, int, str, str]], str],
+                       tag: Dict = None) -> Tuple[list, str]:
+    """
+    Builds one file's snippets for batch mode. Runs in worker processes.
+
+    Args:
+        job: (path, module name, [(name, start_line, end_line, type, snippet_name)],
+            content digest), as scanned.
+        tag (Dict): A source tag (see source_tag) to add to every snippet. Tagged
+            snippets are returned as one-entry dictionaries rather than json_entry text.
+
+    Returns:
+        Tuple[list, str]: The entries as json_entry text (or dictionaries) and None,
+            or an empty list and an error message, also when the file no longer has
+            the scanned content.
+    """
+    path, module, definitions, digest = job
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return [], str(e)
+    if content_digest(content) != digest:
+        # The line numbers belong to the scanned content
+        return [], "file changed while its snippets were being generated"
+    line_index = build_line_index(content)
+    snippets = [build_snippet(content, name, start, end, type_, snippet_name, module, line_index)
+                for name, start, end, type_, snippet_name in definitions]
+    if tag is not None:
+        return [tag_snippets(snippet, tag) for snippet in snippets], None
+    return [json_entry(snippet) for snippet in snippets], None
+
+def _render_chunk(chunk: list) -> List[Tuple[list, str]]:
+    return [render_source_file(*job) for job in chunk]
+
+def assign_snippet_names(scanned: List[Tuple[str, List[Tuple[str, int, int, str]]]],
+                         taken: Iterable[str] = ()) -> List[List[str]]:
+    """
+    Names the snippets of many modules so that no two share a name.
+
+    Names that occur once keep their single-file form ('Function - name'); names
+    that occur more than once or are taken are qualified with their module
+    ('Function - name (pkg.module)'), and repeats within one module are numbered
+    in source order, skipping numbered names that are taken.
+
+    Args:
+        scanned: (module name, definitions) pairs in output order.
+        taken (Iterable[str]): Names already in use elsewhere, e.g. by entries of
+            a file being merged into.
+
+    Returns:
+        List[List[str]]: The snippet names of each module's definitions.
+    """
+    taken = set(taken)
+    counts = Counter(default_snippet_name(name, type_)
+                     for _, definitions in scanned for name, _, _, type_ in definitions)
+    names = []
+    for module, definitions in scanned:
+        seen = Counter()
+        module_names = []
+        for name, _, _, type_ in definitions:
+            snippet_name = default_snippet_name(name, type_)
+            if counts[snippet_name] > 1 or snippet_name in taken:
+                snippet_name = f"{snippet_name} ({module})"
+            seen[snippet_name] += 1
+            numbered = snippet_name if seen[snippet_name] == 1 else f"{snippet_name} #{seen[snippet_name]}"
+            while numbered in taken:
+                seen[snippet_name] += 1
+                numbered = f"{snippet_name} #{seen[snippet_name]}"
+            module_names.append(numbered)
+        names.append(module_names)
+    return names
+
+def write_json_entries(entries: Iterable[str], output_path: str) -> int:
+    """
+    Streams json_entry texts into a snippets JSON file laid out like write_json_snippets.
+
+    The file is written under a temporary name and renamed into place when complete;
+    if there are no entries, nothing is written.
+
+    Args:
+        entries (Iterable[str]): The entries, produced as they are written.
+        output_path (str): Path to the output JSON file.
+
+    Returns:
+        int: The number of entries written.
+    """
+    temp_path = temp_path_for(output_path)
+    count = 0
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(',\n' if count else '{\n')
+                f.write(entry)
+                count += 1
+            if count:
+                f.write('\n}')
+        if count:
+            os.replace(temp_path, output_path)
+        else:
+            os.remove(temp_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return count
+
+def scan_files(files: List[Tuple[str, str]], cache_dir: str, jobs: int,
+               use_cache: bool = True) -> List[Tuple[str, str, List[Tuple[str, int, int, str]], str]]:
+    """
+    Finds the definitions of many files on a process pool.
+
+    Args:
+        files (List[Tuple[str, str]]): (path, module name) pairs, as from expand_inputs.
+        cache_dir (str): Directory of the SpanCache to use.
+        jobs (int): Number of worker processes.
+        use_cache (bool): Read and update the span cache.
+
+    Returns:
+        List[Tuple[str, str, List[Tuple[str, int, int, str]], str]]: (path, module
+            name, definitions, content digest) for every file that could be read
+            and parsed, in input order. Other files are reported and left out.
+    """
+    cache = SpanCache(cache_dir) if use_cache else None
+    try:
+        scan = partial(_scan_chunk, cache_path=cache.path if cache else None)
+        results = bounded_map(scan, chunked([path for path, _ in files], CHUNK_SIZE), jobs,
+                              executor_class=ProcessPoolExecutor)
+        scanned = []
+        parsed = []
+        for (path, module), (definitions, digest, cached, error) in zip(
+                files, (result for chunk in results for result in chunk)):
+            if error:
+                print(f"Skipping '{path}': {error}")
+                continue
+            if cache and not cached:
+                parsed.append((digest, definitions))
+            scanned.append((path, module, definitions, digest))
+        # Recorded once the workers, which read the cache, are done
+        for digest, definitions in parsed:
+            cache.record(digest, definitions)
+    finally:
+        _close_lookup_caches()
+        if cache:
+            cache.close()
+    return scanned
+
+def name_definitions(scanned: List[Tuple[str, str, List[Tuple[str, int, int, str]], str]],
+                     taken: Iterable[str] = ()) -> List[Tuple[str, str, list]]:
+    """
+    Returns the render jobs (path, module name, [(name, start_line, end_line, type,
+    snippet_name)], content digest) of the scanned files that have definitions,
+    named with assign_snippet_names around the taken names.
+    """
+    with_definitions = [item for item in scanned if item[2]]
+    names = assign_snippet_names([(module, definitions) for _, module, definitions, _ in with_definitions], taken)
+    render_jobs = []
+    for (path, module, definitions, digest), module_names in zip(with_definitions, names):
+        named = [tuple(definition) + (snippet_name,) for definition, snippet_name in zip(definitions, module_names)]
+        render_jobs.append((path, module, named, digest))
+    return render_jobs
+
+def render_files(render_jobs: list, jobs: int, tags: List[Dict] = None) -> Iterable[Tuple[list, str]]:
+    """
+    Renders files on a process pool with render_source_file and yields each file's
+    (entries, error) in order, reporting files that can no longer be read or have
+    changed since they were scanned. tags, if given, holds the source tag of each job.
+    """
+    work = [(job,) for job in render_jobs] if tags is None else list(zip(render_jobs, tags))
+    rendered = bounded_map(_render_chunk, chunked(work, CHUNK_SIZE), jobs, executor_class=ProcessPoolExecutor)
+    for (path, _, _, _), (file_entries, error) in zip(render_jobs, (result for chunk in rendered for result in chunk)):
+        if error:
+            print(f"Skipping '{path}': {error}")
+        yield file_entries, error
+
+def generate_snippets_batch(inputs: List[str], output_path: str, jobs: int = None,
+                            use_cache: bool = True) -> Tuple[int, int]:
+    """
+    Generates one snippets file from many Python files.
+
+    Files are parsed with ast on a process pool of `jobs` workers (one per CPU by
+    default) to collect their definitions and name them (see assign_snippet_names);
+    a second pass over the pool extracts the code, and the entries are written to
+    the output as they arrive instead of being collected in one dictionary. Files
+    that cannot be read or parsed are reported and skipped.
+
+    Unless use_cache is False, the definitions found in each file are kept in a
+    SpanCache next to the output, so files whose content was seen before are not
+    parsed again.
+
+    Args:
+        inputs (List[str]): Files, directories and glob patterns (see expand_inputs).
+        output_path (str): Path to the output JSON file.
+        jobs (int): Number of worker processes.
+        use_cache (bool): Read and update the span cache.
+
+    Returns:
+        Tuple[int, int]: The number of snippets written and of files they came from.
+    """
+    files = expand_inputs(inputs)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    scanned = scan_files(files, os.path.dirname(os.path.abspath(output_path)), jobs, use_cache)
+    render_jobs = name_definitions(scanned)
+    entries = (entry for file_entries, _ in render_files(render_jobs, jobs) for entry in file_entries)
+    return write_json_entries(entries, output_path), len(render_jobs)
+
+def source_tag(path: str, output_path: str, digest: str) -> Dict:
+    """
+    Returns the tag marking snippets of output_path as generated from path with
+    the given content digest. The path is stored relative to the output's directory.
+    """
+    path = os.path.abspath(path)
+    try:
+        path = os.path.relpath(path, os.path.dirname(os.path.abspath(output_path)))
+    except ValueError:
+        # On another drive than the output
+        pass
+    return {"file": path.replace(os.sep, '/'), "hash": digest}
+
+def tag_snippets(snippets: Dict, tag: Dict) -> Dict:
+    """
+    Returns a copy of a snippets dictionary with the source tag added to every snippet.
+    """
+    return {name: dict(snippet, **{SOURCE_TAG: tag}) for name, snippet in snippets.items()}
+
+def snippet_owner(snippet) -> Optional[str]:
+    """
+    Returns the source file recorded in a snippet's tag, or None for snippets
+    without one, such as hand-written entries.
+    """
+    tag = snippet.get(SOURCE_TAG) if isinstance(snippet, dict) else None
+    return tag.get("file") if isinstance(tag, dict) else None
+
+def load_snippets_file(path: str) -> Dict:
+    """
+    Reads an existing snippets file for merging.
+
+    Args:
+        path (str): Path to the JSON snippet file.
+
+    Returns:
+        Dict: Its snippets in file order, or an empty dictionary if it does not exist.
+
+    Raises:
+        ValueError: If the file is not a JSON object (e.g. it contains comments).
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snippets = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        raise ValueError(f"'{path}' is not plain JSON ({e}); files with comments cannot be merged") from e
+    if not isinstance(snippets, dict):
+        raise ValueError(f"'{path}' does not hold a JSON object of snippets")
+    return snippets
+
+def merge_snippets(existing: Dict, generated: Dict, owners: Iterable[str]) -> Tuple[Dict, List[str]]:
+    """
+    Merges freshly generated snippets into the snippets of an existing file.
+
+    Every existing snippet tagged with one of the owners (the processed source
+    files) is dropped, and the owner's new snippets take the place of its first
+    old one; owners new to the file are appended. All other snippets, untagged
+    hand-written ones included, are kept as they are and where they are. A
+    generated snippet whose name is taken by one of those is not added.
+
+    Args:
+        existing (Dict): The snippets of the existing file.
+        generated (Dict): The new snippets, each tagged with its source file.
+        owners (Iterable[str]): The source files that were processed, including
+            files that no longer have any snippets.
+
+    Returns:
+        Tuple[Dict, List[str]]: The merged snippets and the names of generated
+            snippets that were left out because the name is taken.
+    """
+    owners = set(owners)
+    kept = {name for name, snippet in existing.items() if snippet_owner(snippet) not in owners}
+    by_owner = {}
+    skipped = []
+    for name, snippet in generated.items():
+        if name in kept:
+            skipped.append(name)
+        else:
+            by_owner.setdefault(snippet_owner(snippet), []).append((name, snippet))
+
+    merged = {}
+    for name, snippet in existing.items():
+        owner = snippet_owner(snippet)
+        if owner not in owners:
+            merged[name] = snippet
+        elif owner in by_owner:
+            merged.update(by_owner.pop(owner))
+    for owner_snippets in by_owner.values():
+        merged.update(owner_snippets)
+    return merged, skipped
+
+def write_merged_snippets(merged: Dict, existing: Dict, output_path: str) -> bool:
+    """
+    Writes merged snippets over output_path through a temp file and rename,
+    unless they are the same as the existing ones, in which case nothing is
+    written. Returns True if the file was written.
+    """
+    if list(merged.items()) == list(existing.items()):
+        return False
+    atomic_write(output_path, json.dumps(merged, indent=4))
+    return True
+
+def merge_snippets_batch(inputs: List[str], output_path: str, jobs: int = None,
+                         use_cache: bool = True) -> Tuple[int, int, int, bool, List[str]]:
+    """
+    Merges the snippets of many Python files into an existing snippets file.
+
+    The existing file is read once. The processed files' snippets are tagged with
+    their source file and content digest (see source_tag); files whose digest and
+    snippet names match their tagged entries keep those entries without being
+    rendered again. Everything else in the file is left alone (see merge_snippets),
+    and its names count as taken, so generated snippets that would collide with
+    them are qualified with their module instead. The file is only rewritten if
+    the result differs.
+
+    Args:
+        inputs (List[str]): Files, directories and glob patterns (see expand_inputs).
+        output_path (str): Path to the JSON snippet file to merge into.
+        jobs (int): Number of worker processes (one per CPU by default).
+        use_cache (bool): Read and update the span cache.
+
+    Returns:
+        Tuple[int, int, int, bool, List[str]]: The number of merged snippets, of
+            files they came from and of snippets kept unchanged, whether the file
+            was written, and the names of snippets left out because they are taken.
+    """
+    existing = load_snippets_file(output_path)
+    files = expand_inputs(inputs)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    scanned = scan_files(files, os.path.dirname(os.path.abspath(output_path)), jobs, use_cache)
+    tags = {path: source_tag(path, output_path, digest) for path, _, _, digest in scanned}
+    owners = {tag["file"] for tag in tags.values()}
+
+    owned = {}
+    for name, snippet in existing.items():
+        owned.setdefault(snippet_owner(snippet), []).append((name, snippet))
+    taken = [name for name, snippet in existing.items() if snippet_owner(snippet) not in owners]
+
+    generated_by_file = {}
+    to_render = []
+    for job in name_definitions(scanned, taken):
+        path, _, named, _ = job
+        tag = tags[path]
+        previous = owned.get(tag["file"], [])
+        if ([name for name, _ in previous] == [definition[-1] for definition in named]
+                and all(snippet[SOURCE_TAG] == tag for _, snippet in previous)):
+            generated_by_file[path] = dict(previous)
+        else:
+            to_render.append(job)
+    reused = sum(len(snippets) for snippets in generated_by_file.values())
+    render_tags = [tags[path] for path, _, _, _ in to_render]
+    for (path, _, _, _), (file_entries, error) in zip(to_render, render_files(to_render, jobs, render_tags)):
+        if error:
+            # Keep what the file had, as if it was not among the inputs
+            generated_by_file[path] = dict(owned.get(tags[path]["file"], []))
+            continue
+        generated_by_file[path] = {name: snippet for entry in file_entries for name, snippet in entry.items()}
+
+    generated = {}
+    for path, _, _, _ in scanned:
+        generated.update(generated_by_file.get(path, {}))
+    merged, skipped = merge_snippets(existing, generated, owners)
+    written = write_merged_snippets(merged, existing, output_path)
+    left_out = set(skipped)
+    files = sum(1 for snippets in generated_by_file.values() if any(name not in left_out for name in snippets))
+    return len(generated) - len(skipped), files, reused, written, skipped
+
 def write_json_snippets(snippets: Dict, output_path: str):
     """
     Writes the snippets dictionary to a JSON file.
@@ -185,19 +830,76 @@ def parse_arguments() -> argparse.Namespace:
     Returns:
         argparse.Namespace: Parsed arguments.
     """
-    parser = argparse.ArgumentParser(description="Convert a Python file into multiple VS Code JSON snippets based on functions and classes.")
-    parser.add_argument('input_file', help="Path to the input Python (.py) file.")
+    parser = argparse.ArgumentParser(description="Convert Python files into VS Code JSON snippets based on functions and classes.")
+    parser.add_argument('inputs', nargs='+',
+                        help="Path to the input Python (.py) file, or several files, directories and glob patterns "
+                             "(quoted, e.g. 'src/**/*.py') to merge into one snippets file.")
     parser.add_argument('output_file', help="Path to the output JSON snippet file (e.g., snippets.json).")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="Worker processes used to parse files in batch mode (default: one per CPU).")
+    parser.add_argument('--merge', action='store_true',
+                        help="Update the snippets generated from these files in an existing output file and "
+                             "keep all other entries, instead of overwriting it.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f"Parse every file instead of reusing the definitions cached in {SPAN_CACHE_FILENAME} "
+                             "next to the output file.")
     return parser.parse_args()
 
+def is_single_file(inputs: List[str]) -> bool:
+    """
+    Returns True if the inputs name one plain file, which keeps the single-file behavior.
+    """
+    return (len(inputs) == 1 and not os.path.isdir(inputs[0])
+            and not any(character in inputs[0] for character in GLOB_CHARACTERS))
+
+def merge_main(args: argparse.Namespace):
+    """
+    Runs --merge for the parsed command-line arguments.
+    """
+    output_file = args.output_file
+    try:
+        # A single file goes through the batch path too, which names its snippets
+        # around the ones other sources already hold in the output
+        count, files, _, written, skipped = merge_snippets_batch(args.inputs, output_file, args.jobs,
+                                                                 not args.no_cache)
+    except Exception as e:
+        print(f"Error merging JSON into '{output_file}': {e}")
+        sys.exit(1)
+
+    for name in skipped:
+        print(f"Warning: '{name}' already exists in '{output_file}' and is not generated from these files; kept it.")
+    if written:
+        print(f"{count} snippets from {files} files successfully merged into '{output_file}'.")
+    else:
+        print(f"'{output_file}' already holds these {count} snippets; nothing was written.")
+
 def main():
     args = parse_arguments()
-    
-    input_file = args.input_file
+
     output_file = args.output_file
+    if args.merge:
+        merge_main(args)
+        return
+    if not is_single_file(args.inputs):
+        try:
+            count, files = generate_snippets_batch(args.inputs, output_file, args.jobs, not args.no_cache)
+        except Exception as e:
+            print(f"Error writing JSON to '{output_file}': {e}")
+            sys.exit(1)
+        if not count:
+            print("No functions or classes found to create snippets.")
+            sys.exit(0)
+        print(f"{count} snippets from {files} files successfully written to '{output_file}'.")
+        return
+
+    input_file = args.inputs[0]
 
     content = read_python_file(input_file)
-    snippets = generate_snippets(content)
+    if args.no_cache:
+        snippets = generate_snippets(content)
+    else:
+        with SpanCache(os.path.dirname(os.path.abspath(output_file))) as cache:
+            snippets = generate_snippets(content, cache)
 
     if not snippets:
         print("No functions or classes found to create snippets.")
@@ -0,0 +1,81 @@
+import os
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+
+def make_filter(ignore_patterns=(), skip_hidden=True):
+    """
+    Builds a predicate deciding whether an entry name should be kept.
+    Hidden names (leading '.') and names matching any ignore pattern are rejected.
+    """
+    patterns = tuple(ignore_patterns)
+
+    def keep(name):
+        if skip_hidden and name.startswith('.'):
+            return False
+        return not any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+    return keep
+
+def scan_directory(path, keep):
+    """
+    Lists a single directory with os.scandir and returns the kept entries sorted by name.
+    The returned DirEntry objects carry cached type information, so callers can use
+    is_dir()/is_file() without extra stat calls.
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = [entry for entry in it if keep(entry.name)]
+    except OSError as e:
+        print(f"Error scanning {path}: {e}")
+        return []
+    entries.sort(key=lambda entry: entry.name)
+    return entries
+
+def walk_tree(root_path, ignore_patterns=(), skip_hidden=True, max_depth=None, jobs=1):
+    """
+    Walks root_path depth-first and yields (DirEntry, depth) pairs, where depth 1 means
+    a direct child of root_path.
+
+    Entries are yielded in pre-order with siblings sorted by name, so the order is the
+    same as sorting the relative paths part by part. Hidden or ignored entries are
+    dropped before they are yielded, and pruned directories are never entered.
+    Symlinked directories are yielded but not followed.
+
+    With jobs > 1, directory listings are prefetched on a thread pool while the
+    caller consumes earlier results; the yielded order stays identical.
+    """
+    keep = make_filter(ignore_patterns, skip_hidden)
+    if jobs and jobs > 1:
+        pool = ThreadPoolExecutor(max_workers=jobs)
+        try:
+            yield from _walk(os.fspath(root_path), keep, max_depth, pool, jobs * 8)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    else:
+        yield from _walk(os.fspath(root_path), keep, max_depth, None, 0)
+
+def _walk(root, keep, max_depth, pool, prefetch_limit):
+    pending = {}
+
+    def open_dir(path, depth):
+        future = pending.pop(path, None)
+        entries = future.result() if future is not None else scan_directory(path, keep)
+        if pool is not None and (max_depth is None or depth < max_depth):
+            # Queue listings for the subdirectories we are about to descend into
+            for entry in entries:
+                if len(pending) >= prefetch_limit:
+                    break
+                if entry.is_dir(follow_symlinks=False):
+                    pending[entry.path] = pool.submit(scan_directory, entry.path, keep)
+        return iter(entries)
+
+    stack = [(open_dir(root, 1), 1)]
+    while stack:
+        entries, depth = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        yield entry, depth
+        if entry.is_dir(follow_symlinks=False) and (max_depth is None or depth < max_depth):
+            stack.append((open_dir(entry.path, depth + 1), depth + 1))
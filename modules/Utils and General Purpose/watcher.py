@@ -0,0 +1,243 @@
+import os
+import sys
+import time
+import struct
+import select
+import ctypes
+import ctypes.util
+
+from walker import make_filter, walk_tree
+
+# inotify event masks (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+
+EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyWatcher:
+    """
+    Reports created, deleted, renamed and written entries below a root directory
+    using Linux inotify. A file is reported again when a writer closes it, so a copy
+    in progress is seen once more when it completes. Every kept directory gets its
+    own watch; directories that appear later are watched as soon as their creation
+    event is read.
+    """
+
+    def __init__(self, root_path, ignore_patterns=(), skip_hidden=True):
+        self.root_path = os.fspath(root_path)
+        self.ignore_patterns = ignore_patterns
+        self.skip_hidden = skip_hidden
+        self.keep = make_filter(ignore_patterns, skip_hidden)
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        self.add_tree(self.root_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            # Re-adding a moved directory returns its existing wd, which re-points it here
+            self.watches[wd] = path
+
+    def add_tree(self, path):
+        """
+        Watches path and every kept directory below it.
+        """
+        self.add_watch(path)
+        for entry, _ in walk_tree(path, self.ignore_patterns, self.skip_hidden):
+            if entry.is_dir(follow_symlinks=False):
+                self.add_watch(entry.path)
+
+    def read(self, timeout=None):
+        """
+        Waits up to timeout seconds (forever if None) and returns the set of paths
+        that changed. The root path is reported when the kernel queue overflowed.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                changed.add(self.root_path)
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            parent = self.watches.get(wd)
+            if parent is None or not name:
+                continue
+            name = os.fsdecode(name)
+            if not self.keep(name):
+                continue
+            path = os.path.join(parent, name)
+            changed.add(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_tree(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """
+    Fallback watcher that detects changes by comparing directory mtimes between
+    polls. Only directories whose mtime changed are listed again.
+
+    New files are reported at once and their size and mtime are then checked on
+    every poll for SETTLE_POLLS quiet polls; whenever they changed and then held
+    still for a poll, the file is reported again, much as inotify reports a writer
+    closing it. Existing files rewritten in place are not seen.
+    """
+
+    SETTLE_POLLS = 30
+
+    def __init__(self, root_path, ignore_patterns=(), skip_hidden=True, interval=2.0):
+        self.root_path = os.fspath(root_path)
+        self.ignore_patterns = ignore_patterns
+        self.skip_hidden = skip_hidden
+        self.keep = make_filter(ignore_patterns, skip_hidden)
+        self.interval = interval
+        self.snapshot = {}
+        self.pending = {}
+        self.add_tree(self.root_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def snapshot_dir(self, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            names = frozenset(name for name in os.listdir(path) if self.keep(name))
+        except OSError:
+            return None
+        return mtime, names
+
+    def add_tree(self, path):
+        state = self.snapshot_dir(path)
+        if state is None:
+            return
+        self.snapshot[path] = state
+        for entry, _ in walk_tree(path, self.ignore_patterns, self.skip_hidden):
+            if entry.is_dir(follow_symlinks=False):
+                state = self.snapshot_dir(entry.path)
+                if state is not None:
+                    self.snapshot[entry.path] = state
+
+    def read(self, timeout=None):
+        """
+        Sleeps for the poll interval (or timeout, if shorter) and returns the set of
+        paths that changed since the previous poll.
+        """
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        changed = set()
+        for path, (seen, reported, quiet) in list(self.pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            current = (st.st_size, st.st_mtime_ns)
+            quiet = quiet + 1 if current == seen else 0
+            if quiet == 1 and current != reported:
+                changed.add(path)
+                reported = current
+            if quiet >= self.SETTLE_POLLS:
+                del self.pending[path]
+            else:
+                self.pending[path] = (current, reported, quiet)
+        for path, (mtime, names) in list(self.snapshot.items()):
+            if path not in self.snapshot:
+                continue
+            try:
+                current_mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                current_mtime = None
+            if current_mtime == mtime:
+                continue
+            state = self.snapshot_dir(path) if current_mtime is not None else None
+            if state is None:
+                # The directory is gone; forget it and everything below it
+                prefix = path + os.sep
+                for known in [p for p in self.snapshot if p == path or p.startswith(prefix)]:
+                    del self.snapshot[known]
+                changed.add(path)
+                continue
+            self.snapshot[path] = state
+            for name in names.symmetric_difference(state[1]):
+                child = os.path.join(path, name)
+                changed.add(child)
+                if name not in state[1]:
+                    continue
+                if os.path.isdir(child):
+                    if child not in self.snapshot:
+                        self.add_tree(child)
+                    continue
+                try:
+                    st = os.stat(child)
+                except OSError:
+                    continue
+                # Reported as new above, so only later changes are reported again
+                current = (st.st_size, st.st_mtime_ns)
+                self.pending[child] = (current, current, 0)
+        return changed
+
+    def close(self):
+        self.snapshot.clear()
+        self.pending.clear()
+
+def open_watcher(root_path, ignore_patterns=(), skip_hidden=True, poll_interval=2.0):
+    """
+    Returns an inotify watcher on Linux, or a polling watcher where inotify is unavailable.
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root_path, ignore_patterns, skip_hidden)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), falling back to polling.")
+    return PollingWatcher(root_path, ignore_patterns, skip_hidden, poll_interval)
+
+def watch_batches(root_path, ignore_patterns=(), skip_hidden=True, debounce=0.5, poll_interval=2.0):
+    """
+    Yields sets of changed paths below root_path forever.
+
+    Events are coalesced until no new event arrived for `debounce` seconds, so a
+    bulk copy becomes one batch. A batch is cut after 20 debounce windows even if
+    events keep arriving, which bounds the latency of a long copy.
+    """
+    with open_watcher(root_path, ignore_patterns, skip_hidden, poll_interval) as watcher:
+        while True:
+            batch = watcher.read()
+            if not batch:
+                continue
+            deadline = time.monotonic() + debounce * 20
+            while time.monotonic() < deadline:
+                more = watcher.read(timeout=debounce)
+                if not more:
+                    break
+                batch |= more
+            yield batch
@@ -0,0 +1,216 @@
+import io
+import os
+import hashlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+from fsutil import atomic_write
+from parallel import bounded_map, chunked
+from pcm import PCM_ERRORS, PCM_EXTENSIONS, numpy_available, open_pcm
+from icons import ICON_SIZE, pillow_available
+from reporting import Reporter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Resolution of the stored peak envelopes; images of any size are rendered from them
+PEAK_BINS = 512
+
+# Number of waveforms decoded and rendered per worker task
+CHUNK_SIZE = 16
+
+# Color behind the waveform
+BACKGROUND = (24, 24, 24)
+
+def compute_peaks(path, bins=PEAK_BINS):
+    """
+    Decodes a WAV or AIFF file chunk by chunk and returns its peak envelope: the
+    minimum and maximum sample of each of `bins` equal slices of the file, as
+    interleaved int8 pairs scaled to [-127, 127] (2 * bins bytes). Returns b''
+    if the file cannot be decoded or holds no audio.
+    """
+    low = np.full(bins, np.inf, np.float32)
+    high = np.full(bins, -np.inf, np.float32)
+    position = 0
+    try:
+        _, frames, chunks = open_pcm(path)
+        if frames <= 0:
+            return b''
+        for mono in chunks:
+            count = len(mono)
+            if not count:
+                continue
+            slices = np.arange(position, position + count, dtype=np.int64) * bins // frames
+            np.minimum(slices, bins - 1, out=slices)
+            # One reduction per run of samples that fall into the same slice
+            starts = np.flatnonzero(np.diff(slices, prepend=-1))
+            np.minimum.at(low, slices[starts], np.minimum.reduceat(mono, starts))
+            np.maximum.at(high, slices[starts], np.maximum.reduceat(mono, starts))
+            position += count
+    except PCM_ERRORS:
+        return b''
+    if not position:
+        return b''
+    # Files shorter than `bins` frames leave some slices empty
+    empty = low > high
+    low[empty] = high[empty] = 0
+    envelope = np.clip(np.round(np.stack((low, high), axis=1) * 127), -127, 127)
+    return envelope.astype(np.int8).tobytes()
+
+def merge_peaks(envelope, peaks):
+    """
+    Widens envelope, an int8 array of (min, max) pairs or None, to also cover the
+    peak envelope peaks (as returned by compute_peaks), and returns it.
+    """
+    pairs = np.frombuffer(peaks, np.int8).reshape(-1, 2)
+    if envelope is None:
+        return pairs.copy()
+    if len(envelope) != len(pairs):
+        return envelope
+    np.minimum(envelope[:, 0], pairs[:, 0], out=envelope[:, 0])
+    np.maximum(envelope[:, 1], pairs[:, 1], out=envelope[:, 1])
+    return envelope
+
+def waveform_digest(peaks, color_hex, size):
+    """
+    Returns a digest of the inputs a waveform image is rendered from.
+    """
+    digest = hashlib.blake2b(peaks, digest_size=16)
+    digest.update(f"\0{color_hex}\0{size}".encode('utf-8'))
+    return digest.hexdigest()
+
+def render_waveform(peaks, color_hex, size=ICON_SIZE):
+    """
+    Renders a square PNG of a peak envelope drawn in color_hex ('$RRGGBB') on a
+    dark background and returns the encoded bytes.
+    """
+    envelope = np.frombuffer(peaks, np.int8).reshape(-1, 2)
+    # Each column covers a run of slices; narrower images merge them, wider ones repeat them
+    starts = np.arange(size) * len(envelope) // size
+    low = np.minimum.reduceat(envelope[:, 0], starts).astype(np.float32) / 127
+    high = np.maximum.reduceat(envelope[:, 1], starts).astype(np.float32) / 127
+    middle = (size - 1) / 2
+    top = np.floor(middle - high * middle)
+    bottom = np.ceil(middle - low * middle)
+    rows = np.arange(size)[:, None]
+
+    pixels = np.empty((size, size, 3), np.uint8)
+    pixels[:] = BACKGROUND
+    pixels[(rows >= top) & (rows <= bottom)] = tuple(int(color_hex[i:i + 2], 16) for i in (1, 3, 5))
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, 'RGB').save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+def _waveform_chunk(chunk, size):
+    results = []
+    for job in chunk:
+        source, _, _, color_hex, peaks, known_digest = job
+        if peaks is None:
+            peaks = compute_peaks(source)
+        digest = data = None
+        if peaks:
+            digest = waveform_digest(peaks, color_hex, size)
+            if digest != known_digest:
+                data = render_waveform(peaks, color_hex, size)
+        results.append((job, peaks, digest, data))
+    return results
+
+def generate_waveforms(items, size=ICON_SIZE, processes=None, nfo_index=None, reporter=None, sink=None):
+    """
+    Renders and writes a waveform thumbnail for every (source, is_folder, png_path,
+    color_hex) tuple whose source is a WAV/AIFF file, and for every folder with
+    such files below it. Folder thumbnails overlay the envelopes of their children,
+    so folders must come after their contents, as in traversal order.
+
+    Audio is decoded into a PEAK_BINS envelope and rendered on a process pool of
+    `processes` workers (one per CPU by default, in-process if processes is 1).
+    If an index is given, envelopes are stored in it by the source's mtime and
+    size, so unchanged files are never decoded again, even when the thumbnail
+    size changes; thumbnails rendered from the same envelope, color and size are
+    not rendered again. Files stream through the pool; folders, which only need
+    the envelopes, are held until the files are done. Each written thumbnail is
+    reported as a 'waveforms' event. Returns the number of thumbnails written.
+    With a sink (see archive.ArchiveSink), thumbnails are added to it instead of
+    the filesystem.
+    """
+    reporter = reporter or Reporter('verbose')
+    if not numpy_available() or not pillow_available():
+        reporter.error("NumPy and Pillow are required for waveform thumbnails; skipping them.")
+        return 0
+
+    folders = []
+    envelopes = {}
+
+    def known_digest(png_path):
+        entry = nfo_index.lookup(png_path) if nfo_index else None
+        return entry.digest if entry else None
+
+    def add_to_parent(source, peaks):
+        if peaks:
+            parent = os.path.dirname(os.fspath(source))
+            envelopes[parent] = merge_peaks(envelopes.get(parent), peaks)
+
+    def file_jobs():
+        for source, is_folder, png_path, color_hex in items:
+            if is_folder:
+                folders.append((source, png_path, color_hex))
+                continue
+            if os.path.splitext(os.fspath(source))[1].lower() not in PCM_EXTENSIONS:
+                continue
+            try:
+                st = os.stat(source)
+            except OSError:
+                continue
+            peaks = nfo_index.lookup_peaks(source, st) if nfo_index else None
+            known = known_digest(png_path)
+            if peaks is not None:
+                add_to_parent(source, peaks)
+                if not peaks or waveform_digest(peaks, color_hex, size) == known:
+                    continue
+            yield source, st, png_path, color_hex, peaks, known
+
+    def folder_jobs():
+        for source, png_path, color_hex in folders:
+            envelope = envelopes.pop(os.fspath(source), None)
+            if envelope is None:
+                continue
+            peaks = envelope.tobytes()
+            add_to_parent(source, peaks)
+            yield source, None, png_path, color_hex, peaks, known_digest(png_path)
+
+    written = 0
+    if processes is None:
+        processes = os.cpu_count() or 1
+    render = partial(_waveform_chunk, size=size)
+    # Folders are rendered after the file pool has shut down, so only one pool exists at a time
+    for jobs in (file_jobs, folder_jobs):
+        results = bounded_map(render, chunked(jobs(), CHUNK_SIZE), processes, executor_class=ProcessPoolExecutor)
+        for job, peaks, digest, data in (result for chunk in results for result in chunk):
+            source, st, png_path, color_hex, cached, _ = job
+            if cached is None:
+                if nfo_index:
+                    nfo_index.record_peaks(source, st, peaks)
+                add_to_parent(source, peaks)
+            if data is None:
+                continue
+            try:
+                if sink is not None:
+                    if sink.add_file(png_path, data) == 'linked':
+                        reporter.count('deduplicated')
+                else:
+                    atomic_write(png_path, data)
+                written += 1
+                reporter.event('waveforms', png_path, [f"Wrote waveform: {png_path}"])
+            except Exception as e:
+                reporter.event('failed', png_path, [f"Error writing waveform {png_path}: {e}"])
+                continue
+            if nfo_index:
+                nfo_index.record(png_path, digest, color_hex)
+    return written